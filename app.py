@@ -1,20 +1,63 @@
 import os
 import sys
+import atexit
 import json
+import gzip
+import mimetypes
+import random
+import re
 import uuid
+import shutil
+import sqlite3
+import base64
+import csv
+import io
+import bisect
 import hashlib
-from datetime import datetime
+import hmac
+import threading
+import time
+import urllib.request
+import zlib
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
-from flask import Flask, render_template, jsonify, send_from_directory, request, redirect, url_for, session, flash
+from flask import Flask, render_template, jsonify, send_file, send_from_directory, request, redirect, url_for, session, flash, make_response, g, has_request_context
 from flask_cors import CORS
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import DataError, IntegrityError, TimeoutError as SQLAlchemyTimeoutError
+from sqlalchemy.pool import QueuePool
 from functools import wraps
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
+import cloudinary.exceptions
+
+try:
+    import fcntl
+except ImportError:  # Windows : pas de verrou inter-processus
+    fcntl = None
+
+try:
+    import brotli
+except ImportError:  # Brotli absent : précompression et compression gzip seulement
+    brotli = None
+
+try:
+    from PIL import Image, ImageOps, features as pil_features
+except ImportError:  # Pillow absent : les images sont servies sans dérivés
+    Image = None
 
 # Configuration des chemins
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Catalogue JSON et état partagé entre workers (caches, journaux, métriques, profils)
+DATA_DIR = os.environ.get('DATA_DIR', os.path.join(BASE_DIR, 'data'))
 sys.path.insert(0, BASE_DIR)
 
 # Configuration Cloudinary
@@ -33,7 +76,7 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs(os.path.join(UPLOAD_FOLDER, 'images'), exist_ok=True)
 os.makedirs(os.path.join(UPLOAD_FOLDER, 'videos'), exist_ok=True)
 os.makedirs(os.path.join(UPLOAD_FOLDER, 'books'), exist_ok=True)
-os.makedirs(os.path.join(BASE_DIR, 'data'), exist_ok=True)
+os.makedirs(DATA_DIR, exist_ok=True)
 
 # Initialisation de la base de données
 db = SQLAlchemy()
@@ -78,15 +121,22 @@ class PublicUser(db.Model):
         """Vérifier le mot de passe"""
         return self.password_hash == hashlib.sha256(password.encode()).hexdigest()
 
-    def to_dict(self):
+    def to_dict(self, comments_count=None, ratings_count=None):
+        """Sérialiser l'utilisateur ; les compteurs peuvent être fournis par
+        une requête groupée (voir public_users_with_counts) pour éviter de
+        charger ses commentaires et ses notes"""
+        if comments_count is None:
+            comments_count = Comment.query.filter_by(user_id=self.id).count()
+        if ratings_count is None:
+            ratings_count = Rating.query.filter_by(user_id=self.id).count()
         return {
             'id': self.id,
             'username': self.username,
             'email': self.email,
             'is_active': self.is_active,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'comments_count': len(self.comments),
-            'ratings_count': len(self.ratings)
+            'comments_count': comments_count,
+            'ratings_count': ratings_count
         }
 
 # Modèle Comment
@@ -99,6 +149,14 @@ class Comment(db.Model):
     is_approved = db.Column(db.Boolean, default=False)  # Modération
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    submission_id = db.Column(db.String(32))  # Identifiant donné à la soumission (file d'attente, rejouable)
+    
+    # Index créés sur les bases existantes par les migrations 2 et 6 (voir MIGRATIONS)
+    __table_args__ = (
+        db.Index('ix_comment_content_approved_created', 'content_type', 'content_id', 'is_approved', 'created_at'),
+        db.Index('ix_comment_user_id', 'user_id'),
+        db.Index('ux_comment_submission_id', 'submission_id', unique=True),
+    )
 
     def to_dict(self):
         return {
@@ -121,9 +179,13 @@ class Rating(db.Model):
     content_id = db.Column(db.Integer, nullable=False)  # ID du livre ou de la citation
     user_id = db.Column(db.Integer, db.ForeignKey('public_user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    previous_rating = db.Column(db.Integer)  # Note remplacée par le dernier upsert (None à la création)
     
     # Contrainte d'unicité : un utilisateur ne peut noter qu'une fois le même contenu
-    __table_args__ = (db.UniqueConstraint('user_id', 'content_type', 'content_id'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'content_type', 'content_id'),
+        db.Index('ix_rating_content', 'content_type', 'content_id', 'rating'),
+    )
 
     def to_dict(self):
         return {
@@ -133,7 +195,89 @@ class Rating(db.Model):
             'content_id': self.content_id,
             'user_id': self.user_id,
             'username': self.user.username if self.user else 'Utilisateur supprimé',
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'previous_rating': self.previous_rating
+        }
+
+# Modèle Book (catalogue des livres)
+class Book(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(255), nullable=False, default='')
+    description = db.Column(db.Text, default='')
+    price = db.Column(db.Float, default=0)
+    image = db.Column(db.String(500), default='')
+    category = db.Column(db.String(100), default='', index=True)
+    author = db.Column(db.String(255), default='', index=True)
+    pages = db.Column(db.Integer, default=0)
+    format = db.Column(db.String(50), default='PDF')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime)
+
+    # Ne jamais réutiliser l'ID d'un élément supprimé (commentaires et notes y sont rattachés)
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'title': self.title,
+            'description': self.description,
+            'price': self.price,
+            'image': self.image,
+            'category': self.category,
+            'author': self.author,
+            'pages': self.pages,
+            'format': self.format,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+# Modèle Quote (catalogue des citations)
+class Quote(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    text = db.Column(db.Text, nullable=False, default='')
+    author = db.Column(db.String(255), default='', index=True)
+    category = db.Column(db.String(100), default='', index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime)
+
+    # Ne jamais réutiliser l'ID d'un élément supprimé (commentaires et notes y sont rattachés)
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'text': self.text,
+            'author': self.author,
+            'category': self.category,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+# Modèle ContentStats (compteurs dénormalisés, maintenus à chaque écriture)
+class ContentStats(db.Model):
+    content_type = db.Column(db.String(20), primary_key=True)  # 'book' ou 'quote'
+    content_id = db.Column(db.Integer, primary_key=True)  # ID du livre ou de la citation
+    ratings_count = db.Column(db.Integer, nullable=False, default=0)
+    ratings_sum = db.Column(db.Integer, nullable=False, default=0)
+    # Histogramme des notes (une colonne par étoile)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+    comments_count = db.Column(db.Integer, nullable=False, default=0)  # Commentaires approuvés
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def distribution(self):
+        return {star: getattr(self, f'rating_{star}') or 0 for star in range(1, 6)}
+
+    def to_dict(self):
+        ratings_count = self.ratings_count or 0
+        average_rating = (self.ratings_sum or 0) / ratings_count if ratings_count > 0 else 0
+        return {
+            'comments_count': self.comments_count or 0,
+            'ratings_count': ratings_count,
+            'average_rating': round(average_rating, 1)
         }
 
 # Modèle pour les médias uploadés
@@ -149,6 +293,34 @@ class Media(db.Model):
     description = db.Column(db.Text)
     is_featured = db.Column(db.Boolean, default=False)  # Pour afficher sur la page d'accueil
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Pipeline d'upload : pending -> uploading -> ready (ou failed)
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')
+    upload_error = db.Column(db.Text)
+    upload_attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    upload_started_at = db.Column(db.DateTime)
+    spool_path = db.Column(db.String(500))  # Fichier local en attente d'envoi au stockage
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 du contenu (déduplication)
+    storage_backend = db.Column(db.String(20))  # 'cloudinary' ou 'local' (NULL : Cloudinary)
+    variants = db.Column(db.Text)  # JSON : dérivés [{width, height, format, url, public_id, bytes}]
+
+    def variant_list(self):
+        return json.loads(self.variants) if self.variants else []
+
+    def srcset(self):
+        """srcset par format ({'webp': 'url 320w, url 640w', ...})"""
+        srcset = {}
+        for variant in sorted(self.variant_list(), key=lambda v: v['width']):
+            srcset.setdefault(variant['format'], []).append(f"{variant['url']} {variant['width']}w")
+        return {fmt: ', '.join(entries) for fmt, entries in srcset.items()}
+
+    def thumbnail_url(self):
+        """Plus petit dérivé au format de repli (lisible par tous les navigateurs)"""
+        fallbacks = [v for v in self.variant_list() if v['format'] in ('jpeg', 'png')]
+        return min(fallbacks, key=lambda v: v['width'])['url'] if fallbacks else self.cloudinary_url
+    
+    __table_args__ = (
+        db.Index('ix_media_featured_uploaded', 'is_featured', 'uploaded_at'),
+    )
 
     def to_dict(self):
         return {
@@ -163,9 +335,20 @@ class Media(db.Model):
             'description': self.description,
             'is_featured': self.is_featured,
             'uploaded_at': self.uploaded_at.isoformat() if self.uploaded_at else None,
+            'status': self.status,
+            'upload_error': self.upload_error,
+            'variants': self.variant_list(),
+            'srcset': self.srcset(),
+            'thumbnail_url': self.thumbnail_url(),
             'url': self.cloudinary_url  # Utiliser l'URL Cloudinary
         }
 
+# Modèle SchemaMigration (versions du schéma déjà appliquées)
+class SchemaMigration(db.Model):
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow)
+
 # Configuration Flask avec chemins statiques corrigés pour Render
 static_folder_path = os.path.join(BASE_DIR, 'static')
 if not os.path.exists(static_folder_path):
@@ -185,12 +368,587 @@ app.config['SECRET_KEY'] = 'asdf#FGSgvasgf$5$WGT'
 # Configuration de la base de données - PostgreSQL pour Render
 database_url = os.environ.get('DATABASE_URL')
 if database_url:
-    # Render utilise PostgreSQL
+    # Render utilise PostgreSQL (SQLAlchemy n'accepte plus le schéma postgres://)
+    if database_url.startswith('postgres://'):
+        database_url = 'postgresql://' + database_url[len('postgres://'):]
     app.config['SQLALCHEMY_DATABASE_URI'] = database_url
 else:
     # Fallback pour développement local
     app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(BASE_DIR, 'app.db')}"
 
+# ==================== POOL DE CONNEXIONS ====================
+
+# Chaque worker gunicorn a son propre pool : sa taille suit le nombre de threads
+# du worker, et DB_MAX_CONNECTIONS (s'il est fourni) est réparti entre les
+# WEB_CONCURRENCY workers pour ne pas dépasser la limite du serveur.
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+GUNICORN_THREADS = int(os.environ.get('GUNICORN_THREADS', 1))
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', GUNICORN_THREADS + 1))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', GUNICORN_THREADS))
+DB_MAX_CONNECTIONS = int(os.environ.get('DB_MAX_CONNECTIONS', 0))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 300))  # Avant les coupures des connexions inactives
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+DB_APPLICATION_NAME = os.environ.get('DB_APPLICATION_NAME', 'dek-dek-website')
+# PgBouncer en mode transaction : ni paramètres de démarrage ni requêtes préparées côté serveur
+DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', '0') == '1'
+
+class PoolMetrics:
+    """Temps d'attente pour obtenir une connexion du pool (par worker)"""
+
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.buckets = [0] * len(self.BUCKETS)
+
+    def record(self, wait, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            for index, bound in enumerate(self.BUCKETS):
+                if wait <= bound:
+                    self.buckets[index] += 1
+
+    def reset(self):
+        with self.lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.buckets = [0] * len(self.BUCKETS)
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_total_seconds': round(self.wait_total, 6),
+                'wait_max_seconds': round(self.wait_max, 6),
+                'wait_avg_seconds': round(self.wait_total / self.checkouts, 6) if self.checkouts else 0,
+                'wait_buckets': {str(bound): count for bound, count in zip(self.BUCKETS, self.buckets)}
+            }
+
+pool_metrics = PoolMetrics()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool qui mesure l'attente de chaque checkout"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except SQLAlchemyTimeoutError:
+            pool_metrics.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_metrics.record(time.perf_counter() - start)
+        return connection
+
+def database_engine_options(uri):
+    """Options du moteur SQLAlchemy selon la base (PostgreSQL ou SQLite) et l'environnement"""
+    pool_size = DB_POOL_SIZE
+    max_overflow = DB_MAX_OVERFLOW
+    if DB_MAX_CONNECTIONS:
+        budget = max(1, DB_MAX_CONNECTIONS // max(1, WEB_CONCURRENCY))
+        pool_size = min(pool_size, budget)
+        max_overflow = min(max_overflow, budget - pool_size)
+    
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+    
+    if uri.startswith('postgresql'):
+        connect_args = {'application_name': DB_APPLICATION_NAME}
+        if DB_PGBOUNCER:
+            # statement_timeout se règle alors sur le rôle (ALTER ROLE ... SET statement_timeout)
+            if uri.startswith('postgresql+psycopg:'):
+                connect_args['prepare_threshold'] = None
+        elif DB_STATEMENT_TIMEOUT_MS:
+            connect_args['options'] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+        options['connect_args'] = connect_args
+    return options
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database_engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+
+# ==================== MÉTRIQUES ====================
+
+# Chaque worker compte en mémoire (requêtes par endpoint, latences, requêtes
+# SQL, accès aux caches, attente du pool) et écrit ses totaux toutes les
+# METRICS_FLUSH_INTERVAL secondes dans data/metrics/<pid>.json. /metrics
+# additionne les fichiers de tous les workers et répond au format texte de
+# Prometheus. Les fichiers des workers arrêtés sont repliés dans archive.json
+# pour que les compteurs restent monotones après un redémarrage.
+# Accès : session admin ou en-tête Authorization: Bearer <METRICS_TOKEN>.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_DIR = os.path.join(DATA_DIR, 'metrics')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# nom -> (type, aide, buckets des histogrammes)
+METRIC_DEFINITIONS = {
+    'dek_http_requests_total': ('counter', 'Requêtes HTTP traitées par endpoint, méthode et statut', None),
+    'dek_http_request_duration_seconds': ('histogram', 'Durée des requêtes HTTP', LATENCY_BUCKETS),
+    'dek_http_request_db_queries': ('histogram', 'Nombre de requêtes SQL par requête HTTP', QUERY_COUNT_BUCKETS),
+    'dek_http_request_db_seconds': ('histogram', 'Temps passé en SQL par requête HTTP', LATENCY_BUCKETS),
+    'dek_cache_requests_total': ('counter', 'Accès aux caches en mémoire (hit ou miss)', None),
+    'dek_db_pool_checkouts_total': ('counter', 'Connexions obtenues du pool', None),
+    'dek_db_pool_timeouts_total': ('counter', 'Attentes du pool abandonnées (DB_POOL_TIMEOUT)', None),
+    'dek_db_pool_wait_seconds': ('histogram', "Attente d'une connexion du pool", PoolMetrics.BUCKETS),
+}
+
+class WorkerMetrics:
+    """Compteurs et histogrammes d'un worker, indexés par (nom, labels)
+    
+    Un histogramme est stocké sous forme [compte par bucket..., compte +Inf,
+    somme] (comptes non cumulés, cumulés au rendu).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRIC_DEFINITIONS[name][2]
+        key = (name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+            histogram[bisect.bisect_left(buckets, value)] += 1
+            histogram[-1] += value
+
+    def snapshot(self):
+        """Totaux du worker, sérialisables en JSON (pool de connexions compris)"""
+        with self.lock:
+            snapshot = {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()]
+            }
+        
+        pool = pool_metrics.to_dict()
+        cumulative = list(pool['wait_buckets'].values())
+        wait_counts = [count - previous for count, previous in zip(cumulative, [0] + cumulative[:-1])]
+        wait_counts.append(pool['checkouts'] - (cumulative[-1] if cumulative else 0))
+        snapshot['counters'] += [
+            ['dek_db_pool_checkouts_total', [], pool['checkouts']],
+            ['dek_db_pool_timeouts_total', [], pool['timeouts']]
+        ]
+        snapshot['histograms'].append(['dek_db_pool_wait_seconds', [], wait_counts + [pool['wait_total_seconds']]])
+        return snapshot
+
+worker_metrics = WorkerMetrics()
+metrics_writer_pid = None
+metrics_writer_lock = threading.Lock()
+
+def merge_metric_snapshots(snapshots):
+    """Additionner les totaux de plusieurs workers"""
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot.get('counters', []):
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot.get('histograms', []):
+            key = (name, tuple(map(tuple, labels)))
+            if key in histograms and len(histograms[key]) == len(values):
+                histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+            else:
+                histograms[key] = list(values)
+    return {
+        'counters': [[name, [list(pair) for pair in labels], value] for (name, labels), value in counters.items()],
+        'histograms': [[name, [list(pair) for pair in labels], values] for (name, labels), values in histograms.items()]
+    }
+
+def read_metrics_file(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_metrics_file(path, snapshot):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot, f, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def fold_stale_metrics_files():
+    """Replier dans archive.json les fichiers des workers arrêtés
+    
+    Le fichier portant le PID courant vient forcément d'un ancien processus
+    (PID réutilisé) : il est replié lui aussi avant la première écriture.
+    """
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with catalog_file_lock('metrics'):
+        archive_path = os.path.join(METRICS_DIR, 'archive.json')
+        stale = []
+        for filename in os.listdir(METRICS_DIR):
+            pid = filename[:-len('.json')]
+            if not filename.endswith('.json') or not pid.isdigit():
+                continue
+            if int(pid) == os.getpid() or not process_alive(int(pid)):
+                stale.append(os.path.join(METRICS_DIR, filename))
+        if not stale:
+            return
+        snapshots = [read_metrics_file(path) for path in [archive_path] + stale]
+        write_metrics_file(archive_path, merge_metric_snapshots(s for s in snapshots if s))
+        for path in stale:
+            os.remove(path)
+
+def flush_worker_metrics():
+    """Écrire les totaux du worker courant dans data/metrics/<pid>.json"""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    write_metrics_file(os.path.join(METRICS_DIR, f"{os.getpid()}.json"), worker_metrics.snapshot())
+
+def metrics_writer_loop():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush_worker_metrics()
+        except Exception as e:
+            print(f"Erreur lors de l'écriture des métriques: {e}")
+
+def start_metrics_writer():
+    """Démarrer l'écriture périodique dans chaque worker (après le fork de gunicorn)"""
+    global metrics_writer_pid
+    with metrics_writer_lock:
+        if metrics_writer_pid == os.getpid():
+            return
+        metrics_writer_pid = os.getpid()
+        # Les compteurs hérités du processus parent appartiennent à son propre fichier
+        with worker_metrics.lock:
+            worker_metrics.counters.clear()
+            worker_metrics.histograms.clear()
+        pool_metrics.reset()
+        try:
+            fold_stale_metrics_files()
+        except Exception as e:
+            print(f"Erreur lors du repli des métriques: {e}")
+        threading.Thread(target=metrics_writer_loop, name='metrics-writer', daemon=True).start()
+
+@atexit.register
+def flush_worker_metrics_at_exit():
+    if metrics_writer_pid == os.getpid():
+        try:
+            flush_worker_metrics()
+        except Exception as e:
+            print(f"Erreur lors de l'écriture des métriques: {e}")
+
+def record_cache_access(cache, hit):
+    if METRICS_ENABLED:
+        worker_metrics.inc('dek_cache_requests_total', (('cache', cache), ('result', 'hit' if hit else 'miss')))
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started_at'].pop()
+    if has_request_context() and 'sql_queries' in g:
+        g.sql_queries += 1
+        g.sql_seconds += elapsed
+    record_sql_statement(conn, cursor, statement, parameters, executemany, elapsed)
+
+@event.listens_for(Engine, 'handle_error')
+def discard_query_timer(exception_context):
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started_at'):
+        connection.info['query_started_at'].pop()
+
+@app.before_request
+def start_request_metrics():
+    if not METRICS_ENABLED:
+        return
+    if metrics_writer_pid != os.getpid():
+        start_metrics_writer()
+    g.request_started_at = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_seconds = 0.0
+
+def record_request_metrics(status_code):
+    if 'request_started_at' not in g or g.get('request_metrics_recorded'):
+        return
+    g.request_metrics_recorded = True
+    endpoint = request.endpoint or 'none'
+    labels = (('endpoint', endpoint),)
+    worker_metrics.inc('dek_http_requests_total',
+                       labels + (('method', request.method), ('status', str(status_code))))
+    worker_metrics.observe('dek_http_request_duration_seconds', labels, time.perf_counter() - g.request_started_at)
+    worker_metrics.observe('dek_http_request_db_queries', labels, g.sql_queries)
+    worker_metrics.observe('dek_http_request_db_seconds', labels, g.sql_seconds)
+
+# Enregistré avant les autres hooks after_request : exécuté en dernier, il
+# compte aussi le temps de compression de la réponse
+@app.after_request
+def finish_request_metrics(response):
+    record_request_metrics(response.status_code)
+    return response
+
+@app.teardown_request
+def finish_failed_request_metrics(exc):
+    if exc is not None:
+        record_request_metrics(500)
+
+def escape_label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + '}'
+
+def format_metric_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def render_prometheus(merged):
+    """Format d'exposition texte de Prometheus (version 0.0.4)"""
+    series = {}
+    for name, labels, value in merged['counters']:
+        series.setdefault(name, []).append((labels, value))
+    for name, labels, values in merged['histograms']:
+        series.setdefault(name, []).append((labels, values))
+    
+    lines = []
+    for name, (kind, help_text, buckets) in METRIC_DEFINITIONS.items():
+        if name not in series:
+            continue
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(series[name], key=lambda s: s[0]):
+            labels = [tuple(pair) for pair in labels]
+            if kind != 'histogram':
+                lines.append(f"{name}{format_labels(labels)} {format_metric_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(buckets) + ['+Inf'], value[:-1]):
+                cumulative += count
+                le = bound if bound == '+Inf' else format_metric_value(float(bound))
+                lines.append(f"{name}_bucket{format_labels(labels + [('le', le)])} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {format_metric_value(float(value[-1]))}")
+            lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+def metrics_authorized():
+    if 'admin_logged_in' in session:
+        return True
+    authorization = request.headers.get('Authorization', '')
+    return bool(METRICS_TOKEN) and hmac.compare_digest(authorization.encode(), f"Bearer {METRICS_TOKEN}".encode())
+
+@app.route('/metrics')
+def metrics():
+    """Métriques de tous les workers au format Prometheus"""
+    if not metrics_authorized():
+        response = app.response_class('Non autorisé\n', status=401, mimetype='text/plain')
+        response.headers['WWW-Authenticate'] = 'Bearer'
+        return response
+    
+    flush_worker_metrics()
+    snapshots = []
+    if os.path.isdir(METRICS_DIR):
+        for filename in os.listdir(METRICS_DIR):
+            if filename.endswith('.json'):
+                snapshot = read_metrics_file(os.path.join(METRICS_DIR, filename))
+                if snapshot:
+                    snapshots.append(snapshot)
+    
+    response = app.response_class(render_prometheus(merge_metric_snapshots(snapshots)),
+                                  mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+# ==================== DÉBOGAGE SQL ====================
+
+# Mode opt-in (SQL_DEBUG=1) : chaque requête SQL d'une requête HTTP est
+# enregistrée avec sa durée. En fin de requête, un résumé est journalisé et
+# ajouté aux en-têtes (X-SQL-Summary, Server-Timing), et les formes de requête
+# répétées plus de SQL_REPEAT_THRESHOLD fois (N+1 probable) sont signalées.
+# Les requêtes plus lentes que SQL_SLOW_QUERY_MS sont journalisées avec leur
+# plan d'exécution (EXPLAIN, sans exécuter la requête).
+SQL_DEBUG = os.environ.get('SQL_DEBUG', '0') == '1'
+SQL_REPEAT_THRESHOLD = int(os.environ.get('SQL_REPEAT_THRESHOLD', 5))
+SQL_SLOW_QUERY_MS = float(os.environ.get('SQL_SLOW_QUERY_MS', 100))
+SQL_EXPLAIN_PREFIXES = ('select', 'with', 'insert', 'update', 'delete')
+
+sql_budget_state = threading.local()
+
+def statement_shape(statement):
+    """Forme d'une requête : littéraux et listes de paramètres repliés, espaces normalisés"""
+    shape = re.sub(r'\s+', ' ', statement.strip())
+    shape = re.sub(r"'(?:[^']|'')*'", '?', shape)
+    shape = re.sub(r'%\(\w+\)s|%s|\$\d+', '?', shape)
+    shape = re.sub(r'\b\d+(?:\.\d+)?\b', '?', shape)
+    return re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(?)', shape)
+
+def explain_statement(dbapi_connection, dialect_name, statement, parameters):
+    """Plan d'exécution d'une requête (EXPLAIN QUERY PLAN sur SQLite)"""
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect_name == 'sqlite' else 'EXPLAIN '
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return '\n'.join(str(row[-1]) for row in cursor.fetchall())
+    finally:
+        cursor.close()
+
+def record_sql_statement(conn, cursor, statement, parameters, executemany, elapsed):
+    """Appelé après chaque requête SQL (voir stop_query_timer)"""
+    budgets = getattr(sql_budget_state, 'budgets', None)
+    if budgets:
+        for budget in budgets:
+            budget.statements.append(statement)
+    if not SQL_DEBUG:
+        return
+    
+    if has_request_context() and 'sql_statements' in g:
+        g.sql_statements.append((statement_shape(statement), elapsed))
+    
+    if elapsed * 1000 < SQL_SLOW_QUERY_MS:
+        return
+    plan = ''
+    if not executemany and statement.lstrip().lower().startswith(SQL_EXPLAIN_PREFIXES):
+        try:
+            plan = explain_statement(cursor.connection, conn.dialect.name, statement, parameters)
+        except Exception as e:
+            plan = f"(EXPLAIN impossible : {e})"
+    where = f"{request.method} {request.path}" if has_request_context() else threading.current_thread().name
+    print(f"[SQL] Requête lente ({elapsed * 1000:.1f} ms) sur {where} : {statement}\n{plan}")
+
+@app.before_request
+def start_sql_debug():
+    if SQL_DEBUG:
+        g.sql_statements = []
+
+@app.after_request
+def report_sql_debug(response):
+    statements = g.get('sql_statements')
+    if statements is None:
+        return response
+    
+    total_ms = sum(elapsed for _, elapsed in statements) * 1000
+    shapes = Counter(shape for shape, _ in statements)
+    repeated = {shape: count for shape, count in shapes.items() if count > SQL_REPEAT_THRESHOLD}
+    for shape, count in repeated.items():
+        print(f"[SQL] N+1 probable sur {request.method} {request.path} : {count} × {shape}")
+    print(f"[SQL] {request.method} {request.path} : {len(statements)} requêtes, {total_ms:.1f} ms")
+    
+    response.headers['X-SQL-Summary'] = (
+        f"queries={len(statements)}; time_ms={total_ms:.1f}; "
+        f"distinct={len(shapes)}; repeated={len(repeated)}"
+    )
+    response.headers.add('Server-Timing', f'db;dur={total_ms:.1f};desc="{len(statements)} SQL"')
+    return response
+
+class query_budget:
+    """Faire échouer un test quand un bloc exécute plus de max_queries requêtes SQL
+    
+        with query_budget(3):
+            client.get('/api/books')
+    
+    Compte les requêtes du thread courant (celui du client de test Flask).
+    """
+
+    def __init__(self, max_queries):
+        self.max_queries = max_queries
+        self.statements = []
+
+    def __enter__(self):
+        if not hasattr(sql_budget_state, 'budgets'):
+            sql_budget_state.budgets = []
+        sql_budget_state.budgets.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        sql_budget_state.budgets.remove(self)
+        if exc_type is None and len(self.statements) > self.max_queries:
+            shapes = Counter(statement_shape(statement) for statement in self.statements)
+            details = '\n'.join(f"  {count} × {shape}" for shape, count in shapes.most_common())
+            raise AssertionError(
+                f"{len(self.statements)} requêtes SQL exécutées pour un budget de {self.max_queries} :\n{details}"
+            )
+
+# ==================== PROFIL SQLITE (INSTALLATION LOCALE) ====================
+
+# WAL : les lectures des autres workers ne sont plus bloquées pendant un commit
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024))
+SQLITE_JOURNAL_SIZE_LIMIT = int(os.environ.get('SQLITE_JOURNAL_SIZE_LIMIT', 64 * 1024 * 1024))
+SQLITE_CHECKPOINT_INTERVAL = int(os.environ.get('SQLITE_CHECKPOINT_INTERVAL', 60))  # 0 = désactivé
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Appliquer les pragmas du profil SQLite à chaque nouvelle connexion"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")  # Sûr en WAL : seul le dernier commit peut être perdu en cas de coupure
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA journal_size_limit = {SQLITE_JOURNAL_SIZE_LIMIT}")
+    finally:
+        cursor.close()
+
+sqlite_checkpointer_pid = None
+sqlite_checkpointer_lock = threading.Lock()
+
+def sqlite_checkpoint_loop():
+    """Reporter régulièrement le WAL dans la base pour qu'il ne grossisse pas sans fin"""
+    while True:
+        time.sleep(SQLITE_CHECKPOINT_INTERVAL)
+        try:
+            with app.app_context():
+                with db.engine.connect() as connection:
+                    connection.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)")
+        except Exception as e:
+            print(f"Erreur lors du checkpoint SQLite: {e}")
+
+@app.before_request
+def start_sqlite_checkpointer():
+    """Démarrer le thread de checkpoint dans chaque worker (après le fork de gunicorn)"""
+    global sqlite_checkpointer_pid
+    if sqlite_checkpointer_pid == os.getpid() or not SQLITE_CHECKPOINT_INTERVAL:
+        return
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        return
+    with sqlite_checkpointer_lock:
+        if sqlite_checkpointer_pid != os.getpid():
+            sqlite_checkpointer_pid = os.getpid()
+            threading.Thread(target=sqlite_checkpoint_loop, name='sqlite-checkpoint', daemon=True).start()
+
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 100 * 1024 * 1024  # 100MB max file size
@@ -205,6 +963,10 @@ def init_database():
             # Créer toutes les tables si elles n'existent pas
             db.create_all()
             
+            # Mettre à jour le schéma des tables existantes
+            if AUTO_MIGRATE:
+                run_migrations()
+            
             # Vérifier si l'admin existe déjà
             admin_exists = User.query.filter_by(username='admin').first()
             if not admin_exists:
@@ -226,6 +988,15 @@ def init_database():
                 db.session.add(test_user2)
             
             db.session.commit()
+            
+            # Import initial du catalogue JSON dans une base vide
+            if use_database_catalog() and Book.query.first() is None and Quote.query.first() is None:
+                import_catalog_from_json()
+            
+            # Construire les compteurs dénormalisés pour une base existante
+            if ContentStats.query.first() is None and (Comment.query.first() or Rating.query.first()):
+                rebuild_content_stats()
+            
             print("Base de données initialisée avec succès")
             if not admin_exists:
                 print("Admin créé: admin (mot de passe: admin123)")
@@ -236,6 +1007,148 @@ def init_database():
         print(f"Erreur lors de l'initialisation de la base de données: {e}")
         db.session.rollback()
 
+# ==================== MIGRATIONS DU SCHÉMA ====================
+
+# db.create_all() ne crée que les tables manquantes : les colonnes et index
+# ajoutés aux tables existantes passent par ces migrations versionnées.
+# AUTO_MIGRATE=0 réserve leur exécution à la commande `flask migrate-db`.
+AUTO_MIGRATE = os.environ.get('AUTO_MIGRATE', '1') != '0'
+MIGRATION_LOCK_KEY = 742310  # Verrou consultatif PostgreSQL partagé par les workers
+
+def table_columns(connection, table):
+    return {column['name'] for column in db.inspect(connection).get_columns(table)}
+
+def create_index(connection, name, table, columns, unique=False):
+    """Créer un index s'il n'existe pas, sans bloquer les écritures
+    
+    Sur PostgreSQL l'index est construit avec CONCURRENTLY (hors transaction) ;
+    un index laissé invalide par une construction interrompue est reconstruit.
+    Sur SQLite, CREATE INDEX IF NOT EXISTS suffit.
+    """
+    column_list = ', '.join(columns)
+    kind = 'UNIQUE INDEX' if unique else 'INDEX'
+    if connection.dialect.name == 'postgresql':
+        valid = connection.execute(db.text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name"
+        ), {'name': name}).scalar()
+        if valid:
+            return
+        if valid is not None:
+            connection.execute(db.text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+        connection.execute(db.text(f"CREATE {kind} CONCURRENTLY IF NOT EXISTS {name} ON {table} ({column_list})"))
+    else:
+        connection.execute(db.text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({column_list})"))
+
+def migrate_media_cloudinary_columns(connection):
+    """Aligner la table media sur le modèle (file_path -> cloudinary_url, cloudinary_public_id)"""
+    columns = table_columns(connection, 'media')
+    if 'cloudinary_url' not in columns:
+        if 'file_path' in columns:
+            connection.execute(db.text("ALTER TABLE media RENAME COLUMN file_path TO cloudinary_url"))
+        else:
+            connection.execute(db.text("ALTER TABLE media ADD COLUMN cloudinary_url VARCHAR(500) NOT NULL DEFAULT ''"))
+    if 'cloudinary_public_id' not in columns:
+        connection.execute(db.text("ALTER TABLE media ADD COLUMN cloudinary_public_id VARCHAR(255)"))
+
+def migrate_read_path_indexes(connection):
+    """Index composites des requêtes publiques (commentaires, notes, médias en vedette)"""
+    create_index(connection, 'ix_comment_content_approved_created', 'comment',
+                 ['content_type', 'content_id', 'is_approved', 'created_at'])
+    create_index(connection, 'ix_comment_user_id', 'comment', ['user_id'])
+    create_index(connection, 'ix_rating_content', 'rating', ['content_type', 'content_id', 'rating'])
+    create_index(connection, 'ix_media_featured_uploaded', 'media', ['is_featured', 'uploaded_at'])
+
+def migrate_media_upload_status(connection):
+    """Colonnes d'état du pipeline d'upload asynchrone des médias"""
+    columns = table_columns(connection, 'media')
+    if 'status' not in columns:
+        connection.execute(db.text("ALTER TABLE media ADD COLUMN status VARCHAR(20) NOT NULL DEFAULT 'ready'"))
+    if 'upload_error' not in columns:
+        connection.execute(db.text("ALTER TABLE media ADD COLUMN upload_error TEXT"))
+    if 'upload_attempts' not in columns:
+        connection.execute(db.text("ALTER TABLE media ADD COLUMN upload_attempts INTEGER NOT NULL DEFAULT 0"))
+    if 'upload_started_at' not in columns:
+        connection.execute(db.text(
+            "ALTER TABLE media ADD COLUMN upload_started_at "
+            + ("TIMESTAMP" if connection.dialect.name == 'postgresql' else "DATETIME")
+        ))
+    if 'spool_path' not in columns:
+        connection.execute(db.text("ALTER TABLE media ADD COLUMN spool_path VARCHAR(500)"))
+
+def migrate_media_content_hash(connection):
+    """Hachage du contenu et stockage d'origine des médias"""
+    columns = table_columns(connection, 'media')
+    if 'content_hash' not in columns:
+        connection.execute(db.text("ALTER TABLE media ADD COLUMN content_hash VARCHAR(64)"))
+    if 'storage_backend' not in columns:
+        connection.execute(db.text("ALTER TABLE media ADD COLUMN storage_backend VARCHAR(20)"))
+    create_index(connection, 'ix_media_content_hash', 'media', ['content_hash'])
+
+def migrate_media_variants(connection):
+    """Dérivés d'images (miniatures, WebP/AVIF) enregistrés sur le média"""
+    if 'variants' not in table_columns(connection, 'media'):
+        connection.execute(db.text("ALTER TABLE media ADD COLUMN variants TEXT"))
+
+def migrate_comment_submission_id(connection):
+    """Identifiant de soumission unique des commentaires (insertion idempotente depuis la file)"""
+    if 'submission_id' not in table_columns(connection, 'comment'):
+        connection.execute(db.text("ALTER TABLE comment ADD COLUMN submission_id VARCHAR(32)"))
+    create_index(connection, 'ux_comment_submission_id', 'comment', ['submission_id'], unique=True)
+
+def migrate_rating_previous_value(connection):
+    """Note précédente renvoyée par l'upsert des notes"""
+    if 'previous_rating' not in table_columns(connection, 'rating'):
+        connection.execute(db.text("ALTER TABLE rating ADD COLUMN previous_rating INTEGER"))
+
+# (version, nom, fonction(connection)) : ne jamais renuméroter une migration publiée
+MIGRATIONS = [
+    (1, 'media_cloudinary_columns', migrate_media_cloudinary_columns),
+    (2, 'read_path_indexes', migrate_read_path_indexes),
+    (3, 'media_upload_status', migrate_media_upload_status),
+    (4, 'media_content_hash', migrate_media_content_hash),
+    (5, 'media_variants', migrate_media_variants),
+    (6, 'comment_submission_id', migrate_comment_submission_id),
+    (7, 'rating_previous_value', migrate_rating_previous_value),
+]
+
+def run_migrations():
+    """Appliquer dans l'ordre les migrations pas encore enregistrées
+    
+    Chaque migration tourne en autocommit pour que les index PostgreSQL puissent
+    être construits en CONCURRENTLY ; elles sont idempotentes, une migration
+    interrompue est donc simplement rejouée. Les workers qui démarrent en même
+    temps sont sérialisés par un verrou (consultatif sur PostgreSQL, flock sinon).
+    """
+    applied = []
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        postgresql = connection.dialect.name == 'postgresql'
+        if postgresql:
+            connection.execute(db.text("SELECT pg_advisory_lock(:key)"), {'key': MIGRATION_LOCK_KEY})
+        try:
+            with nullcontext() if postgresql else catalog_file_lock('migrations'):
+                done = {row[0] for row in connection.execute(db.select(SchemaMigration.version))}
+                for version, name, migrate in MIGRATIONS:
+                    if version in done:
+                        continue
+                    migrate(connection)
+                    connection.execute(db.insert(SchemaMigration).values(
+                        version=version, name=name, applied_at=datetime.utcnow()
+                    ))
+                    applied.append(f"{version:04d}_{name}")
+                    print(f"Migration appliquée: {version:04d}_{name}")
+        finally:
+            if postgresql:
+                connection.execute(db.text("SELECT pg_advisory_unlock(:key)"), {'key': MIGRATION_LOCK_KEY})
+    return applied
+
+@app.cli.command('migrate-db')
+def migrate_db_command():
+    """Créer les tables manquantes et appliquer les migrations du schéma"""
+    db.create_all()
+    applied = run_migrations()
+    print(f"{len(applied)} migration(s) appliquée(s)" if applied else "Schéma à jour")
+
 # ==================== FONCTIONS UTILITAIRES ====================
 
 def allowed_file(filename):
@@ -260,128 +1173,1323 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def read_json_file(filename):
+    """Lire un fichier JSON du catalogue sur le disque (crée les données par défaut si absent)"""
+    file_path = os.path.join(DATA_DIR, filename)
+    if not os.path.exists(file_path):
+        # Créer le fichier avec des données par défaut si il n'existe pas
+        default_data = []
+        if filename == 'books.json':
+            default_data = [
+                {
+                    "id": 1,
+                    "title": "Guide du Développement Personnel",
+                    "description": "Un livre complet pour développer votre potentiel et atteindre vos objectifs personnels et professionnels.",
+                    "price": 19.99,
+                    "image": "/static/uploads/images/default-book.jpg",
+                    "category": "Développement personnel",
+                    "author": "Expert Dek.Dek",
+                    "pages": 250,
+                    "format": "PDF",
+                    "created_at": datetime.utcnow().isoformat()
+                },
+                {
+                    "id": 2,
+                    "title": "Maîtriser la Motivation",
+                    "description": "Découvrez les secrets pour maintenir votre motivation au plus haut niveau et surmonter tous les obstacles.",
+                    "price": 15.99,
+                    "image": "/static/uploads/images/default-book2.jpg",
+                    "category": "Motivation",
+                    "author": "Coach Dek.Dek",
+                    "pages": 180,
+                    "format": "PDF",
+                    "created_at": datetime.utcnow().isoformat()
+                }
+            ]
+        elif filename == 'quotes.json':
+            default_data = [
+                {
+                    "id": 1,
+                    "text": "Le succès n'est pas final, l'échec n'est pas fatal : c'est le courage de continuer qui compte.",
+                    "author": "Winston Churchill",
+                    "category": "Motivation",
+                    "created_at": datetime.utcnow().isoformat()
+                },
+                {
+                    "id": 2,
+                    "text": "La seule façon de faire du bon travail est d'aimer ce que vous faites.",
+                    "author": "Steve Jobs",
+                    "category": "Travail",
+                    "created_at": datetime.utcnow().isoformat()
+                },
+                {
+                    "id": 3,
+                    "text": "L'innovation distingue un leader d'un suiveur.",
+                    "author": "Steve Jobs",
+                    "category": "Leadership",
+                    "created_at": datetime.utcnow().isoformat()
+                }
+            ]
+        write_json_snapshot(filename, default_data)
+        return default_data
+        
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def write_json_snapshot(filename, data):
+    """Écrire un instantané JSON de façon atomique (fichier temporaire + rename)
+    
+    Les lecteurs voient soit l'ancien fichier complet, soit le nouveau, jamais
+    un fichier à moitié écrit.
+    """
+    file_path = os.path.join(DATA_DIR, filename)
+    directory = os.path.dirname(file_path)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{file_path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    fsync_directory(directory)
+
+def fsync_directory(directory):
+    """Rendre durable un rename dans un dossier (sans effet hors POSIX)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+class catalog_file_lock:
+    """Verrou inter-processus (flock) sérialisant les écritures d'un fichier du catalogue"""
+
+    def __init__(self, filename):
+        self.path = os.path.join(DATA_DIR, f"{filename}.lock")
+        self.fd = None
+
+    def __enter__(self):
+        self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        os.close(self.fd)
+        self.fd = None
+
+class CatalogCache:
+    """Cache en mémoire des fichiers JSON du catalogue, propre à chaque worker
+    
+    Chaque fichier est un instantané (books.json) complété par un journal
+    (books.json.journal) où chaque modification est ajoutée sous forme d'une
+    ligne JSON : {"op": "put", "item": {...}} ou {"op": "delete", "id": N}.
+    Les lecteurs rejouent le journal sur l'instantané ; quand seul le journal a
+    grandi, seules les nouvelles lignes sont lues. Le fichier n'est re-vérifié
+    qu'une fois toutes les check_interval secondes, ce qui borne le délai avant
+    qu'un worker voie les modifications faites par les autres.
+    
+    Au-delà de compact_threshold enregistrements, le journal est replié dans un
+    nouvel instantané écrit par rename, puis vidé.
+    """
+
+    def __init__(self, check_interval, compact_threshold):
+        self.check_interval = check_interval
+        self.compact_threshold = compact_threshold
+        self._entries = {}
+        self._lock = threading.RLock()
+        self.generation = None
+
+    def _path(self, filename):
+        return os.path.join(DATA_DIR, filename)
+
+    def _signature(self, path):
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _apply_record(self, entry, record):
+        if record.get('op') == 'put':
+            item = record['item']
+            entry['index'][item.get('id')] = item
+            if isinstance(item.get('id'), int):
+                entry['max_id'] = max(entry['max_id'], item['id'])
+        elif record.get('op') == 'delete':
+            entry['index'].pop(record.get('id'), None)
+
+    def _read_journal(self, entry, filename):
+        """Lire les lignes complètes du journal ajoutées depuis la dernière lecture"""
+        journal_path = self._path(f"{filename}.journal")
+        try:
+            with open(journal_path, 'rb') as f:
+                st = os.fstat(f.fileno())
+                if st.st_ino != entry['journal_inode'] or st.st_size < entry['journal_offset']:
+                    return False  # Journal remplacé ou vidé : relecture complète
+                f.seek(entry['journal_offset'])
+                data = f.read()
+        except FileNotFoundError:
+            return entry['journal_offset'] == 0
+        
+        # Ignorer une éventuelle dernière ligne incomplète (écriture en cours)
+        complete = data[:data.rfind(b'\n') + 1]
+        for line in complete.splitlines():
+            if line.strip():
+                self._apply_record(entry, json.loads(line))
+                entry['journal_records'] += 1
+        entry['journal_offset'] += len(complete)
+        return True
+
+    def _read_files(self, filename):
+        """Lire le journal puis l'instantané (journal_inode, journal_data, signature, items)
+        
+        Rejouer le journal sur l'instantané qui l'a déjà replié est idempotent,
+        mais pas sur un instantané plus récent (compaction ou store() entre les
+        deux lectures) : d'anciens enregistrements 'put' y feraient réapparaître
+        des éléments supprimés. La lecture est recommencée tant que l'instantané
+        ou le journal a changé pendant qu'on lisait.
+        """
+        snapshot_path = self._path(filename)
+        journal_path = self._path(f"{filename}.journal")
+        while True:
+            snapshot_signature = self._signature(snapshot_path)
+            try:
+                with open(journal_path, 'rb') as f:
+                    journal_inode = os.fstat(f.fileno()).st_ino
+                    journal_data = f.read()
+            except FileNotFoundError:
+                journal_inode, journal_data = None, b''
+            
+            items = read_json_file(filename)
+            if self._signature(snapshot_path) != snapshot_signature:
+                continue
+            journal_signature = self._signature(journal_path)
+            if journal_signature is None:
+                if journal_inode is None:
+                    return journal_inode, journal_data, snapshot_signature, items
+            elif journal_signature[0] == journal_inode and journal_signature[2] >= len(journal_data):
+                return journal_inode, journal_data, snapshot_signature, items
+
+    def _load(self, filename):
+        """Relecture complète de l'instantané et du journal"""
+        journal_inode, journal_data, snapshot_signature, items = self._read_files(filename)
+        
+        entry = {
+            'signature': snapshot_signature,
+            'journal_inode': journal_inode,
+            'journal_offset': 0,
+            'journal_records': 0,
+            'checked_at': time.monotonic(),
+            'index': {},
+            'max_id': 0
+        }
+        for item in items:
+            self._apply_record(entry, {'op': 'put', 'item': dict(item)})
+        
+        complete = journal_data[:journal_data.rfind(b'\n') + 1]
+        for line in complete.splitlines():
+            if line.strip():
+                self._apply_record(entry, json.loads(line))
+                entry['journal_records'] += 1
+        entry['journal_offset'] = len(complete)
+        return entry
+
+    def _refresh(self, filename):
+        entry = self._entries.get(filename)
+        if entry is None or self._signature(self._path(filename)) != entry['signature'] \
+                or not self._read_journal(entry, filename):
+            record_cache_access('catalog', False)
+            entry = self._load(filename)
+            self._entries[filename] = entry
+        else:
+            record_cache_access('catalog', True)
+        entry['checked_at'] = time.monotonic()
+        return entry
+
+    def get(self, filename):
+        entry = self._entries.get(filename)
+        if entry and time.monotonic() - entry['checked_at'] < self.check_interval:
+            record_cache_access('catalog', True)
+            return entry
+        
+        with self._lock:
+            return self._refresh(filename)
+
+    def apply(self, filename, make_records):
+        """Appliquer une modification sous verrou et la journaliser
+        
+        make_records(entry) retourne (enregistrements, résultat). Les
+        enregistrements sont ajoutés au journal avec un seul fsync.
+        """
+        with self._lock, catalog_file_lock(filename):
+            entry = self._refresh(filename)
+            records, result = make_records(entry)
+            if not records:
+                return result
+            
+            journal_path = self._path(f"{filename}.journal")
+            payload = b''.join(
+                json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
+                for record in records
+            )
+            with open(journal_path, 'ab') as f:
+                # Supprimer une ligne incomplète laissée par un worker interrompu
+                if entry['journal_inode'] == os.fstat(f.fileno()).st_ino \
+                        and f.tell() > entry['journal_offset']:
+                    f.truncate(entry['journal_offset'])
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+                entry['journal_inode'] = os.fstat(f.fileno()).st_ino
+                entry['journal_offset'] = f.tell()
+            
+            for record in records:
+                self._apply_record(entry, record)
+                entry['journal_records'] += 1
+            
+            if entry['journal_records'] >= self.compact_threshold:
+                self._compact(filename, entry)
+            return result
+
+    def _compact(self, filename, entry):
+        """Replier le journal dans un nouvel instantané (appelé sous verrou)"""
+        write_json_snapshot(filename, list(entry['index'].values()))
+        with open(self._path(f"{filename}.journal"), 'ab') as f:
+            f.truncate(0)
+            os.fsync(f.fileno())
+            entry['journal_inode'] = os.fstat(f.fileno()).st_ino
+        entry['signature'] = self._signature(self._path(filename))
+        entry['journal_offset'] = 0
+        entry['journal_records'] = 0
+
+    def compact(self, filename):
+        with self._lock, catalog_file_lock(filename):
+            self._compact(filename, self._refresh(filename))
+
+    def store(self, filename, items):
+        """Remplacer tout le contenu d'un fichier (instantané complet, journal vidé)"""
+        with self._lock, catalog_file_lock(filename):
+            entry = self._refresh(filename)
+            entry['index'] = {}
+            entry['max_id'] = 0
+            for item in items:
+                self._apply_record(entry, {'op': 'put', 'item': dict(item)})
+            self._compact(filename, entry)
+
+    def observe_generation(self, generation):
+        """Re-vérifier les fichiers dès que la génération 'catalog' a changé
+        
+        Un autre worker vient d'écrire : sans cela, une réponse mise en cache
+        sous la nouvelle génération pourrait être calculée sur des données
+        encore vieilles de check_interval secondes.
+        """
+        if generation == self.generation:
+            return
+        with self._lock:
+            self.generation = generation
+            for entry in self._entries.values():
+                entry['checked_at'] = float('-inf')
+
+    def invalidate(self, filename=None):
+        with self._lock:
+            if filename:
+                self._entries.pop(filename, None)
+            else:
+                self._entries.clear()
+
+catalog_cache = CatalogCache(
+    float(os.environ.get('CATALOG_CACHE_CHECK_INTERVAL', 2)),
+    int(os.environ.get('CATALOG_JOURNAL_COMPACT_THRESHOLD', 200))
+)
+
 def load_json_data(filename):
-    """Charger les données JSON avec gestion d'erreur"""
-    try:
-        file_path = os.path.join(BASE_DIR, 'data', filename)
-        if not os.path.exists(file_path):
-            # Créer le fichier avec des données par défaut si il n'existe pas
-            default_data = []
-            if filename == 'books.json':
-                default_data = [
-                    {
-                        "id": 1,
-                        "title": "Guide du Développement Personnel",
-                        "description": "Un livre complet pour développer votre potentiel et atteindre vos objectifs personnels et professionnels.",
-                        "price": 19.99,
-                        "image": "/static/uploads/images/default-book.jpg",
-                        "category": "Développement personnel",
-                        "author": "Expert Dek.Dek",
-                        "pages": 250,
-                        "format": "PDF",
-                        "created_at": datetime.utcnow().isoformat()
-                    },
-                    {
-                        "id": 2,
-                        "title": "Maîtriser la Motivation",
-                        "description": "Découvrez les secrets pour maintenir votre motivation au plus haut niveau et surmonter tous les obstacles.",
-                        "price": 15.99,
-                        "image": "/static/uploads/images/default-book2.jpg",
-                        "category": "Motivation",
-                        "author": "Coach Dek.Dek",
-                        "pages": 180,
-                        "format": "PDF",
-                        "created_at": datetime.utcnow().isoformat()
-                    }
-                ]
-            elif filename == 'quotes.json':
-                default_data = [
-                    {
-                        "id": 1,
-                        "text": "Le succès n'est pas final, l'échec n'est pas fatal : c'est le courage de continuer qui compte.",
-                        "author": "Winston Churchill",
-                        "category": "Motivation",
-                        "created_at": datetime.utcnow().isoformat()
-                    },
-                    {
-                        "id": 2,
-                        "text": "La seule façon de faire du bon travail est d'aimer ce que vous faites.",
-                        "author": "Steve Jobs",
-                        "category": "Travail",
-                        "created_at": datetime.utcnow().isoformat()
-                    },
-                    {
-                        "id": 3,
-                        "text": "L'innovation distingue un leader d'un suiveur.",
-                        "author": "Steve Jobs",
-                        "category": "Leadership",
-                        "created_at": datetime.utcnow().isoformat()
-                    }
-                ]
-            save_json_data(filename, default_data)
-            return default_data
+    """Charger les données JSON depuis le cache du catalogue (copies modifiables)"""
+    try:
+        entry = catalog_cache.get(filename)
+        return [dict(item) for item in entry['index'].values()]
+    except Exception as e:
+        print(f"Erreur lors du chargement de {filename}: {e}")
+        return []
+
+def get_catalog_item(filename, item_id):
+    """Récupérer un élément du catalogue par son ID en O(1) (copie modifiable)"""
+    try:
+        item = catalog_cache.get(filename)['index'].get(item_id)
+        return dict(item) if item else None
+    except Exception as e:
+        print(f"Erreur lors du chargement de {filename}: {e}")
+        return None
+
+def save_json_data(filename, data):
+    """Sauvegarder les données JSON (réécriture atomique complète du fichier)"""
+    try:
+        catalog_cache.store(filename, data)
+        bump_cache_generation('catalog')
+        return True
+    except Exception as e:
+        print(f"Erreur lors de la sauvegarde de {filename}: {e}")
+        return False
+
+def empty_content_stats():
+    """Statistiques par défaut d'un contenu sans commentaire ni note"""
+    return {
+        'comments_count': 0,
+        'ratings_count': 0,
+        'average_rating': 0
+    }
+
+def get_content_stats_bulk(content_type=None, content_ids=None):
+    """Obtenir les statistiques de plusieurs contenus depuis la table ContentStats
+    
+    Retourne un dictionnaire indexé par (content_type, content_id). Les contenus
+    sans commentaire ni note sont absents du dictionnaire.
+    """
+    stats = {}
+    try:
+        query = ContentStats.query
+        if content_type:
+            query = query.filter(ContentStats.content_type == content_type)
+        if content_ids is not None:
+            query = query.filter(ContentStats.content_id.in_(content_ids))
+        
+        for row in query:
+            stats[(row.content_type, row.content_id)] = row.to_dict()
+    except Exception as e:
+        print(f"Erreur lors du calcul des statistiques: {e}")
+    
+    return stats
+
+def get_content_stats(content_type, content_id):
+    """Obtenir les statistiques d'un contenu (commentaires et notes)"""
+    try:
+        row = db.session.get(ContentStats, (content_type, content_id))
+        return row.to_dict() if row else empty_content_stats()
+    except Exception as e:
+        print(f"Erreur lors du calcul des statistiques: {e}")
+        return empty_content_stats()
+
+def dialect_insert(model):
+    """INSERT propre au dialecte (ON CONFLICT disponible sur PostgreSQL et SQLite)"""
+    if db.engine.dialect.name == 'postgresql':
+        return postgresql_insert(model.__table__)
+    return sqlite_insert(model.__table__)
+
+def adjust_content_stats(content_type, content_id, **deltas):
+    """Ajuster les compteurs dénormalisés d'un contenu dans la transaction courante
+    
+    Un seul upsert (INSERT ... ON CONFLICT DO UPDATE col = col + delta) : la ligne
+    est créée au besoin et les écritures concurrentes des autres workers ne sont
+    pas perdues.
+    """
+    deltas = {column: delta for column, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    
+    invalidate_response_cache('stats')
+    table = ContentStats.__table__
+    now = datetime.utcnow()
+    stmt = dialect_insert(ContentStats).values(
+        content_type=content_type, content_id=content_id, updated_at=now, **deltas
+    )
+    values = {column: table.c[column] + stmt.excluded[column] for column in deltas}
+    values['updated_at'] = now
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=['content_type', 'content_id'], set_=values
+    ))
+    stats = db.session.identity_map.get(db.session.identity_key(ContentStats, (content_type, content_id)))
+    if stats is not None:
+        db.session.expire(stats)
+
+def rating_stats_deltas(old_rating, new_rating):
+    """Deltas de compteurs correspondant au passage d'une note old_rating -> new_rating"""
+    deltas = {}
+    if old_rating is None:
+        deltas['ratings_count'] = 1
+        deltas['ratings_sum'] = new_rating
+        deltas[f'rating_{new_rating}'] = 1
+    elif old_rating != new_rating:
+        deltas['ratings_sum'] = new_rating - old_rating
+        deltas[f'rating_{old_rating}'] = -1
+        deltas[f'rating_{new_rating}'] = 1
+    return deltas
+
+def rebuild_content_stats():
+    """Recalculer toutes les lignes ContentStats depuis les tables Comment et Rating"""
+    rows = {}
+    
+    def row_for(content_type, content_id):
+        return rows.setdefault((content_type, content_id), {
+            'content_type': content_type,
+            'content_id': content_id,
+            'ratings_count': 0,
+            'ratings_sum': 0,
+            'rating_1': 0,
+            'rating_2': 0,
+            'rating_3': 0,
+            'rating_4': 0,
+            'rating_5': 0,
+            'comments_count': 0
+        })
+    
+    comments_query = db.session.query(
+        Comment.content_type,
+        Comment.content_id,
+        db.func.count(Comment.id)
+    ).filter(Comment.is_approved == True).group_by(Comment.content_type, Comment.content_id)
+    for content_type, content_id, comments_count in comments_query:
+        row_for(content_type, content_id)['comments_count'] = comments_count
+    
+    ratings_query = db.session.query(
+        Rating.content_type,
+        Rating.content_id,
+        Rating.rating,
+        db.func.count(Rating.id)
+    ).group_by(Rating.content_type, Rating.content_id, Rating.rating)
+    for content_type, content_id, rating, ratings_count in ratings_query:
+        if not (1 <= rating <= 5):
+            continue
+        row = row_for(content_type, content_id)
+        row['ratings_count'] += ratings_count
+        row['ratings_sum'] += rating * ratings_count
+        row[f'rating_{rating}'] += ratings_count
+    
+    ContentStats.query.delete()
+    if rows:
+        db.session.bulk_insert_mappings(ContentStats, list(rows.values()))
+    invalidate_response_cache('stats')
+    db.session.commit()
+    return len(rows)
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recalculer les compteurs de commentaires et de notes (réparation des dérives)"""
+    count = rebuild_content_stats()
+    print(f"Statistiques recalculées pour {count} contenus")
+
+# ==================== CATALOGUE (LIVRES ET CITATIONS) ====================
+
+# Stockage du catalogue : 'database' (tables Book/Quote) ou 'json' (fichiers data/*.json)
+CATALOG_BACKEND = os.environ.get('CATALOG_BACKEND', 'database')
+CATALOG_FILES = {'book': 'books.json', 'quote': 'quotes.json'}
+
+def use_database_catalog():
+    return CATALOG_BACKEND != 'json'
+
+def catalog_model(kind):
+    return Book if kind == 'book' else Quote
+
+def parse_datetime(value):
+    """Convertir une date ISO du catalogue JSON en datetime"""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+def catalog_list(kind):
+    """Lister tous les éléments du catalogue"""
+    if use_database_catalog():
+        model = catalog_model(kind)
+        return [item.to_dict() for item in model.query.order_by(model.id)]
+    return load_json_data(CATALOG_FILES[kind])
+
+def catalog_list_with_stats(kind):
+    """Lister le catalogue avec les statistiques de chaque élément
+    
+    Avec la base de données, les statistiques sont jointes dans la même requête.
+    """
+    if use_database_catalog():
+        model = catalog_model(kind)
+        rows = db.session.query(model, ContentStats).outerjoin(
+            ContentStats,
+            db.and_(ContentStats.content_type == kind, ContentStats.content_id == model.id)
+        ).order_by(model.id)
+        
+        items = []
+        for item, stats in rows:
+            data = item.to_dict()
+            data.update(stats.to_dict() if stats else empty_content_stats())
+            items.append(data)
+        return items
+    
+    items = load_json_data(CATALOG_FILES[kind])
+    all_stats = get_content_stats_bulk(kind)
+    for item in items:
+        item_id = item.get('id')
+        if item_id:
+            item.update(all_stats.get((kind, item_id), empty_content_stats()))
+    return items
+
+# Pagination du catalogue (keyset) : taille de page par défaut et maximale
+CATALOG_PAGE_SIZE = int(os.environ.get('CATALOG_PAGE_SIZE', 50))
+CATALOG_PAGE_MAX = int(os.environ.get('CATALOG_PAGE_MAX', 200))
+CATALOG_SORTS = {
+    'book': ('id', 'date', 'rating', 'comments', 'price'),
+    'quote': ('id', 'date', 'rating', 'comments')
+}
+CATALOG_STATS_FIELDS = ('comments_count', 'ratings_count', 'average_rating')
+CATALOG_FIELDS = {
+    'book': ('id', 'title', 'description', 'price', 'image', 'category', 'author', 'pages', 'format',
+             'created_at', 'updated_at') + CATALOG_STATS_FIELDS,
+    'quote': ('id', 'text', 'author', 'category', 'created_at', 'updated_at') + CATALOG_STATS_FIELDS
+}
+
+def encode_cursor(sort, value, item_id):
+    """Encoder la position (tri, valeur, id) du dernier élément d'une page"""
+    raw = json.dumps([sort, value, item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, sort):
+    """Décoder un curseur ; ValueError s'il est invalide ou d'un autre tri"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        cursor_sort, value, item_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Curseur invalide')
+    if cursor_sort != sort or not isinstance(item_id, int):
+        raise ValueError('Curseur invalide pour ce tri')
+    return value, item_id
+
+def parse_page_limit(args):
+    """Lire le paramètre limit (borné à CATALOG_PAGE_MAX, ValueError si invalide)"""
+    try:
+        limit = int(args.get('limit', CATALOG_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit doit être un entier')
+    if limit < 1:
+        raise ValueError('limit doit être positif')
+    return min(limit, CATALOG_PAGE_MAX)
+
+def parse_catalog_page_args(kind, args):
+    """Lire limit, cursor, sort et fields depuis la requête (ValueError si invalides)"""
+    limit = parse_page_limit(args)
+    
+    sort = args.get('sort', 'id')
+    if sort.lstrip('-') not in CATALOG_SORTS[kind]:
+        raise ValueError(f"sort doit être parmi: {', '.join(CATALOG_SORTS[kind])}")
+    
+    fields = args.get('fields')
+    if fields:
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+        unknown = [f for f in fields if f not in CATALOG_FIELDS[kind]]
+        if unknown:
+            raise ValueError(f"Champs inconnus: {', '.join(unknown)} "
+                             f"(fields doit être parmi: {', '.join(CATALOG_FIELDS[kind])})")
+    
+    cursor = args.get('cursor')
+    return {
+        'limit': limit,
+        'sort': sort,
+        'after': decode_cursor(cursor, sort) if cursor else None,
+        'fields': fields or None
+    }
+
+def project_fields(item, fields):
+    """Ne garder que les champs demandés (l'ID est toujours inclus)"""
+    if not fields:
+        return item
+    return {key: item[key] for key in ['id'] + fields if key in item}
+
+def catalog_sort_value(sort_key, item):
+    """Valeur de tri d'un élément déjà sérialisé (avec statistiques)"""
+    if sort_key == 'id':
+        return item.get('id')
+    if sort_key == 'date':
+        return item.get('created_at') or ''
+    if sort_key == 'rating':
+        return float(item.get('average_rating') or 0)
+    if sort_key == 'comments':
+        return item.get('comments_count') or 0
+    return float(item.get('price') or 0)
+
+def catalog_page(kind, limit, sort='id', after=None, fields=None):
+    """Page du catalogue triée par (sort, id), à partir de la position after
+    
+    Retourne (éléments, next_cursor). Avec la base de données, le tri, la
+    jointure des statistiques et la limite sont faits en SQL.
+    """
+    descending = sort.startswith('-')
+    sort_key = sort.lstrip('-')
+    
+    if use_database_catalog():
+        model = catalog_model(kind)
+        sort_columns = {
+            'id': model.id,
+            'date': model.created_at,
+            'rating': db.case(
+                (ContentStats.ratings_count > 0,
+                 db.cast(ContentStats.ratings_sum, db.Float) / ContentStats.ratings_count),
+                else_=0.0
+            ),
+            'comments': db.func.coalesce(ContentStats.comments_count, 0),
+            'price': getattr(model, 'price', None)
+        }
+        column = sort_columns[sort_key]
+        
+        query = db.session.query(model, ContentStats, column).outerjoin(
+            ContentStats,
+            db.and_(ContentStats.content_type == kind, ContentStats.content_id == model.id)
+        )
+        
+        if after is not None:
+            value, last_id = after
+            if sort_key == 'date':
+                value = parse_datetime(value)
+            if sort_key == 'id':
+                query = query.filter(model.id < last_id if descending else model.id > last_id)
+            elif descending:
+                query = query.filter(db.or_(column < value, db.and_(column == value, model.id < last_id)))
+            else:
+                query = query.filter(db.or_(column > value, db.and_(column == value, model.id > last_id)))
+        
+        if sort_key == 'id':
+            order = [model.id.desc() if descending else model.id.asc()]
+        elif descending:
+            order = [column.desc(), model.id.desc()]
+        else:
+            order = [column.asc(), model.id.asc()]
+        
+        # La valeur de tri brute (moyenne non arrondie) sert à construire le curseur
+        rows = []
+        for item, stats, sort_value in query.order_by(*order).limit(limit + 1):
+            data = item.to_dict()
+            data.update(stats.to_dict() if stats else empty_content_stats())
+            if isinstance(sort_value, datetime):
+                sort_value = sort_value.isoformat()
+            rows.append((data, sort_value))
+    else:
+        # Fichier JSON : tri en mémoire sur le catalogue en cache
+        def position(item):
+            return (catalog_sort_value(sort_key, item), item.get('id') or 0)
+        
+        items = sorted(catalog_list_with_stats(kind), key=position, reverse=descending)
+        if after is not None:
+            start = tuple(after)
+            items = [item for item in items
+                     if (position(item) < start if descending else position(item) > start)]
+        rows = [(item, catalog_sort_value(sort_key, item)) for item in items[:limit + 1]]
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last, sort_value = rows[-1]
+        next_cursor = encode_cursor(sort, sort_value, last['id'])
+    
+    return [project_fields(item, fields) for item, sort_value in rows], next_cursor
+
+def catalog_get(kind, item_id):
+    """Récupérer un élément du catalogue par son ID (None si introuvable)"""
+    if use_database_catalog():
+        if not isinstance(item_id, int):
+            return None
+        item = db.session.get(catalog_model(kind), item_id)
+        return item.to_dict() if item else None
+    return get_catalog_item(CATALOG_FILES[kind], item_id)
+
+catalog_id_index = {}
+
+def catalog_ids(kind):
+    """IDs du catalogue, gardés en mémoire jusqu'à la prochaine invalidation 'catalog'"""
+    generation = cache_generation('catalog')
+    cached = catalog_id_index.get(kind)
+    record_cache_access('catalog_ids', bool(cached and cached[0] == generation))
+    if cached and cached[0] == generation:
+        return cached[1]
+    if use_database_catalog():
+        ids = frozenset(item_id for (item_id,) in db.session.query(catalog_model(kind).id))
+    else:
+        ids = frozenset(item['id'] for item in load_json_data(CATALOG_FILES[kind]))
+    catalog_id_index[kind] = (generation, ids)
+    return ids
+
+def catalog_exists(kind, item_id):
+    """Vérifier qu'un élément du catalogue existe (index des IDs en mémoire)"""
+    return type(item_id) is int and item_id in catalog_ids(kind)  # bool exclu (sous-classe d'int)
+
+def catalog_count(kind):
+    """Nombre d'éléments du catalogue"""
+    if use_database_catalog():
+        return catalog_model(kind).query.count()
+    return len(load_json_data(CATALOG_FILES[kind]))
+
+def catalog_add(kind, fields):
+    """Ajouter un élément au catalogue et le retourner"""
+    now = datetime.utcnow()
+    if use_database_catalog():
+        item = catalog_model(kind)(created_at=now, **fields)
+        try:
+            db.session.add(item)
+            invalidate_response_cache('catalog')
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return item.to_dict()
+    
+    # Fichier JSON : un enregistrement ajouté au journal, ID alloué sous verrou
+    def make_records(entry):
+        new_item = {'id': entry['max_id'] + 1}
+        new_item.update(fields)
+        new_item['created_at'] = now.isoformat()
+        return [{'op': 'put', 'item': new_item}], dict(new_item)
+    
+    result = catalog_cache.apply(CATALOG_FILES[kind], make_records)
+    bump_cache_generation('catalog')
+    return result
+
+def catalog_update(kind, item_id, fields):
+    """Modifier un élément du catalogue (None si introuvable)"""
+    now = datetime.utcnow()
+    if use_database_catalog():
+        item = db.session.get(catalog_model(kind), item_id)
+        if not item:
+            return None
+        try:
+            for key, value in fields.items():
+                setattr(item, key, value)
+            item.updated_at = now
+            invalidate_response_cache('catalog')
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return item.to_dict()
+    
+    def make_records(entry):
+        item = entry['index'].get(item_id)
+        if item is None:
+            return [], None
+        item = dict(item)
+        item.update(fields)
+        item['updated_at'] = now.isoformat()
+        return [{'op': 'put', 'item': item}], dict(item)
+    
+    result = catalog_cache.apply(CATALOG_FILES[kind], make_records)
+    bump_cache_generation('catalog')
+    return result
+
+def catalog_delete(kind, item_id):
+    """Supprimer un élément du catalogue (False si introuvable)"""
+    if use_database_catalog():
+        item = db.session.get(catalog_model(kind), item_id)
+        if not item:
+            return False
+        try:
+            db.session.delete(item)
+            invalidate_response_cache('catalog')
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return True
+    
+    def make_records(entry):
+        if item_id not in entry['index']:
+            return [], False
+        return [{'op': 'delete', 'id': item_id}], True
+    
+    result = catalog_cache.apply(CATALOG_FILES[kind], make_records)
+    bump_cache_generation('catalog')
+    return result
+
+def import_catalog_from_json():
+    """Importer les livres et citations de data/*.json dans la base (IDs conservés)
+    
+    Les éléments déjà présents en base sont ignorés, l'import peut donc être relancé.
+    """
+    imported = {}
+    for kind, filename in CATALOG_FILES.items():
+        model = catalog_model(kind)
+        columns = set(model.__table__.columns.keys())
+        existing_ids = {row[0] for row in db.session.query(model.id)}
+        
+        count = 0
+        for raw in load_json_data(filename):
+            if raw.get('id') is None or raw['id'] in existing_ids:
+                continue
+            values = {key: value for key, value in raw.items() if key in columns}
+            values['created_at'] = parse_datetime(raw.get('created_at')) or datetime.utcnow()
+            values['updated_at'] = parse_datetime(raw.get('updated_at'))
+            db.session.add(model(**values))
+            count += 1
+        
+        try:
+            invalidate_response_cache('catalog')
+            db.session.commit()
+        except IntegrityError:
+            # Import déjà effectué en parallèle par un autre worker
+            db.session.rollback()
+            count = 0
+        
+        # Recaler la séquence PostgreSQL après insertion d'IDs explicites
+        if count and db.engine.dialect.name == 'postgresql':
+            table = model.__tablename__
+            db.session.execute(db.text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+            ))
+            db.session.commit()
+        
+        imported[kind] = count
+    return imported
+
+@app.cli.command('compact-catalog')
+def compact_catalog_command():
+    """Replier les journaux du catalogue JSON dans leurs instantanés"""
+    for filename in CATALOG_FILES.values():
+        catalog_cache.compact(filename)
+    print("Journaux du catalogue compactés")
+
+@app.cli.command('import-catalog')
+def import_catalog_command():
+    """Importer le catalogue JSON (data/books.json, data/quotes.json) dans la base"""
+    imported = import_catalog_from_json()
+    print(f"Catalogue importé: {imported['book']} livres, {imported['quote']} citations")
+
+def public_users_with_counts(query):
+    """Sérialiser les utilisateurs publics d'une requête avec leurs compteurs
+    
+    Les nombres de commentaires et de notes viennent de sous-requêtes groupées
+    jointes à la requête : une seule requête SQL quel que soit le nombre
+    d'utilisateurs.
+    """
+    comment_counts = db.session.query(
+        Comment.user_id.label('user_id'),
+        db.func.count(Comment.id).label('count')
+    ).group_by(Comment.user_id).subquery()
+    rating_counts = db.session.query(
+        Rating.user_id.label('user_id'),
+        db.func.count(Rating.id).label('count')
+    ).group_by(Rating.user_id).subquery()
+    
+    rows = query.add_columns(
+        db.func.coalesce(comment_counts.c.count, 0),
+        db.func.coalesce(rating_counts.c.count, 0)
+    ).outerjoin(
+        comment_counts, comment_counts.c.user_id == PublicUser.id
+    ).outerjoin(
+        rating_counts, rating_counts.c.user_id == PublicUser.id
+    )
+    
+    return [user.to_dict(comments_count=comments_count, ratings_count=ratings_count)
+            for user, comments_count, ratings_count in rows]
+
+# ==================== CACHE DES RÉPONSES PUBLIQUES ====================
+
+# Générations partagées entre workers : un fichier par espace de noms dont la
+# date de modification change à chaque invalidation
+CACHE_GENERATION_DIR = os.path.join(DATA_DIR, 'cache')
+RESPONSE_CACHE_MAX_AGE = int(os.environ.get('RESPONSE_CACHE_MAX_AGE', 30))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', 512))
+PROCESS_STARTED_AT_NS = time.time_ns()  # Last-Modified des pages sans espace de noms (un rendu par déploiement)
+
+def cache_generation(namespace):
+    """Génération courante d'un espace de noms (catalog, stats, comments, media)"""
+    path = os.path.join(CACHE_GENERATION_DIR, f"{namespace}.gen")
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        bump_cache_generation(namespace)
+        return os.stat(path).st_mtime_ns
+
+def bump_cache_generation(namespace):
+    """Invalider immédiatement un espace de noms dans tous les workers"""
+    os.makedirs(CACHE_GENERATION_DIR, exist_ok=True)
+    path = os.path.join(CACHE_GENERATION_DIR, f"{namespace}.gen")
+    with open(path, 'a'):
+        pass
+    now = time.time_ns()
+    try:
+        # Garantir une génération différente même si deux invalidations tombent dans le même tick
+        if os.stat(path).st_mtime_ns >= now:
+            now = os.stat(path).st_mtime_ns + 1
+    except FileNotFoundError:
+        pass
+    os.utime(path, ns=(now, now))
+
+def invalidate_response_cache(*namespaces):
+    """Invalider des espaces de noms au commit de la transaction en cours
+    
+    Invalider après le commit évite qu'un autre worker remette en cache des
+    données pas encore validées.
+    """
+    db.session.info.setdefault('cache_invalidations', set()).update(namespaces)
+
+@event.listens_for(db.session, 'after_commit')
+def apply_cache_invalidations(session):
+    for namespace in session.info.pop('cache_invalidations', ()):
+        try:
+            bump_cache_generation(namespace)
+        except OSError as e:
+            print(f"Erreur lors de l'invalidation du cache {namespace}: {e}")
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_cache_invalidations(session):
+    session.info.pop('cache_invalidations', None)
+
+class ResponseCache:
+    """Cache LRU en mémoire des réponses publiques, propre à chaque worker"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, generations):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry['generations'] != generations:
+                record_cache_access('response', False)
+                return None
+            self._entries.move_to_end(key)
+            record_cache_access('response', True)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES)
+
+def cached_response(*namespaces):
+    """Mettre en cache une réponse JSON publique jusqu'à l'invalidation de ses espaces de noms
+    
+    Ajoute un ETag fort, Last-Modified et Cache-Control, et répond 304 aux
+    requêtes conditionnelles (If-None-Match / If-Modified-Since).
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            generations = tuple(cache_generation(namespace) for namespace in namespaces)
+            if 'catalog' in namespaces:
+                catalog_cache.observe_generation(generations[namespaces.index('catalog')])
+            key = (
+                request.endpoint,
+                tuple(sorted(kwargs.items())),
+                tuple(sorted(request.args.items(multi=True)))
+            )
             
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except Exception as e:
-        print(f"Erreur lors du chargement de {filename}: {e}")
-        return []
+            entry = response_cache.get(key, generations)
+            if entry is None:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                body = response.get_data()
+                entry = {
+                    'generations': generations,
+                    'body': body,
+                    'mimetype': response.mimetype,
+                    'etag': hashlib.sha256(body).hexdigest()[:32],
+                    'last_modified': datetime.utcfromtimestamp(max(generations, default=PROCESS_STARTED_AT_NS) / 1e9)
+                }
+                response_cache.set(key, entry)
+            
+            response = app.response_class(entry['body'], mimetype=entry['mimetype'])
+            response.set_etag(entry['etag'])
+            response.last_modified = entry['last_modified']
+            response.cache_control.public = True
+            response.cache_control.max_age = RESPONSE_CACHE_MAX_AGE
+            return response.make_conditional(request)
+        return decorated_function
+    return decorator
 
-def save_json_data(filename, data):
-    """Sauvegarder les données JSON"""
-    try:
-        file_path = os.path.join(BASE_DIR, 'data', filename)
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
-    except Exception as e:
-        print(f"Erreur lors de la sauvegarde de {filename}: {e}")
-        return False
+# ==================== PIPELINE DES FICHIERS STATIQUES (ASSETS) ====================
 
-def get_content_stats(content_type, content_id):
-    """Obtenir les statistiques d'un contenu (commentaires et notes)"""
-    try:
-        # Compter les commentaires approuvés
-        comments_count = Comment.query.filter_by(
-            content_type=content_type, 
-            content_id=content_id, 
-            is_approved=True
-        ).count()
+# Au démarrage, chaque fichier de static/ (hors uploads) est copié dans
+# data/assets sous un nom contenant le hash de son contenu, avec ses variantes
+# précompressées (.gz, .br). Ces URL ne changent jamais de contenu : elles sont
+# servies avec Cache-Control immutable et les navigateurs ne revalident plus.
+ASSET_BUILD_DIR = os.path.join(DATA_DIR, 'assets')
+ASSET_MAX_AGE = 365 * 24 * 3600
+ASSET_COMPRESSIBLE = {'.css', '.js', '.json', '.svg', '.txt', '.html', '.map'}
+ASSET_MIN_COMPRESS_SIZE = 256
+ASSET_HASHED_NAME = re.compile(r'^(.*)\.[0-9a-f]{12}(\.[^./]+)$')
+CSS_STATIC_URL = re.compile(r'''url\(\s*(['"]?)/static/([^'")\s]+)\1\s*\)''')
+
+def write_file_atomic(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+class AssetManifest:
+    """Correspondance chemin logique ('css/quotes.css') -> fichier fingerprinté et ses encodages"""
+
+    def __init__(self, static_dir, build_dir):
+        self.static_dir = static_dir
+        self.build_dir = build_dir
+        self.assets = {}
+        self.by_hashed = {}
+
+    def build(self):
+        sources = []
+        for root, dirs, files in os.walk(self.static_dir):
+            dirs[:] = [d for d in dirs if not (root == self.static_dir and d == 'uploads')]
+            for filename in files:
+                path = os.path.join(root, filename)
+                sources.append(os.path.relpath(path, self.static_dir).replace(os.sep, '/'))
         
-        # Calculer la note moyenne
-        ratings = Rating.query.filter_by(
-            content_type=content_type, 
-            content_id=content_id
-        ).all()
+        # Les CSS en dernier : leurs url(/static/...) pointent vers les fichiers déjà hachés
+        assets = {}
+        self.assets = assets
+        for logical in sorted(sources, key=lambda name: (name.endswith('.css'), name)):
+            with open(os.path.join(self.static_dir, logical), 'rb') as f:
+                content = f.read()
+            if logical.endswith('.css'):
+                content = CSS_STATIC_URL.sub(
+                    lambda match: f"url({match.group(1)}{self.url(match.group(2))}{match.group(1)})",
+                    content.decode('utf-8')
+                ).encode('utf-8')
+            assets[logical] = self.store(logical, content)
+        self.by_hashed = {asset['hashed']: asset for asset in assets.values()}
+        return len(assets)
+
+    def store(self, logical, content):
+        """Écrire un asset (et ses versions compressées) dans le dossier de build s'il n'y est pas"""
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        stem, extension = os.path.splitext(logical)
+        hashed = f"{stem}.{digest}{extension}"
+        path = os.path.join(self.build_dir, hashed)
+        if not os.path.exists(path):
+            write_file_atomic(path, content)
         
-        average_rating = 0
-        ratings_count = len(ratings)
-        if ratings_count > 0:
-            average_rating = sum(r.rating for r in ratings) / ratings_count
+        encodings = {}
+        if extension.lower() in ASSET_COMPRESSIBLE and len(content) >= ASSET_MIN_COMPRESS_SIZE:
+            compressors = {'gzip': ('.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))}
+            if brotli:
+                compressors['br'] = ('.br', lambda data: brotli.compress(data, quality=11))
+            for encoding, (suffix, compress) in compressors.items():
+                if not os.path.exists(path + suffix):
+                    write_file_atomic(path + suffix, compress(content))
+                if os.path.getsize(path + suffix) < len(content):
+                    encodings[encoding] = path + suffix
         
         return {
-            'comments_count': comments_count,
-            'ratings_count': ratings_count,
-            'average_rating': round(average_rating, 1)
-        }
-    except Exception as e:
-        print(f"Erreur lors du calcul des statistiques: {e}")
-        return {
-            'comments_count': 0,
-            'ratings_count': 0,
-            'average_rating': 0
+            'logical': logical,
+            'hashed': hashed,
+            'path': path,
+            'etag': digest,
+            'mimetype': mimetypes.guess_type(logical)[0] or 'application/octet-stream',
+            'encodings': encodings
         }
 
+    def url(self, logical):
+        asset = self.assets.get(logical)
+        return f"/assets/{asset['hashed']}" if asset else f"/static/{logical}"
+
+    def resolve(self, filename):
+        """Asset d'un nom fingerprinté ; (asset, immuable)
+        
+        Un hash inconnu (page d'un déploiement précédent) reçoit la version
+        courante, sans cache long.
+        """
+        asset = self.by_hashed.get(filename)
+        if asset:
+            return asset, True
+        match = ASSET_HASHED_NAME.match(filename)
+        logical = f"{match.group(1)}{match.group(2)}" if match else filename
+        return self.assets.get(logical), False
+
+asset_manifest = AssetManifest(app.static_folder, ASSET_BUILD_DIR)
+try:
+    asset_manifest.build()
+except Exception as e:
+    # Sans manifeste, asset_url() renvoie les URL /static/ d'origine
+    print(f"Erreur lors de la construction des assets: {e}")
+
+@app.template_global()
+def asset_url(logical):
+    """URL fingerprintée d'un fichier de static/ (ex. asset_url('css/quotes.css'))"""
+    return asset_manifest.url(logical)
+
+def send_asset(asset, immutable):
+    """Servir un asset dans le meilleur encodage accepté par le client"""
+    encoding = next(
+        (name for name in ('br', 'gzip') if name in asset['encodings'] and request.accept_encodings[name]),
+        None
+    )
+    path = asset['encodings'][encoding] if encoding else asset['path']
+    restore_etag_encoding_suffix()  # Les ETag des assets portent déjà leur encodage
+    response = send_file(
+        path,
+        mimetype=asset['mimetype'],
+        etag=f"{asset['etag']}-{encoding}" if encoding else asset['etag'],
+        conditional=True,
+        max_age=ASSET_MAX_AGE if immutable else 0
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+@app.route('/assets/<path:filename>')
+def serve_asset(filename):
+    """Servir un asset fingerprinté (cache d'un an, immuable)"""
+    asset, immutable = asset_manifest.resolve(filename)
+    if asset is None:
+        return "Fichier non trouvé", 404
+    return send_asset(asset, immutable)
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Fingerprinter et précompresser les fichiers de static/ (à lancer au déploiement)"""
+    count = asset_manifest.build()
+    compressed = sum(1 for asset in asset_manifest.assets.values() if asset['encodings'])
+    print(f"{count} assets construits dans {ASSET_BUILD_DIR} ({compressed} précompressés"
+          + ("" if brotli else ", brotli non installé : gzip seulement") + ")")
+
+# ==================== COMPRESSION DES RÉPONSES ====================
+
+# Réponses JSON et HTML compressées à la volée (brotli si le client l'accepte et
+# que le module est installé, sinon gzip). Les assets fingerprintés sont déjà
+# précompressés et les fichiers envoyés par send_file ne passent pas ici.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 500))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+COMPRESSION_EXCLUDED_TYPES = (
+    'image/', 'video/', 'audio/', 'font/woff', 'application/zip', 'application/gzip',
+    'application/pdf', 'application/octet-stream', 'application/x-brotli'
+)
+ETAG_ENCODING_SUFFIX = re.compile(r'-(gzip|br)(?="|$)')
+
+class StreamCompressor:
+    """Compresseur incrémental (gzip ou brotli) pour les réponses en streaming"""
+
+    def __init__(self, encoding):
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+            self.compress = self.compressor.process
+            self.flush = self.compressor.flush
+            self.finish = self.compressor.finish
+        else:
+            self.compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 : en-tête gzip
+            self.compress = self.compressor.compress
+            self.flush = lambda: self.compressor.flush(zlib.Z_SYNC_FLUSH)
+            self.finish = self.compressor.flush
+
+def compress_body(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESSION_BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+def compress_stream(chunks, encoding):
+    """Compresser un itérable de morceaux en vidant le compresseur après chacun"""
+    compressor = StreamCompressor(encoding)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = compressor.compress(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+def negotiate_encoding():
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+@app.before_request
+def strip_etag_encoding_suffix():
+    """Retirer le suffixe -gzip/-br des ETag conditionnels : les vues comparent l'ETag non compressé"""
+    if_none_match = request.environ.get('HTTP_IF_NONE_MATCH')
+    match = ETAG_ENCODING_SUFFIX.search(if_none_match or '')
+    if match:
+        g.etag_encoding = match.group(1)  # Remis sur l'ETag d'une réponse 304
+        g.raw_if_none_match = if_none_match
+        request.environ['HTTP_IF_NONE_MATCH'] = ETAG_ENCODING_SUFFIX.sub('', if_none_match)
+        request.__dict__.pop('if_none_match', None)
+
+def restore_etag_encoding_suffix():
+    """Rendre l'If-None-Match d'origine aux vues qui servent un fichier déjà encodé
+    
+    send_asset compare l'ETag par encodage ("<digest>-gzip") : le suffixe retiré
+    par strip_etag_encoding_suffix ne doit ni manquer à la comparaison ni être
+    rajouté par compress_response sur la réponse 304.
+    """
+    if g.pop('etag_encoding', None):
+        request.environ['HTTP_IF_NONE_MATCH'] = g.pop('raw_if_none_match')
+        request.__dict__.pop('if_none_match', None)
+
+@app.after_request
+def compress_response(response):
+    """Compresser les réponses textuelles selon Accept-Encoding"""
+    mimetype = response.mimetype or ''
+    if response.status_code == 304 and g.get('etag_encoding'):
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f"{etag}-{g.etag_encoding}", weak=weak)
+        return response
+    if (
+        response.direct_passthrough
+        or response.status_code < 200 or response.status_code in (204, 206, 304)
+        or request.method == 'HEAD'
+        or 'Content-Encoding' in response.headers
+        or 'no-transform' in response.headers.get('Cache-Control', '')
+        or mimetype.startswith(COMPRESSION_EXCLUDED_TYPES)
+    ):
+        return response
+    
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+    
+    if response.is_streamed:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_SIZE:
+            return response
+        compressed = compress_body(data, encoding)
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+    
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
+
 # ==================== ROUTES POUR FICHIERS STATIQUES ====================
 @app.route('/images/<filename>')
 def serve_image(filename):
     """Servir les images statiques"""
     try:
-        # Essayer d'abord dans static/images
-        static_images_path = os.path.join(app.static_folder, 'images')
-        if os.path.exists(os.path.join(static_images_path, filename)):
-            return send_from_directory(static_images_path, filename)
+        # Essayer d'abord les assets de static/images
+        asset = asset_manifest.assets.get(f"images/{filename}")
+        if asset:
+            return send_asset(asset, immutable=False)
         
         # Sinon essayer dans static/uploads/images
         upload_images_path = os.path.join(app.static_folder, 'uploads', 'images')
@@ -397,6 +2505,9 @@ def serve_image(filename):
 def serve_css(filename):
     """Servir les fichiers CSS"""
     try:
+        asset = asset_manifest.assets.get(f"css/{filename}")
+        if asset:
+            return send_asset(asset, immutable=False)
         css_path = os.path.join(app.static_folder, 'css')
         return send_from_directory(css_path, filename)
     except Exception as e:
@@ -406,38 +2517,72 @@ def serve_css(filename):
 def serve_js(filename):
     """Servir les fichiers JavaScript"""
     try:
+        asset = asset_manifest.assets.get(f"js/{filename}")
+        if asset:
+            return send_asset(asset, immutable=False)
         js_path = os.path.join(app.static_folder, 'js')
         return send_from_directory(js_path, filename)
     except Exception as e:
         return f"Erreur JS: {str(e)}", 500
 
 # ==================== ROUTES PUBLIQUES ====================
+
+# Les pages publiques sont rendues une fois puis servies depuis le cache des
+# réponses (ETag, 304) jusqu'à l'invalidation de leurs données. La première
+# page de données est intégrée au HTML : pas d'aller-retour vers l'API au
+# premier affichage.
+PUBLIC_BOOKS_PAGE_SIZE = 24
+PUBLIC_QUOTES_PAGE_SIZE = 30  # Même valeur que QUOTES_PAGE_SIZE dans static/js/quotes.js
+
+def featured_media_list():
+    return Media.query.filter_by(is_featured=True, status='ready').order_by(Media.uploaded_at.desc()).all()
+
 @app.route('/')
+@cached_response('media')
 def index():
-    """Page d'accueil avec médias en vedette"""
+    """Page d'accueil avec médias en vedette (intégrés à la page)"""
     try:
-        return render_template('public/index.html')
+        return render_template('public/index.html', initial_data={
+            'success': True,
+            'data': [media.to_dict() for media in featured_media_list()]
+        })
     except:
         # Fallback vers le fichier statique
         return send_from_directory(app.static_folder, 'index.html')
 
 @app.route('/livres')
+@cached_response('catalog', 'stats')
 def books_page():
-    """Page dédiée aux livres"""
+    """Page dédiée aux livres (première page du catalogue intégrée)"""
     try:
-        return render_template('public/books.html')
+        books, next_cursor = catalog_page('book', **parse_catalog_page_args('book', {'limit': PUBLIC_BOOKS_PAGE_SIZE}))
+        return render_template('public/books.html', page_size=PUBLIC_BOOKS_PAGE_SIZE, initial_data={
+            'success': True,
+            'data': books,
+            'next_cursor': next_cursor
+        })
     except:
         return "Page des livres en construction", 404
 
 @app.route('/citations')
+@cached_response('catalog')
 def quotes_page():
-    """Page dédiée aux citations"""
+    """Page dédiée aux citations (première page intégrée)"""
     try:
-        return render_template('public/quotes.html')
+        quotes, next_cursor = catalog_page('quote', **parse_catalog_page_args('quote', {
+            'limit': PUBLIC_QUOTES_PAGE_SIZE,
+            'fields': 'text,author,category'
+        }))
+        return render_template('public/quotes.html', initial_data={
+            'success': True,
+            'data': quotes,
+            'next_cursor': next_cursor
+        })
     except:
         return "Page des citations en construction", 404
 
 @app.route('/contact')
+@cached_response()
 def contact_page():
     """Page de contact"""
     try:
@@ -446,6 +2591,7 @@ def contact_page():
         return "Page de contact en construction", 404
 
 @app.route('/login')
+@cached_response()
 def login_page():
     """Page de connexion utilisateur"""
     try:
@@ -463,10 +2609,11 @@ def register_page():
 
 # ==================== API PUBLIQUE ====================
 @app.route('/api/featured-media')
+@cached_response('media')
 def get_featured_media():
     """API pour récupérer les médias en vedette pour la page d'accueil"""
     try:
-        featured_media = Media.query.filter_by(is_featured=True).order_by(Media.uploaded_at.desc()).all()
+        featured_media = featured_media_list()
         return jsonify({
             'success': True,
             'data': [media.to_dict() for media in featured_media],
@@ -479,22 +2626,30 @@ def get_featured_media():
         }), 500
 
 @app.route('/api/books')
+@cached_response('catalog', 'stats')
 def get_books():
-    """API pour récupérer la liste des livres avec statistiques"""
+    """API pour récupérer une page de livres avec statistiques
+    
+    Paramètres : limit, cursor (next_cursor de la page précédente), sort
+    (id, date, rating, comments, price, préfixe '-' pour l'ordre décroissant)
+    et fields (champs à retourner, séparés par des virgules).
+    """
     try:
-        books = load_json_data('books.json')
+        try:
+            page_args = parse_catalog_page_args('book', request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
-        # Ajouter les statistiques à chaque livre
-        for book in books:
-            book_id = book.get('id')
-            if book_id:
-                stats = get_content_stats('book', book_id)
-                book.update(stats)
+        books, next_cursor = catalog_page('book', **page_args)
         
         return jsonify({
             'success': True,
             'data': books,
-            'count': len(books)
+            'count': len(books),
+            'next_cursor': next_cursor
         })
     except Exception as e:
         return jsonify({
@@ -503,11 +2658,11 @@ def get_books():
         }), 500
 
 @app.route('/api/books/<int:book_id>')
+@cached_response('catalog', 'stats', 'comments')
 def get_book(book_id):
     """API pour récupérer un livre spécifique avec commentaires et notes"""
     try:
-        books = load_json_data('books.json')
-        book = next((b for b in books if b.get('id') == book_id), None)
+        book = catalog_get('book', book_id)
         if not book:
             return jsonify({
                 'success': False,
@@ -523,7 +2678,7 @@ def get_book(book_id):
             content_type='book', 
             content_id=book_id, 
             is_approved=True
-        ).order_by(Comment.created_at.desc()).all()
+        ).options(db.joinedload(Comment.author)).order_by(Comment.created_at.desc()).all()
         
         book['comments'] = [comment.to_dict() for comment in comments]
             
@@ -538,22 +2693,30 @@ def get_book(book_id):
         }), 500
 
 @app.route('/api/quotes')
+@cached_response('catalog', 'stats')
 def get_quotes():
-    """API pour récupérer la liste des citations avec statistiques"""
+    """API pour récupérer une page de citations avec statistiques
+    
+    Paramètres : limit, cursor (next_cursor de la page précédente), sort
+    (id, date, rating, comments, préfixe '-' pour l'ordre décroissant)
+    et fields (champs à retourner, séparés par des virgules).
+    """
     try:
-        quotes = load_json_data('quotes.json')
+        try:
+            page_args = parse_catalog_page_args('quote', request.args)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
         
-        # Ajouter les statistiques à chaque citation
-        for quote in quotes:
-            quote_id = quote.get('id')
-            if quote_id:
-                stats = get_content_stats('quote', quote_id)
-                quote.update(stats)
+        quotes, next_cursor = catalog_page('quote', **page_args)
         
         return jsonify({
             'success': True,
             'data': quotes,
-            'count': len(quotes)
+            'count': len(quotes),
+            'next_cursor': next_cursor
         })
     except Exception as e:
         return jsonify({
@@ -562,11 +2725,11 @@ def get_quotes():
         }), 500
 
 @app.route('/api/quotes/<int:quote_id>')
+@cached_response('catalog', 'stats', 'comments')
 def get_quote(quote_id):
     """API pour récupérer une citation spécifique avec commentaires"""
     try:
-        quotes = load_json_data('quotes.json')
-        quote = next((q for q in quotes if q.get('id') == quote_id), None)
+        quote = catalog_get('quote', quote_id)
         if not quote:
             return jsonify({
                 'success': False,
@@ -582,7 +2745,7 @@ def get_quote(quote_id):
             content_type='quote', 
             content_id=quote_id, 
             is_approved=True
-        ).order_by(Comment.created_at.desc()).all()
+        ).options(db.joinedload(Comment.author)).order_by(Comment.created_at.desc()).all()
         
         quote['comments'] = [comment.to_dict() for comment in comments]
             
@@ -736,6 +2899,236 @@ def get_current_user():
             'error': str(e)
         }), 500
 
+# ==================== FILE D'ATTENTE DES COMMENTAIRES ====================
+
+# Les commentaires soumis sont écrits dans un journal local (un par worker,
+# data/comment-queue/<pid>.journal) puis acquittés avec leur submission_id.
+# Un thread du worker insère les journaux en lots à intervalle court ou dès
+# COMMENT_FLUSH_BATCH commentaires. Un journal n'est supprimé qu'après le
+# commit : au redémarrage, les journaux restants (y compris ceux d'un worker
+# mort) sont rejoués, et l'index unique sur submission_id rend le rejeu sans
+# doublon. COMMENT_WRITE_BEHIND=0 revient à l'insertion synchrone.
+COMMENT_WRITE_BEHIND = os.environ.get('COMMENT_WRITE_BEHIND', '1') != '0'
+COMMENT_QUEUE_DIR = os.path.join(DATA_DIR, 'comment-queue')
+COMMENT_FLUSH_INTERVAL = float(os.environ.get('COMMENT_FLUSH_INTERVAL', 0.5))
+COMMENT_FLUSH_BATCH = int(os.environ.get('COMMENT_FLUSH_BATCH', 100))
+COMMENT_QUEUE_FSYNC = os.environ.get('COMMENT_QUEUE_FSYNC', '1') != '0'
+
+class CommentQueue:
+    """Journal d'écriture différée des commentaires d'un worker"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pid = None
+        self.fd = None
+        self.pending = 0
+        self.sequence = 0
+
+    def journal_path(self):
+        return os.path.join(self.directory, f"{os.getpid()}.journal")
+
+    def open_journal(self):
+        """Ouvrir le journal actif du worker, verrouillé tant que le worker vit"""
+        os.makedirs(self.directory, exist_ok=True)
+        while True:
+            fd = os.open(self.journal_path(), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+            if fcntl:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            # Un autre worker a pu traiter et supprimer le fichier avant le verrou
+            if same_file(fd, self.journal_path()):
+                break
+            os.close(fd)
+        self.fd = fd
+        self.pending = 0
+
+    def ensure_started(self):
+        """Ouvrir le journal et lancer le thread d'insertion (après le fork de gunicorn)"""
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.open_journal()
+            self.pid = os.getpid()
+            threading.Thread(target=self.run, name='comment-queue', daemon=True).start()
+
+    def submit(self, record):
+        """Écrire un commentaire dans le journal ; il est durable au retour"""
+        self.ensure_started()
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        with self.lock:
+            os.write(self.fd, line)
+            if COMMENT_QUEUE_FSYNC:
+                os.fsync(self.fd)
+            self.pending += 1
+            if self.pending >= COMMENT_FLUSH_BATCH:
+                self.wake.set()
+
+    def rotate(self):
+        """Passer le journal actif en attente d'insertion et en ouvrir un nouveau"""
+        with self.lock:
+            if not self.pending:
+                return
+            self.sequence += 1
+            os.rename(self.journal_path(), f"{self.journal_path()}.{self.sequence}.flushing")
+            os.close(self.fd)  # Libère aussi le verrou
+            self.open_journal()
+
+    def run(self):
+        while True:
+            self.wake.wait(COMMENT_FLUSH_INTERVAL)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erreur lors de l'insertion des commentaires en attente: {e}")
+
+    def flush(self):
+        """Insérer tous les journaux non verrouillés (les nôtres et ceux des workers morts)"""
+        if self.pid == os.getpid():
+            self.rotate()
+        if not os.path.isdir(self.directory):
+            return 0
+        inserted = 0
+        for filename in sorted(os.listdir(self.directory)):
+            if '.journal' not in filename or filename.endswith('.failed'):
+                continue
+            path = os.path.join(self.directory, filename)
+            try:
+                fd = os.open(path, os.O_RDWR)
+            except FileNotFoundError:
+                continue  # Traité entre-temps par un autre worker
+            try:
+                if fcntl:
+                    try:
+                        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue  # Journal actif d'un worker vivant
+                if not same_file(fd, path):
+                    continue
+                try:
+                    records, rejected = self.read_journal(path)
+                    inserted += self.insert_journal(records, rejected)
+                except Exception as e:
+                    # Erreur passagère (base indisponible...) : le journal est
+                    # conservé pour la prochaine tentative, les suivants sont traités
+                    print(f"Erreur lors de l'insertion du journal {filename}: {e}")
+                    continue
+                if rejected:
+                    self.set_aside(path, rejected)
+                os.remove(path)
+            finally:
+                os.close(fd)
+        return inserted
+
+    def read_journal(self, path):
+        """Enregistrements d'un journal et lignes illisibles
+        
+        Une dernière ligne sans saut de ligne a été interrompue en cours
+        d'écriture (le commentaire n'a pas été acquitté) : elle est ignorée.
+        """
+        with open(path, 'rb') as f:
+            lines = f.read().split(b'\n')
+        if lines[-1].strip():
+            print(f"Ligne incomplète ignorée à la fin du journal {os.path.basename(path)}")
+        records, rejected = [], []
+        for line in lines[:-1]:
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                rejected.append(line)
+        return records, rejected
+
+    def insert_journal(self, records, rejected):
+        """Insérer les enregistrements ; en cas d'enregistrement invalide, un par un
+        
+        Les enregistrements refusés sont ajoutés à rejected.
+        """
+        try:
+            return insert_queued_comments(records)
+        except QUEUED_COMMENT_ERRORS:
+            pass
+        inserted = 0
+        for record in records:
+            try:
+                inserted += insert_queued_comments([record])
+            except QUEUED_COMMENT_ERRORS as e:
+                print(f"Commentaire en attente refusé: {e}")
+                rejected.append(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+        return inserted
+
+    def set_aside(self, path, rejected):
+        """Conserver les lignes refusées dans <journal>.failed pour examen"""
+        with open(f"{path}.failed", 'ab') as f:
+            f.write(b''.join(line + b'\n' for line in rejected))
+        print(f"{len(rejected)} enregistrement(s) du journal {os.path.basename(path)} mis de côté dans {os.path.basename(path)}.failed")
+
+# Erreurs propres à un enregistrement (champ manquant, contrainte violée) :
+# les autres commentaires du journal sont tout de même insérés
+QUEUED_COMMENT_ERRORS = (KeyError, TypeError, ValueError, IntegrityError, DataError)
+
+comment_queue = CommentQueue(COMMENT_QUEUE_DIR)
+
+def same_file(fd, path):
+    """Le descripteur désigne-t-il toujours le fichier présent à ce chemin ?"""
+    try:
+        return os.path.samestat(os.fstat(fd), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+def insert_queued_comments(records):
+    """Insérer des commentaires en lots multi-lignes, en ignorant ceux déjà insérés"""
+    if not records:
+        return 0
+    inserted = 0
+    with app.app_context():
+        try:
+            for start in range(0, len(records), 500):
+                rows = [{
+                    'submission_id': record['submission_id'],
+                    'content': record['content'],
+                    'content_type': record['content_type'],
+                    'content_id': record['content_id'],
+                    'user_id': record['user_id'],
+                    'is_approved': False,
+                    'created_at': parse_datetime(record['created_at']),
+                    'updated_at': parse_datetime(record['created_at'])
+                } for record in records[start:start + 500]]
+                result = db.session.execute(
+                    dialect_insert(Comment).values(rows).on_conflict_do_nothing(index_elements=['submission_id'])
+                )
+                inserted += max(result.rowcount, 0)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+    return inserted
+
+@app.before_request
+def start_comment_queue():
+    """Rejouer les journaux restants au démarrage de chaque worker"""
+    if COMMENT_WRITE_BEHIND and comment_queue.pid != os.getpid():
+        comment_queue.ensure_started()
+        comment_queue.wake.set()
+
+@atexit.register
+def flush_comment_queue_at_exit():
+    if comment_queue.pid == os.getpid():
+        try:
+            comment_queue.flush()
+        except Exception as e:
+            print(f"Erreur lors de l'insertion des commentaires en attente: {e}")
+
+@app.cli.command('flush-comments')
+def flush_comments_command():
+    """Insérer immédiatement les commentaires en attente dans les journaux"""
+    count = comment_queue.flush()
+    print(f"{count} commentaire(s) inséré(s)")
+
 # ==================== API COMMENTAIRES ====================
 @app.route('/api/comments', methods=['POST'])
 @login_required
@@ -757,27 +3150,52 @@ def add_comment():
         
         # Vérifier que le contenu existe
         if data['content_type'] == 'book':
-            books = load_json_data('books.json')
-            if not any(b.get('id') == data['content_id'] for b in books):
+            if not catalog_exists('book', data['content_id']):
                 return jsonify({
                     'success': False,
                     'error': 'Livre non trouvé'
                 }), 404
         else:  # quote
-            quotes = load_json_data('quotes.json')
-            if not any(q.get('id') == data['content_id'] for q in quotes):
+            if not catalog_exists('quote', data['content_id']):
                 return jsonify({
                     'success': False,
                     'error': 'Citation non trouvée'
                 }), 404
         
+        if COMMENT_WRITE_BEHIND:
+            # Journaliser puis acquitter : l'insertion se fait en lot (voir CommentQueue)
+            record = {
+                'submission_id': uuid.uuid4().hex,
+                'content': data['content'].strip(),
+                'content_type': data['content_type'],
+                'content_id': data['content_id'],
+                'user_id': session['user_id'],
+                'created_at': datetime.utcnow().isoformat()
+            }
+            comment_queue.submit(record)
+            
+            # Même forme que la réponse 201 ; l'id n'existe qu'après l'insertion en lot
+            return jsonify({
+                'success': True,
+                'data': dict(
+                    record,
+                    id=None,
+                    username=session.get('username'),
+                    is_approved=False,
+                    updated_at=None,
+                    status='pending'
+                ),
+                'message': 'Commentaire reçu (en attente de modération)'
+            }), 202
+        
         # Créer le commentaire
         comment = Comment(
             content=data['content'].strip(),
             content_type=data['content_type'],
             content_id=data['content_id'],
             user_id=session['user_id'],
-            is_approved=False  # Nécessite une modération
+            is_approved=False,  # Nécessite une modération
+            submission_id=uuid.uuid4().hex
         )
         
         db.session.add(comment)
@@ -797,6 +3215,7 @@ def add_comment():
         }), 500
 
 @app.route('/api/comments/<content_type>/<int:content_id>')
+@cached_response('comments')
 def get_comments(content_type, content_id):
     """Récupérer les commentaires approuvés d'un contenu"""
     try:
@@ -810,7 +3229,7 @@ def get_comments(content_type, content_id):
             content_type=content_type,
             content_id=content_id,
             is_approved=True
-        ).order_by(Comment.created_at.desc()).all()
+        ).options(db.joinedload(Comment.author)).order_by(Comment.created_at.desc()).all()
         
         return jsonify({
             'success': True,
@@ -837,7 +3256,7 @@ def add_rating():
                 'error': 'Rating, content_type et content_id requis'
             }), 400
         
-        if not (1 <= data['rating'] <= 5):
+        if type(data['rating']) is not int or not (1 <= data['rating'] <= 5):
             return jsonify({
                 'success': False,
                 'error': 'La note doit être entre 1 et 5'
@@ -849,33 +3268,54 @@ def add_rating():
                 'error': 'content_type doit être "book" ou "quote"'
             }), 400
         
-        # Vérifier si l'utilisateur a déjà noté ce contenu
-        existing_rating = Rating.query.filter_by(
-            user_id=session['user_id'],
-            content_type=data['content_type'],
-            content_id=data['content_id']
-        ).first()
+        # Vérifier que le contenu existe (index des IDs en mémoire)
+        if not catalog_exists(data['content_type'], data['content_id']):
+            return jsonify({
+                'success': False,
+                'error': 'Livre non trouvé' if data['content_type'] == 'book' else 'Citation non trouvée'
+            }), 404
         
-        if existing_rating:
-            # Mettre à jour la note existante
-            existing_rating.rating = data['rating']
-            message = 'Note mise à jour'
-        else:
-            # Créer une nouvelle note
-            existing_rating = Rating(
-                rating=data['rating'],
-                content_type=data['content_type'],
-                content_id=data['content_id'],
-                user_id=session['user_id']
-            )
-            db.session.add(existing_rating)
-            message = 'Note ajoutée'
+        # Upsert en une requête : la note existante est conservée dans
+        # previous_rating, ce qui donne le delta à appliquer aux compteurs.
+        # Deux soumissions simultanées se sérialisent sur la contrainte
+        # d'unicité au lieu de lever une IntegrityError.
+        table = Rating.__table__
+        stmt = dialect_insert(Rating).values(
+            rating=data['rating'],
+            content_type=data['content_type'],
+            content_id=data['content_id'],
+            user_id=session['user_id'],
+            created_at=datetime.utcnow(),
+            previous_rating=None
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'content_type', 'content_id'],
+            set_={'previous_rating': table.c.rating, 'rating': stmt.excluded.rating}
+        ).returning(table.c.id, table.c.created_at, table.c.previous_rating)
+        row = db.session.execute(stmt).one()
+        old_rating = row.previous_rating
+        message = 'Note ajoutée' if old_rating is None else 'Note mise à jour'
         
+        # Mettre à jour les compteurs dans la même transaction
+        adjust_content_stats(
+            data['content_type'],
+            data['content_id'],
+            **rating_stats_deltas(old_rating, data['rating'])
+        )
         db.session.commit()
         
         return jsonify({
             'success': True,
-            'data': existing_rating.to_dict(),
+            'data': {
+                'id': row.id,
+                'rating': data['rating'],
+                'content_type': data['content_type'],
+                'content_id': data['content_id'],
+                'user_id': session['user_id'],
+                'username': session.get('username'),
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'previous_rating': old_rating
+            },
             'message': message
         })
         
@@ -887,6 +3327,7 @@ def add_rating():
         }), 500
 
 @app.route('/api/ratings/<content_type>/<int:content_id>')
+@cached_response('stats')
 def get_ratings(content_type, content_id):
     """Récupérer les statistiques de notes d'un contenu"""
     try:
@@ -896,17 +3337,14 @@ def get_ratings(content_type, content_id):
                 'error': 'content_type doit être "book" ou "quote"'
             }), 400
         
-        stats = get_content_stats(content_type, content_id)
-        
-        # Ajouter la distribution des notes
-        ratings = Rating.query.filter_by(
-            content_type=content_type,
-            content_id=content_id
-        ).all()
-        
-        distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
-        for rating in ratings:
-            distribution[rating.rating] += 1
+        # Statistiques et distribution des notes : une lecture par clé primaire
+        row = db.session.get(ContentStats, (content_type, content_id))
+        if row:
+            stats = row.to_dict()
+            distribution = row.distribution()
+        else:
+            stats = empty_content_stats()
+            distribution = {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
         
         return jsonify({
             'success': True,
@@ -994,7 +3432,379 @@ def admin_comments():
     """Gestion des commentaires"""
     return render_template('admin/comments.html')
 
+# ==================== PROFILAGE À LA DEMANDE ====================
+
+# Une session de profilage est décrite par data/profiler/config.json, partagé
+# par tous les workers : soit un pourcentage des requêtes (d'un endpoint ou de
+# toutes), soit les N prochaines requêtes (décomptées sous verrou), pour tous
+# les workers ou un seul PID. Pendant une requête retenue, un thread du worker
+# relève la pile du thread de la requête toutes les PROFILER_INTERVAL secondes.
+# Chaque worker écrit ses piles repliées dans data/profiler/<pid>.json ; les
+# routes d'administration les additionnent (format collapsed des flamegraphs
+# et tableau des fonctions les plus coûteuses). Sans session active, le coût
+# par requête se limite à un stat du fichier de configuration par seconde.
+PROFILER_DIR = os.path.join(DATA_DIR, 'profiler')
+PROFILER_CONFIG_PATH = os.path.join(PROFILER_DIR, 'config.json')
+PROFILER_INTERVAL = float(os.environ.get('PROFILER_INTERVAL', 0.005))
+PROFILER_CONFIG_CHECK_INTERVAL = 1.0
+PROFILER_MAX_DEPTH = 128
+PROFILER_MAX_DURATION = 3600
+
+class StackSampler:
+    """Échantillonneur de piles des requêtes profilées d'un worker"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.pid = None
+        self.threads = set()
+        self.session_id = None
+        self.stacks = Counter()
+        self.requests = 0
+        self.samples = 0
+
+    def begin(self, session_id, thread_id):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.pid = os.getpid()
+                self.threads.clear()
+                threading.Thread(target=self.run, name='stack-sampler', daemon=True).start()
+            if session_id != self.session_id:
+                self.session_id = session_id
+                self.stacks = Counter()
+                self.requests = 0
+                self.samples = 0
+            self.threads.add(thread_id)
+            self.wake.set()
+
+    def end(self, thread_id):
+        with self.lock:
+            self.threads.discard(thread_id)
+            self.requests += 1
+
+    def run(self):
+        while True:
+            self.wake.wait()
+            with self.lock:
+                thread_ids = list(self.threads)
+                if not thread_ids:
+                    self.wake.clear()
+                    continue
+            frames = sys._current_frames()
+            stacks = [collapse_stack(frames[thread_id]) for thread_id in thread_ids if thread_id in frames]
+            with self.lock:
+                for stack in stacks:
+                    self.stacks[stack] += 1
+                self.samples += len(stacks)
+            time.sleep(self.interval)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'session': self.session_id,
+                'pid': os.getpid(),
+                'requests': self.requests,
+                'samples': self.samples,
+                'stacks': dict(self.stacks)
+            }
+
+stack_sampler = StackSampler(PROFILER_INTERVAL)
+profiler_state = {'checked_at': 0.0, 'mtime': None, 'config': None}
+
+def collapse_stack(frame):
+    """Pile au format collapsed (racine d'abord, cadres séparés par ';')"""
+    names = []
+    while frame is not None and len(names) < PROFILER_MAX_DEPTH:
+        code = frame.f_code
+        filename = '/'.join(code.co_filename.replace(os.sep, '/').split('/')[-2:])  # flask/app.py plutôt que app.py
+        names.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+def read_profiler_config():
+    try:
+        with open(PROFILER_CONFIG_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_profiler_config(config):
+    os.makedirs(PROFILER_DIR, exist_ok=True)
+    tmp_path = f"{PROFILER_CONFIG_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    os.replace(tmp_path, PROFILER_CONFIG_PATH)
+
+def profiler_session_active(config):
+    return bool(config) and config.get('active') and config.get('expires_at', 0) > time.time() \
+        and config.get('remaining') != 0
+
+def active_profiler_config():
+    """Configuration de la session active (relue au plus une fois par seconde), sinon None"""
+    now = time.monotonic()
+    if now - profiler_state['checked_at'] >= PROFILER_CONFIG_CHECK_INTERVAL:
+        profiler_state['checked_at'] = now
+        try:
+            mtime = os.stat(PROFILER_CONFIG_PATH).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != profiler_state['mtime']:
+            profiler_state['mtime'] = mtime
+            profiler_state['config'] = read_profiler_config() if mtime else None
+    config = profiler_state['config']
+    return config if profiler_session_active(config) else None
+
+def claim_profiled_request(session_id):
+    """Décompter une des N requêtes à profiler (partagé entre workers)"""
+    with catalog_file_lock('profiler'):
+        config = read_profiler_config()
+        if not profiler_session_active(config) or config['id'] != session_id:
+            return False
+        config['remaining'] -= 1
+        write_profiler_config(config)
+    profiler_state['config'] = config
+    return True
+
+@app.before_request
+def start_request_profile():
+    config = active_profiler_config()
+    if config is None or request.path.startswith('/api/admin/profiler'):
+        return
+    if config.get('pid') and config['pid'] != os.getpid():
+        return
+    if config.get('endpoint') and config['endpoint'] != request.endpoint:
+        return
+    if config.get('remaining') is not None:
+        if not claim_profiled_request(config['id']):
+            return
+    elif random.random() * 100 >= config.get('sample_percent', 0):
+        return
+    g.profiled_thread = threading.get_ident()
+    stack_sampler.begin(config['id'], g.profiled_thread)
+
+@app.teardown_request
+def finish_request_profile(exc):
+    thread_id = g.pop('profiled_thread', None)
+    if thread_id is None:
+        return
+    stack_sampler.end(thread_id)
+    try:
+        os.makedirs(PROFILER_DIR, exist_ok=True)
+        path = os.path.join(PROFILER_DIR, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stack_sampler.snapshot(), f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Erreur lors de l'écriture du profil: {e}")
+
+def profiler_results(session_id):
+    """Piles additionnées des workers pour une session"""
+    results = {'requests': 0, 'samples': 0, 'workers': [], 'stacks': Counter()}
+    if not session_id or not os.path.isdir(PROFILER_DIR):
+        return results
+    for filename in os.listdir(PROFILER_DIR):
+        if not filename[:-len('.json')].isdigit() or not filename.endswith('.json'):
+            continue
+        snapshot = read_metrics_file(os.path.join(PROFILER_DIR, filename))
+        if not snapshot or snapshot.get('session') != session_id:
+            continue
+        results['requests'] += snapshot['requests']
+        results['samples'] += snapshot['samples']
+        results['workers'].append(snapshot['pid'])
+        results['stacks'].update(snapshot['stacks'])
+    results['workers'].sort()
+    return results
+
+def top_functions(stacks, limit):
+    """Fonctions par échantillons propres (en haut de pile) et cumulés"""
+    own, cumulative = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            cumulative[frame] += count
+    total = sum(stacks.values()) or 1
+    return [{
+        'function': function,
+        'self_samples': own[function],
+        'self_percent': round(100 * own[function] / total, 2),
+        'total_samples': cumulative[function],
+        'total_percent': round(100 * cumulative[function] / total, 2)
+    } for function in sorted(cumulative, key=lambda f: (-own[f], -cumulative[f]))[:limit]]
+
+@app.route('/api/admin/profiler')
+@admin_required
+def admin_profiler_status():
+    """Session de profilage en cours (ou dernière) et volume collecté"""
+    try:
+        config = read_profiler_config()
+        results = profiler_results(config['id'] if config else None)
+        return jsonify({
+            'success': True,
+            'data': {
+                'config': config,
+                'active': bool(profiler_session_active(config)),
+                'requests': results['requests'],
+                'samples': results['samples'],
+                'workers': results['workers'],
+                'endpoints': sorted(app.view_functions)
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/admin/profiler/start', methods=['POST'])
+@admin_required
+def admin_profiler_start():
+    """Démarrer une session : sample_percent (0-100] ou requests (N prochaines requêtes)"""
+    try:
+        data = request.json or {}
+        endpoint = data.get('endpoint') or None
+        if endpoint is not None and endpoint not in app.view_functions:
+            return jsonify({
+                'success': False,
+                'error': f'Endpoint inconnu: {endpoint}'
+            }), 400
+        
+        config = {
+            'id': uuid.uuid4().hex,
+            'active': True,
+            'endpoint': endpoint,
+            'pid': int(data['pid']) if data.get('pid') else None,
+            'started_at': time.time(),
+            'expires_at': time.time() + min(float(data.get('duration') or 300), PROFILER_MAX_DURATION),
+            'interval': PROFILER_INTERVAL
+        }
+        if data.get('requests'):
+            config['remaining'] = config['requests'] = int(data['requests'])
+            if config['remaining'] < 1:
+                raise ValueError('requests doit être positif')
+        else:
+            config['sample_percent'] = float(data.get('sample_percent') or 0)
+            if not 0 < config['sample_percent'] <= 100:
+                raise ValueError('sample_percent doit être entre 0 et 100')
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
+    try:
+        with catalog_file_lock('profiler'):
+            if profiler_session_active(read_profiler_config()):
+                return jsonify({
+                    'success': False,
+                    'error': 'Une session de profilage est déjà en cours (arrêtez-la d\'abord)'
+                }), 409
+            # Les résultats d'une session précédente sont remplacés
+            if os.path.isdir(PROFILER_DIR):
+                for filename in os.listdir(PROFILER_DIR):
+                    if filename != 'config.json' and filename.endswith('.json'):
+                        os.remove(os.path.join(PROFILER_DIR, filename))
+            write_profiler_config(config)
+        return jsonify({
+            'success': True,
+            'data': config,
+            'message': 'Profilage démarré'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/admin/profiler/stop', methods=['POST'])
+@admin_required
+def admin_profiler_stop():
+    """Arrêter la session (les résultats restent téléchargeables)"""
+    try:
+        with catalog_file_lock('profiler'):
+            config = read_profiler_config()
+            if config:
+                config['active'] = False
+                write_profiler_config(config)
+        return jsonify({
+            'success': True,
+            'data': config,
+            'message': 'Profilage arrêté'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/admin/profiler/collapsed')
+@admin_required
+def admin_profiler_collapsed():
+    """Piles repliées (flamegraph.pl, speedscope, inferno)"""
+    config = read_profiler_config()
+    stacks = profiler_results(config['id'] if config else None)['stacks']
+    body = ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+    response = app.response_class(body, mimetype='text/plain')
+    response.headers['Content-Disposition'] = 'attachment; filename="profile.collapsed.txt"'
+    return response
+
+@app.route('/api/admin/profiler/top')
+@admin_required
+def admin_profiler_top():
+    """Fonctions les plus coûteuses (JSON, ou CSV avec ?format=csv)"""
+    try:
+        limit = min(int(request.args.get('limit', 50)), 1000)
+    except ValueError:
+        limit = 50
+    config = read_profiler_config()
+    results = profiler_results(config['id'] if config else None)
+    rows = top_functions(results['stacks'], limit)
+    
+    if request.args.get('format') == 'csv':
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=['function', 'self_samples', 'self_percent',
+                                                    'total_samples', 'total_percent'])
+        writer.writeheader()
+        writer.writerows(rows)
+        response = app.response_class(output.getvalue(), mimetype='text/csv')
+        response.headers['Content-Disposition'] = 'attachment; filename="profile-top.csv"'
+        return response
+    
+    return jsonify({
+        'success': True,
+        'data': rows,
+        'samples': results['samples'],
+        'requests': results['requests']
+    })
+
 # ==================== API ADMINISTRATION ====================
+@app.route('/api/admin/db-pool')
+@admin_required
+def admin_db_pool():
+    """État du pool de connexions de ce worker et temps d'attente des checkouts"""
+    try:
+        pool = db.engine.pool
+        data = pool_metrics.to_dict()
+        data.update({
+            'pid': os.getpid(),
+            'pool_class': type(pool).__name__,
+            'pool_size': pool.size() if hasattr(pool, 'size') else None,
+            'checked_in': pool.checkedin() if hasattr(pool, 'checkedin') else None,
+            'checked_out': pool.checkedout() if hasattr(pool, 'checkedout') else None,
+            'overflow': pool.overflow() if hasattr(pool, 'overflow') else None
+        })
+        return jsonify({
+            'success': True,
+            'data': data
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/admin/stats')
 @admin_required
 def admin_stats():
@@ -1017,8 +3827,6 @@ def admin_stats():
         # Statistiques des notes
         total_ratings = Rating.query.count()
         
-        books = load_json_data('books.json')
-        quotes = load_json_data('quotes.json')
         
         return jsonify({
             'success': True,
@@ -1028,8 +3836,8 @@ def admin_stats():
                 'regular_users': total_users - admin_users,
                 'total_public_users': total_public_users,
                 'active_public_users': active_public_users,
-                'total_books': len(books),
-                'total_quotes': len(quotes),
+                'total_books': catalog_count('book'),
+                'total_quotes': catalog_count('quote'),
                 'total_media': total_media,
                 'featured_media': featured_media,
                 'total_comments': total_comments,
@@ -1045,27 +3853,228 @@ def admin_stats():
         }), 500
 
 # ==================== API MODÉRATION COMMENTAIRES ====================
+def filtered_comments_query(args):
+    """Requête des commentaires filtrée selon les paramètres de modération
+    
+    Filtres : status (all, pending, approved), content_type, content_id,
+    user_id, username, date_from et date_to (dates ISO 8601, bornes incluses).
+    ValueError si un filtre est invalide.
+    """
+    query = Comment.query
+    
+    status = args.get('status', 'all')
+    if status == 'pending':
+        query = query.filter(Comment.is_approved == False)
+    elif status == 'approved':
+        query = query.filter(Comment.is_approved == True)
+    elif status != 'all':
+        raise ValueError('status doit être "all", "pending" ou "approved"')
+    
+    content_type = args.get('content_type')
+    if content_type and content_type != 'all':
+        if content_type not in ['book', 'quote']:
+            raise ValueError('content_type doit être "book" ou "quote"')
+        query = query.filter(Comment.content_type == content_type)
+    
+    for param, column in [('content_id', Comment.content_id), ('user_id', Comment.user_id)]:
+        value = args.get(param)
+        if value not in (None, ''):
+            try:
+                query = query.filter(column == int(value))
+            except (TypeError, ValueError):
+                raise ValueError(f'{param} doit être un entier')
+    
+    username = args.get('username')
+    if username:
+        query = query.filter(Comment.user_id.in_(
+            db.session.query(PublicUser.id).filter(PublicUser.username == username)
+        ))
+    
+    date_from = args.get('date_from')
+    if date_from:
+        start = parse_datetime(date_from)
+        if start is None:
+            raise ValueError('date_from doit être une date ISO 8601')
+        query = query.filter(Comment.created_at >= start)
+    
+    date_to = args.get('date_to')
+    if date_to:
+        end = parse_datetime(date_to)
+        if end is None:
+            raise ValueError('date_to doit être une date ISO 8601')
+        if len(date_to) == 10:
+            # Date seule : inclure toute la journée
+            query = query.filter(Comment.created_at < end + timedelta(days=1))
+        else:
+            query = query.filter(Comment.created_at <= end)
+    
+    return query
+
 @app.route('/api/admin/comments')
 @admin_required
 def admin_get_comments():
-    """Récupérer tous les commentaires pour modération"""
+    """Récupérer une page de commentaires pour modération
+    
+    Voir filtered_comments_query() pour les filtres. Les commentaires sont
+    triés du plus récent au plus ancien ; limit et cursor (next_cursor de la
+    page précédente) paginent par clé (created_at, id).
+    """
+    try:
+        try:
+            query = filtered_comments_query(request.args)
+            limit = parse_page_limit(request.args)
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor, 'created_at') if cursor else None
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
+        if after is not None:
+            created_at, last_id = after
+            created_at = parse_datetime(created_at)
+            query = query.filter(db.or_(
+                Comment.created_at < created_at,
+                db.and_(Comment.created_at == created_at, Comment.id < last_id)
+            ))
+        
+        # Auteurs chargés dans la même requête (pas de requête par commentaire)
+        comments = query.options(db.joinedload(Comment.author)).order_by(
+            Comment.created_at.desc(),
+            Comment.id.desc()
+        ).limit(limit + 1).all()
+        
+        next_cursor = None
+        if len(comments) > limit:
+            comments = comments[:limit]
+            last = comments[-1]
+            next_cursor = encode_cursor('created_at', last.created_at.isoformat(), last.id)
+        
+        return jsonify({
+            'success': True,
+            'data': [comment.to_dict() for comment in comments],
+            'count': len(comments),
+            'next_cursor': next_cursor
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+# Actions de modération en masse : (état d'approbation visé, libellé du résultat)
+BULK_COMMENT_ACTIONS = {
+    'approve': (True, 'approved'),
+    'reject': (False, 'rejected'),
+    'delete': (None, 'deleted')
+}
+
+@app.route('/api/admin/comments/bulk', methods=['POST'])
+@admin_required
+def admin_bulk_moderate_comments():
+    """Approuver, rejeter ou supprimer des commentaires en masse
+    
+    Corps JSON : {"action": "approve" | "reject" | "delete"} avec soit
+    "ids" (liste d'IDs), soit "filter" (mêmes filtres que GET
+    /api/admin/comments, par ex. {"status": "pending", "username": "x"}).
+    Les modifications sont appliquées par un seul UPDATE/DELETE et les
+    compteurs ContentStats sont ajustés dans la même transaction.
+    """
     try:
-        status = request.args.get('status', 'all')  # all, pending, approved
+        data = request.json
+        if not data or data.get('action') not in BULK_COMMENT_ACTIONS:
+            return jsonify({
+                'success': False,
+                'error': 'action doit être "approve", "reject" ou "delete"'
+            }), 400
+        
+        action = data['action']
+        target_state, result_label = BULK_COMMENT_ACTIONS[action]
+        ids = data.get('ids')
+        filters = data.get('filter')
         
-        query = Comment.query
-        if status == 'pending':
-            query = query.filter_by(is_approved=False)
-        elif status == 'approved':
-            query = query.filter_by(is_approved=True)
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+                return jsonify({
+                    'success': False,
+                    'error': 'ids doit être une liste d\'entiers'
+                }), 400
+            query = Comment.query.filter(Comment.id.in_(ids))
+        elif isinstance(filters, dict) and filters:
+            try:
+                query = filtered_comments_query(filters)
+            except ValueError as e:
+                return jsonify({
+                    'success': False,
+                    'error': str(e)
+                }), 400
+        else:
+            return jsonify({
+                'success': False,
+                'error': 'ids ou filter requis'
+            }), 400
+        
+        # Lignes concernées, verrouillées jusqu'au commit (PostgreSQL)
+        matched = query.with_entities(
+            Comment.id,
+            Comment.content_type,
+            Comment.content_id,
+            Comment.is_approved
+        ).with_for_update().all()
+        
+        if target_state is None:
+            changed_rows = matched
+        else:
+            changed_rows = [row for row in matched if bool(row.is_approved) != target_state]
+        changed_ids = [row.id for row in changed_rows]
+        
+        # Compteurs à ajuster : seuls les commentaires approuvés comptent
+        deltas = {}
+        for row in changed_rows:
+            delta = 1 if target_state else (-1 if row.is_approved else 0)
+            if delta:
+                key = (row.content_type, row.content_id)
+                deltas[key] = deltas.get(key, 0) + delta
+        
+        if changed_ids:
+            changed_query = Comment.query.filter(Comment.id.in_(changed_ids))
+            if target_state is None:
+                changed_query.delete(synchronize_session=False)
+            else:
+                changed_query.update({
+                    Comment.is_approved: target_state,
+                    Comment.updated_at: datetime.utcnow()
+                }, synchronize_session=False)
         
-        comments = query.order_by(Comment.created_at.desc()).all()
+        for (content_type, content_id), delta in deltas.items():
+            adjust_content_stats(content_type, content_id, comments_count=delta)
+        
+        invalidate_response_cache('comments')
+        db.session.commit()
+        
+        # Résultat par ID
+        changed = set(changed_ids)
+        matched_ids = [row.id for row in matched]
+        requested_ids = ids if ids is not None else matched_ids
+        known = set(matched_ids)
+        results = [{
+            'id': comment_id,
+            'status': result_label if comment_id in changed else ('unchanged' if comment_id in known else 'not_found')
+        } for comment_id in requested_ids]
         
         return jsonify({
             'success': True,
-            'data': [comment.to_dict() for comment in comments],
-            'count': len(comments)
+            'data': {
+                'action': action,
+                'matched': len(matched_ids),
+                'changed': len(changed),
+                'results': results
+            },
+            'message': f'{len(changed)} commentaire(s) traité(s)'
         })
     except Exception as e:
+        db.session.rollback()
         return jsonify({
             'success': False,
             'error': str(e)
@@ -1083,7 +4092,10 @@ def admin_approve_comment(comment_id):
                 'error': 'Commentaire non trouvé'
             }), 404
         
+        if not comment.is_approved:
+            adjust_content_stats(comment.content_type, comment.content_id, comments_count=1)
         comment.is_approved = True
+        invalidate_response_cache('comments')
         db.session.commit()
         
         return jsonify({
@@ -1110,7 +4122,10 @@ def admin_reject_comment(comment_id):
                 'error': 'Commentaire non trouvé'
             }), 404
         
+        if comment.is_approved:
+            adjust_content_stats(comment.content_type, comment.content_id, comments_count=-1)
         comment.is_approved = False
+        invalidate_response_cache('comments')
         db.session.commit()
         
         return jsonify({
@@ -1137,7 +4152,10 @@ def admin_delete_comment(comment_id):
                 'error': 'Commentaire non trouvé'
             }), 404
         
+        if comment.is_approved:
+            adjust_content_stats(comment.content_type, comment.content_id, comments_count=-1)
         db.session.delete(comment)
+        invalidate_response_cache('comments')
         db.session.commit()
         
         return jsonify({
@@ -1157,10 +4175,10 @@ def admin_delete_comment(comment_id):
 def admin_get_public_users():
     """Récupérer tous les utilisateurs publics"""
     try:
-        users = PublicUser.query.order_by(PublicUser.created_at.desc()).all()
+        users = public_users_with_counts(PublicUser.query.order_by(PublicUser.created_at.desc()))
         return jsonify({
             'success': True,
-            'data': [user.to_dict() for user in users],
+            'data': users,
             'count': len(users)
         })
     except Exception as e:
@@ -1197,6 +4215,458 @@ def admin_toggle_user_status(user_id):
             'error': str(e)
         }), 500
 
+# ==================== PIPELINE D'UPLOAD DES MÉDIAS ====================
+
+# La requête ne fait qu'écrire le fichier dans data/spool et créer le Media en
+# 'pending' ; un pool de threads par worker l'envoie ensuite au stockage.
+MEDIA_STORAGE = os.environ.get('MEDIA_STORAGE', 'cloudinary')  # 'cloudinary' ou 'local'
+MEDIA_SPOOL_DIR = os.path.join(DATA_DIR, 'spool')
+MEDIA_UPLOAD_WORKERS = int(os.environ.get('MEDIA_UPLOAD_WORKERS', 2))
+MEDIA_UPLOAD_RETRIES = int(os.environ.get('MEDIA_UPLOAD_RETRIES', 3))
+MEDIA_UPLOAD_RETRY_DELAY = float(os.environ.get('MEDIA_UPLOAD_RETRY_DELAY', 2))
+MEDIA_UPLOAD_STALE_SECONDS = int(os.environ.get('MEDIA_UPLOAD_STALE_SECONDS', 1800))  # Upload abandonné par un worker mort
+MEDIA_CHUNKED_THRESHOLD = int(os.environ.get('MEDIA_CHUNKED_THRESHOLD', 20 * 1024 * 1024))
+MEDIA_CHUNK_SIZE = int(os.environ.get('MEDIA_CHUNK_SIZE', 6 * 1024 * 1024))
+DEFAULT_BOOK_IMAGE = '/static/uploads/images/default-book.jpg'
+
+class CloudinaryStorage:
+    """Stockage des médias sur Cloudinary (upload découpé pour les gros fichiers)
+    
+    Les clés sont de la forme '<dossier>/<sha256>.<extension>' ; Cloudinary
+    n'attend l'extension dans le public_id que pour les fichiers bruts (raw).
+    """
+
+    name = 'cloudinary'
+
+    def public_id(self, key, resource_type):
+        return f"dek-dek/{key if resource_type == 'raw' else os.path.splitext(key)[0]}"
+
+    def upload(self, path, key, resource_type):
+        size = os.path.getsize(path)
+        options = {
+            'resource_type': resource_type,
+            'public_id': self.public_id(key, resource_type),
+            'overwrite': True
+        }
+        if size > MEDIA_CHUNKED_THRESHOLD:
+            result = cloudinary.uploader.upload_large(path, chunk_size=MEDIA_CHUNK_SIZE, **options)
+        else:
+            result = cloudinary.uploader.upload(path, **options)
+        return {
+            'url': result['secure_url'],
+            'public_id': result['public_id'],
+            'bytes': result.get('bytes', size)
+        }
+
+    def find(self, key, resource_type):
+        """Fichier déjà présent sous cette clé (None sinon) : évite de renvoyer le contenu"""
+        try:
+            result = cloudinary.api.resource(self.public_id(key, resource_type), resource_type=resource_type)
+        except cloudinary.exceptions.NotFound:
+            return None
+        return {
+            'url': result['secure_url'],
+            'public_id': result['public_id'],
+            'bytes': result.get('bytes', 0)
+        }
+
+    def delete(self, public_id, resource_type):
+        cloudinary.uploader.destroy(public_id, resource_type=resource_type, invalidate=True)
+
+class LocalStorage:
+    """Stockage des médias dans static/uploads (hors ligne, tests, installation locale)"""
+
+    name = 'local'
+
+    def __init__(self, root, base_url):
+        self.root = root
+        self.base_url = base_url
+
+    def describe(self, key):
+        return {
+            'url': f"{self.base_url}/{key}",
+            'public_id': key,
+            'bytes': os.path.getsize(os.path.join(self.root, key))
+        }
+
+    def upload(self, path, key, resource_type):
+        destination = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        tmp_path = f"{destination}.{uuid.uuid4().hex[:8]}.tmp"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, destination)
+        return self.describe(key)
+
+    def find(self, key, resource_type):
+        if not os.path.exists(os.path.join(self.root, key)):
+            return None
+        return self.describe(key)
+
+    def delete(self, public_id, resource_type):
+        path = os.path.join(self.root, public_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+MEDIA_STORAGES = {
+    'cloudinary': CloudinaryStorage(),
+    'local': LocalStorage(UPLOAD_FOLDER, '/static/uploads')
+}
+media_storage = MEDIA_STORAGES.get(MEDIA_STORAGE, MEDIA_STORAGES['cloudinary'])
+
+def media_file_type(filename):
+    """Type de média et resource_type du stockage selon l'extension"""
+    extension = filename.rsplit('.', 1)[1].lower()
+    if extension in ['jpg', 'jpeg', 'png', 'gif']:
+        return 'image', 'image'
+    if extension in ['mp4', 'avi', 'mov', 'webm']:
+        return 'video', 'video'
+    return 'document', 'raw'
+
+def media_storage_for(media):
+    """Stockage qui contient le fichier d'un média (Cloudinary pour les anciens médias)"""
+    return MEDIA_STORAGES.get(media.storage_backend or 'cloudinary', media_storage)
+
+def find_stored_copy(content_hash, exclude_id=None):
+    """Média prêt ayant le même contenu dans le stockage courant"""
+    query = Media.query.filter(
+        Media.content_hash == content_hash,
+        Media.status == 'ready',
+        Media.storage_backend == media_storage.name
+    )
+    if exclude_id is not None:
+        query = query.filter(Media.id != exclude_id)
+    return query.first()
+
+def mark_media_stored(media, result):
+    media.filename = result['public_id']
+    media.cloudinary_url = result['url']
+    media.cloudinary_public_id = result['public_id']
+    media.file_size = result['bytes']
+    media.storage_backend = media_storage.name
+    media.status = 'ready'
+    media.upload_error = None
+    media.spool_path = None
+
+def spool_media_upload(file, title='', description='', is_featured=False, folder=None):
+    """Écrire un fichier reçu dans le spool et créer son Media en attente
+    
+    Le contenu est haché pendant l'écriture : si le même fichier est déjà
+    stocké, le Media est créé directement 'ready' sur la copie existante et
+    aucun transfert n'a lieu. Sinon il est 'pending' et submit_media_upload()
+    doit être appelé après le commit.
+    """
+    original_filename = secure_filename(file.filename)
+    file_type, _ = media_file_type(original_filename)
+    extension = original_filename.rsplit('.', 1)[1].lower()
+    
+    # data/spool/<dossier du stockage>/<nom> : le dossier cible reste dans le chemin
+    folder = folder or f"{file_type}s"
+    spool_name = f"{uuid.uuid4().hex}.{extension}"
+    spool_path = os.path.join(MEDIA_SPOOL_DIR, folder, spool_name)
+    os.makedirs(os.path.dirname(spool_path), exist_ok=True)
+    digest = hashlib.sha256()
+    with open(spool_path, 'wb') as f:
+        for chunk in iter(lambda: file.stream.read(1024 * 1024), b''):
+            digest.update(chunk)
+            f.write(chunk)
+    
+    media = Media(
+        filename=spool_name,
+        original_filename=original_filename,
+        file_type=file_type,
+        cloudinary_url='',
+        file_size=os.path.getsize(spool_path),
+        title=title,
+        description=description,
+        is_featured=is_featured,
+        content_hash=digest.hexdigest(),
+        status='pending',
+        spool_path=f"{folder}/{spool_name}"
+    )
+    
+    existing = find_stored_copy(media.content_hash)
+    if existing:
+        mark_media_stored(media, {
+            'url': existing.cloudinary_url,
+            'public_id': existing.cloudinary_public_id,
+            'bytes': existing.file_size
+        })
+        media.variants = existing.variants
+        os.remove(spool_path)
+        invalidate_response_cache('media')
+    
+    db.session.add(media)
+    return media
+
+# Dérivés d'images : largeurs et formats produits à l'upload (Pillow requis)
+IMAGE_VARIANT_WIDTHS = [int(width) for width in os.environ.get('IMAGE_VARIANT_WIDTHS', '160,320,640,1024').split(',')]
+IMAGE_VARIANT_FORMATS = os.environ.get('IMAGE_VARIANT_FORMATS', 'avif,webp').split(',')
+IMAGE_VARIANT_QUALITY = int(os.environ.get('IMAGE_VARIANT_QUALITY', 75))
+IMAGE_FORMAT_EXTENSIONS = {'avif': 'avif', 'webp': 'webp', 'jpeg': 'jpg', 'png': 'png'}
+
+def image_variant_formats(image):
+    """Formats modernes disponibles, plus un format de repli lisible partout"""
+    formats = [fmt for fmt in IMAGE_VARIANT_FORMATS if fmt and pil_features.check(fmt)]
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    return formats + ['png' if has_alpha else 'jpeg']
+
+def image_variant_sizes(image):
+    """Largeurs à produire : celles inférieures à l'original, plus l'original plafonné"""
+    widths = {width for width in IMAGE_VARIANT_WIDTHS if width < image.width}
+    widths.add(min(image.width, max(IMAGE_VARIANT_WIDTHS)))
+    return [(width, max(1, round(image.height * width / image.width))) for width in sorted(widths)]
+
+def render_image_variants(path, output_dir, stem):
+    """Écrire les dérivés d'une image dans output_dir ; renvoie [(fichier, width, height, format)]
+    
+    Les GIF animés sont laissés tels quels (un dérivé n'en garderait que la première image).
+    """
+    rendered = []
+    with Image.open(path) as original:
+        if getattr(original, 'is_animated', False):
+            return rendered
+        image = ImageOps.exif_transpose(original)
+        formats = image_variant_formats(image)
+        for width, height in image_variant_sizes(image):
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                frame = resized
+                if fmt == 'jpeg' and frame.mode not in ('RGB', 'L'):
+                    frame = frame.convert('RGB')
+                elif frame.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+                    frame = frame.convert('RGBA')
+                filename = f"{stem}-{width}.{IMAGE_FORMAT_EXTENSIONS[fmt]}"
+                frame.save(os.path.join(output_dir, filename), fmt.upper(), quality=IMAGE_VARIANT_QUALITY, optimize=True)
+                rendered.append((filename, width, height, fmt))
+    return rendered
+
+def generate_image_variants(path, folder, content_hash, storage=None):
+    """Produire et stocker les dérivés d'une image (miniatures, tailles responsive, WebP/AVIF)"""
+    if Image is None:
+        return []
+    storage = storage or media_storage
+    variants = []
+    work_dir = os.path.join(MEDIA_SPOOL_DIR, 'variants', uuid.uuid4().hex)
+    os.makedirs(work_dir, exist_ok=True)
+    try:
+        for filename, width, height, fmt in render_image_variants(path, work_dir, content_hash):
+            # Le format fait partie de la clé : Cloudinary ignore l'extension des images
+            key = f"{folder}/{content_hash}-{width}-{fmt}.{IMAGE_FORMAT_EXTENSIONS[fmt]}"
+            result = storage.find(key, 'image') or storage.upload(os.path.join(work_dir, filename), key, 'image')
+            variants.append({
+                'width': width,
+                'height': height,
+                'format': fmt,
+                'url': result['url'],
+                'public_id': result['public_id'],
+                'bytes': result['bytes']
+            })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return variants
+
+def claim_media_upload(media_id):
+    """Réserver un upload en attente (ou abandonné) pour ce thread ; False si déjà pris"""
+    stale_before = datetime.utcnow() - timedelta(seconds=MEDIA_UPLOAD_STALE_SECONDS)
+    claimed = Media.query.filter(
+        Media.id == media_id,
+        db.or_(
+            Media.status == 'pending',
+            db.and_(Media.status == 'uploading', Media.upload_started_at < stale_before)
+        )
+    ).update({
+        'status': 'uploading',
+        'upload_started_at': datetime.utcnow(),
+        'upload_attempts': Media.upload_attempts + 1
+    }, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+def process_media_upload(media_id):
+    """Envoyer un média du spool vers le stockage, avec reprises, puis le passer en 'ready'"""
+    with app.app_context():
+        try:
+            if not claim_media_upload(media_id):
+                return
+            media = db.session.get(Media, media_id)
+            folder, spool_name = media.spool_path.split('/', 1)
+            path = os.path.join(MEDIA_SPOOL_DIR, folder, spool_name)
+            _, resource_type = media_file_type(spool_name)
+            # Clé adressée par le contenu : un fichier déjà stocké n'est pas renvoyé
+            key = f"{folder}/{media.content_hash}{os.path.splitext(spool_name)[1]}"
+            
+            existing = find_stored_copy(media.content_hash, exclude_id=media.id)
+            if existing:
+                result = {
+                    'url': existing.cloudinary_url,
+                    'public_id': existing.cloudinary_public_id,
+                    'bytes': existing.file_size
+                }
+            else:
+                try:
+                    result = media_storage.find(key, resource_type)
+                except Exception as e:
+                    print(f"Erreur lors de la recherche du fichier {key}: {e}")
+                    result = None
+            
+            attempt = 0
+            while result is None:
+                try:
+                    result = media_storage.upload(path, key, resource_type)
+                except Exception as e:
+                    if attempt >= MEDIA_UPLOAD_RETRIES or not os.path.exists(path):
+                        raise
+                    print(f"Erreur upload média {media_id} (tentative {attempt + 1}): {e}")
+                    time.sleep(MEDIA_UPLOAD_RETRY_DELAY * 2 ** attempt)
+                    attempt += 1
+            
+            mark_media_stored(media, result)
+            if existing:
+                media.variants = existing.variants
+            elif media.file_type == 'image':
+                try:
+                    media.variants = json.dumps(generate_image_variants(path, folder, media.content_hash))
+                except Exception as e:
+                    # Les dérivés sont facultatifs : l'original reste servi
+                    print(f"Erreur lors de la génération des dérivés du média {media_id}: {e}")
+            invalidate_response_cache('media')
+            db.session.commit()
+            os.remove(path)
+        except Exception as e:
+            print(f"Échec de l'upload du média {media_id}: {e}")
+            db.session.rollback()
+            Media.query.filter_by(id=media_id).update(
+                {'status': 'failed', 'upload_error': str(e)}, synchronize_session=False
+            )
+            db.session.commit()
+
+media_upload_executor = None
+media_upload_executor_pid = None
+media_upload_executor_lock = threading.Lock()
+
+def get_media_upload_executor():
+    """Pool de threads d'upload du worker courant (recréé après un fork)"""
+    global media_upload_executor, media_upload_executor_pid
+    with media_upload_executor_lock:
+        if media_upload_executor_pid != os.getpid():
+            media_upload_executor = ThreadPoolExecutor(
+                max_workers=MEDIA_UPLOAD_WORKERS, thread_name_prefix='media-upload'
+            )
+            media_upload_executor_pid = os.getpid()
+            for (media_id,) in db.session.query(Media.id).filter(Media.status.in_(['pending', 'uploading'])):
+                media_upload_executor.submit(process_media_upload, media_id)
+        return media_upload_executor
+
+def submit_media_upload(media_id):
+    get_media_upload_executor().submit(process_media_upload, media_id)
+
+@app.before_request
+def start_media_upload_workers():
+    """Reprendre dans chaque worker les uploads interrompus par un redémarrage"""
+    if media_upload_executor_pid != os.getpid():
+        get_media_upload_executor()
+
+@app.cli.command('process-uploads')
+def process_uploads_command():
+    """Traiter immédiatement les uploads de médias en attente"""
+    pending = [media_id for (media_id,) in db.session.query(Media.id).filter(Media.status.in_(['pending', 'uploading']))]
+    for media_id in pending:
+        process_media_upload(media_id)
+    print(f"{len(pending)} upload(s) traité(s)")
+
+@app.cli.command('generate-variants')
+def generate_variants_command():
+    """Produire les dérivés des images déjà stockées qui n'en ont pas"""
+    if Image is None:
+        print("Pillow n'est pas installé : aucun dérivé produit")
+        return
+    count = 0
+    for media in Media.query.filter(Media.file_type == 'image', Media.status == 'ready', Media.variants.is_(None)):
+        storage = media_storage_for(media)
+        extension = os.path.splitext(media.original_filename)[1]
+        path = os.path.join(MEDIA_SPOOL_DIR, f"backfill-{media.id}{extension}")
+        os.makedirs(MEDIA_SPOOL_DIR, exist_ok=True)
+        try:
+            if isinstance(storage, LocalStorage):
+                shutil.copyfile(os.path.join(storage.root, media.cloudinary_public_id), path)
+            else:
+                urllib.request.urlretrieve(media.cloudinary_url, path)
+            if media.content_hash:
+                content_hash = media.content_hash
+            else:
+                with open(path, 'rb') as f:
+                    content_hash = hashlib.sha256(f.read()).hexdigest()
+            # Dossier du stockage : avant-dernier segment du public_id ('dek-dek/books/<id>' -> 'books')
+            parts = (media.cloudinary_public_id or '').split('/')
+            folder = parts[-2] if len(parts) > 1 else 'images'
+            media.variants = json.dumps(generate_image_variants(path, folder, content_hash, storage))
+            db.session.commit()
+            count += 1
+        except Exception as e:
+            db.session.rollback()
+            print(f"Erreur lors de la génération des dérivés du média {media.id}: {e}")
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+    invalidate_response_cache('media')
+    db.session.commit()
+    print(f"Dérivés produits pour {count} image(s)")
+
+@app.cli.command('optimize-static-images')
+def optimize_static_images_command():
+    """Produire les dérivés WebP/AVIF des images de static/images (à committer avec elles)"""
+    if Image is None:
+        print("Pillow n'est pas installé : aucun dérivé produit")
+        return
+    images_dir = os.path.join(app.static_folder, 'images')
+    for filename in sorted(os.listdir(images_dir)):
+        stem, extension = os.path.splitext(filename)
+        if extension.lower() not in ('.png', '.jpg', '.jpeg'):
+            continue
+        rendered = render_image_variants(os.path.join(images_dir, filename), images_dir, stem)
+        # Le format de repli reste l'original
+        for name, width, height, fmt in rendered:
+            if fmt in ('jpeg', 'png'):
+                os.remove(os.path.join(images_dir, name))
+            else:
+                print(f"{name} ({width}x{height})")
+
+@app.route('/media/<int:media_id>')
+def media_redirect(media_id):
+    """Rediriger vers le fichier d'un média (image par défaut tant qu'il n'est pas prêt)
+    
+    Avec ?w=<largeur>, redirige vers le plus petit dérivé au moins aussi large,
+    au format le plus compact accepté par le navigateur (en-tête Accept).
+    """
+    media = db.session.get(Media, media_id)
+    if media is None:
+        return jsonify({
+            'success': False,
+            'error': 'Média non trouvé'
+        }), 404
+    if media.status != 'ready':
+        response = redirect(DEFAULT_BOOK_IMAGE)
+        response.cache_control.no_cache = True
+        return response
+    response = redirect(pick_image_variant(media, request.args.get('w', type=int), request.accept_mimetypes))
+    response.cache_control.public = True
+    response.cache_control.max_age = 3600
+    response.vary.add('Accept')
+    return response
+
+def pick_image_variant(media, width, accept_mimetypes):
+    """URL du dérivé adapté à la largeur demandée et aux formats acceptés"""
+    variants = media.variant_list()
+    if not width or not variants:
+        return media.cloudinary_url
+    for fmt in IMAGE_VARIANT_FORMATS + ['jpeg', 'png']:
+        if fmt in ('avif', 'webp') and f"image/{fmt}" not in accept_mimetypes.values():
+            continue
+        candidates = sorted((v for v in variants if v['format'] == fmt), key=lambda v: v['width'])
+        if candidates:
+            return next((v['url'] for v in candidates if v['width'] >= width), candidates[-1]['url'])
+    return media.cloudinary_url
+
 # ==================== API GESTION MÉDIAS (INCHANGÉE) ====================
 @app.route('/api/admin/media', methods=['GET'])
 @admin_required
@@ -1218,7 +4688,7 @@ def admin_get_media():
 @app.route('/api/admin/media/upload', methods=['POST'])
 @admin_required
 def admin_upload_media():
-    """Upload de fichiers média via Cloudinary"""
+    """Upload de fichiers média (envoi asynchrone vers le stockage)"""
     try:
         if 'file' not in request.files:
             return jsonify({
@@ -1238,51 +4708,25 @@ def admin_upload_media():
             }), 400
         
         if file and allowed_file(file.filename):
-            # Sécuriser le nom de fichier
-            original_filename = secure_filename(file.filename)
-            file_extension = original_filename.rsplit('.', 1)[1].lower()
-            
-            # Déterminer le type de fichier
-            if file_extension in ['jpg', 'jpeg', 'png', 'gif']:
-                file_type = 'image'
-                resource_type = 'image'
-            elif file_extension in ['mp4', 'avi', 'mov', 'webm']:
-                file_type = 'video'
-                resource_type = 'video'
-            else:
-                file_type = 'document'
-                resource_type = 'raw'
-            
-            # Upload vers Cloudinary
-            upload_result = cloudinary.uploader.upload(
-                file,
-                resource_type=resource_type,
-                folder=f"dek-dek/{file_type}s",
-                public_id=f"{uuid.uuid4().hex}",
-                overwrite=True
-            )
-            
-            # Enregistrer en base de données
-            media = Media(
-                filename=upload_result['public_id'],
-                original_filename=original_filename,
-                file_type=file_type,
-                cloudinary_url=upload_result['secure_url'],
-                cloudinary_public_id=upload_result['public_id'],
-                file_size=upload_result.get('bytes', 0),
-                title=title,
-                description=description,
-                is_featured=is_featured
-            )
-            
-            db.session.add(media)
+            # Écrire le fichier dans le spool : l'envoi au stockage se fait en arrière-plan
+            media = spool_media_upload(file, title=title, description=description, is_featured=is_featured)
             db.session.commit()
             
+            if media.status == 'ready':
+                # Contenu déjà stocké : aucun transfert
+                return jsonify({
+                    'success': True,
+                    'data': media.to_dict(),
+                    'message': 'Fichier déjà stocké, média créé'
+                }), 201
+            
+            submit_media_upload(media.id)
             return jsonify({
                 'success': True,
                 'data': media.to_dict(),
-                'message': 'Fichier uploadé avec succès'
-            }), 201
+                'status_url': url_for('admin_media_status', media_id=media.id),
+                'message': 'Fichier reçu, envoi en cours'
+            }), 202
         else:
             return jsonify({
                 'success': False,
@@ -1296,6 +4740,68 @@ def admin_upload_media():
             'error': str(e)
         }), 500
 
+@app.route('/api/admin/media/<int:media_id>/status', methods=['GET'])
+@admin_required
+def admin_media_status(media_id):
+    """État de l'upload d'un média (pending, uploading, ready, failed)"""
+    try:
+        media = db.session.get(Media, media_id)
+        if not media:
+            return jsonify({
+                'success': False,
+                'error': 'Média non trouvé'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'id': media.id,
+                'status': media.status,
+                'upload_error': media.upload_error,
+                'upload_attempts': media.upload_attempts,
+                'url': media.cloudinary_url if media.status == 'ready' else None
+            }
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/admin/media/<int:media_id>/retry', methods=['POST'])
+@admin_required
+def admin_retry_media_upload(media_id):
+    """Relancer un upload en échec (le fichier est resté dans le spool)"""
+    try:
+        media = db.session.get(Media, media_id)
+        if not media:
+            return jsonify({
+                'success': False,
+                'error': 'Média non trouvé'
+            }), 404
+        if media.status != 'failed' or not media.spool_path:
+            return jsonify({
+                'success': False,
+                'error': "Seul un upload en échec peut être relancé"
+            }), 400
+        
+        media.status = 'pending'
+        media.upload_error = None
+        db.session.commit()
+        submit_media_upload(media.id)
+        
+        return jsonify({
+            'success': True,
+            'data': media.to_dict(),
+            'message': 'Upload relancé'
+        }), 202
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/admin/media/<int:media_id>', methods=['PUT'])
 @admin_required
 def admin_update_media(media_id):
@@ -1313,6 +4819,7 @@ def admin_update_media(media_id):
             media.title = data.get('title', media.title)
             media.description = data.get('description', media.description)
             media.is_featured = data.get('is_featured', media.is_featured)
+            invalidate_response_cache('media')
             db.session.commit()
         
         return jsonify({
@@ -1339,14 +4846,28 @@ def admin_delete_media(media_id):
                 'error': 'Média non trouvé'
             }), 404
         
-        # Supprimer le fichier physique
-        if os.path.exists(media.file_path):
-            os.remove(media.file_path)
+        storage = media_storage_for(media)
+        public_id = media.cloudinary_public_id
+        variant_ids = [variant['public_id'] for variant in media.variant_list()]
+        _, resource_type = media_file_type(media.original_filename)
+        spool_path = os.path.join(MEDIA_SPOOL_DIR, media.spool_path) if media.spool_path else None
         
         # Supprimer de la base de données
         db.session.delete(media)
+        invalidate_response_cache('media')
         db.session.commit()
         
+        # Supprimer le fichier (stockage et spool) s'il n'est plus référencé par aucun média
+        if spool_path and os.path.exists(spool_path):
+            os.remove(spool_path)
+        if public_id and not Media.query.filter_by(cloudinary_public_id=public_id).first():
+            try:
+                storage.delete(public_id, resource_type)
+                for variant_id in variant_ids:
+                    storage.delete(variant_id, 'image')
+            except Exception as e:
+                print(f"Erreur lors de la suppression du fichier {public_id}: {e}")
+        
         return jsonify({
             'success': True,
             'message': 'Média supprimé avec succès'
@@ -1370,14 +4891,8 @@ def admin_add_book():
                 'success': False,
                 'error': 'Données manquantes'
             }), 400
-            
-        books = load_json_data('books.json')
-        
-        # Générer un nouvel ID
-        new_id = max([book.get('id', 0) for book in books], default=0) + 1
         
-        new_book = {
-            'id': new_id,
+        new_book = catalog_add('book', {
             'title': data.get('title', ''),
             'description': data.get('description', ''),
             'price': float(data.get('price', 0)),
@@ -1385,23 +4900,14 @@ def admin_add_book():
             'category': data.get('category', ''),
             'author': data.get('author', ''),
             'pages': int(data.get('pages', 0)),
-            'format': data.get('format', 'PDF'),
-            'created_at': datetime.utcnow().isoformat()
-        }
-        
-        books.append(new_book)
+            'format': data.get('format', 'PDF')
+        })
         
-        if save_json_data('books.json', books):
-            return jsonify({
-                'success': True,
-                'data': new_book,
-                'message': 'Livre ajouté avec succès'
-            }), 201
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Erreur lors de la sauvegarde'
-            }), 500
+        return jsonify({
+            'success': True,
+            'data': new_book,
+            'message': 'Livre ajouté avec succès'
+        }), 201
             
     except Exception as e:
         return jsonify({
@@ -1421,39 +4927,30 @@ def admin_update_book(book_id):
                 'error': 'Données manquantes'
             }), 400
             
-        books = load_json_data('books.json')
-        
-        book_index = next((i for i, book in enumerate(books) if book.get('id') == book_id), None)
-        if book_index is None:
+        book = catalog_get('book', book_id)
+        if book is None:
             return jsonify({
                 'success': False,
                 'error': 'Livre non trouvé'
             }), 404
         
         # Mettre à jour le livre
-        books[book_index].update({
-            'title': data.get('title', books[book_index].get('title')),
-            'description': data.get('description', books[book_index].get('description')),
-            'price': float(data.get('price', books[book_index].get('price', 0))),
-            'image': data.get('image', books[book_index].get('image')),
-            'category': data.get('category', books[book_index].get('category')),
-            'author': data.get('author', books[book_index].get('author')),
-            'pages': int(data.get('pages', books[book_index].get('pages', 0))),
-            'format': data.get('format', books[book_index].get('format')),
-            'updated_at': datetime.utcnow().isoformat()
+        updated_book = catalog_update('book', book_id, {
+            'title': data.get('title', book.get('title')),
+            'description': data.get('description', book.get('description')),
+            'price': float(data.get('price', book.get('price', 0))),
+            'image': data.get('image', book.get('image')),
+            'category': data.get('category', book.get('category')),
+            'author': data.get('author', book.get('author')),
+            'pages': int(data.get('pages', book.get('pages', 0))),
+            'format': data.get('format', book.get('format'))
         })
         
-        if save_json_data('books.json', books):
-            return jsonify({
-                'success': True,
-                'data': books[book_index],
-                'message': 'Livre modifié avec succès'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Erreur lors de la sauvegarde'
-            }), 500
+        return jsonify({
+            'success': True,
+            'data': updated_book,
+            'message': 'Livre modifié avec succès'
+        })
             
     except Exception as e:
         return jsonify({
@@ -1466,27 +4963,16 @@ def admin_update_book(book_id):
 def admin_delete_book(book_id):
     """Supprimer un livre"""
     try:
-        books = load_json_data('books.json')
-        
-        book_index = next((i for i, book in enumerate(books) if book.get('id') == book_id), None)
-        if book_index is None:
+        if not catalog_delete('book', book_id):
             return jsonify({
                 'success': False,
                 'error': 'Livre non trouvé'
             }), 404
         
-        deleted_book = books.pop(book_index)
-        
-        if save_json_data('books.json', books):
-            return jsonify({
-                'success': True,
-                'message': 'Livre supprimé avec succès'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Erreur lors de la sauvegarde'
-            }), 500
+        return jsonify({
+            'success': True,
+            'message': 'Livre supprimé avec succès'
+        })
             
     except Exception as e:
         return jsonify({
@@ -1506,33 +4992,18 @@ def admin_add_quote():
                 'success': False,
                 'error': 'Données manquantes'
             }), 400
-            
-        quotes = load_json_data('quotes.json')
-        
-        # Générer un nouvel ID
-        new_id = max([quote.get('id', 0) for quote in quotes], default=0) + 1
         
-        new_quote = {
-            'id': new_id,
+        new_quote = catalog_add('quote', {
             'text': data.get('text', ''),
             'author': data.get('author', ''),
-            'category': data.get('category', ''),
-            'created_at': datetime.utcnow().isoformat()
-        }
-        
-        quotes.append(new_quote)
+            'category': data.get('category', '')
+        })
         
-        if save_json_data('quotes.json', quotes):
-            return jsonify({
-                'success': True,
-                'data': new_quote,
-                'message': 'Citation ajoutée avec succès'
-            }), 201
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Erreur lors de la sauvegarde'
-            }), 500
+        return jsonify({
+            'success': True,
+            'data': new_quote,
+            'message': 'Citation ajoutée avec succès'
+        }), 201
             
     except Exception as e:
         return jsonify({
@@ -1552,34 +5023,25 @@ def admin_update_quote(quote_id):
                 'error': 'Données manquantes'
             }), 400
             
-        quotes = load_json_data('quotes.json')
-        
-        quote_index = next((i for i, quote in enumerate(quotes) if quote.get('id') == quote_id), None)
-        if quote_index is None:
+        quote = catalog_get('quote', quote_id)
+        if quote is None:
             return jsonify({
                 'success': False,
                 'error': 'Citation non trouvée'
             }), 404
         
         # Mettre à jour la citation
-        quotes[quote_index].update({
-            'text': data.get('text', quotes[quote_index].get('text')),
-            'author': data.get('author', quotes[quote_index].get('author')),
-            'category': data.get('category', quotes[quote_index].get('category')),
-            'updated_at': datetime.utcnow().isoformat()
+        updated_quote = catalog_update('quote', quote_id, {
+            'text': data.get('text', quote.get('text')),
+            'author': data.get('author', quote.get('author')),
+            'category': data.get('category', quote.get('category'))
         })
         
-        if save_json_data('quotes.json', quotes):
-            return jsonify({
-                'success': True,
-                'data': quotes[quote_index],
-                'message': 'Citation modifiée avec succès'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Erreur lors de la sauvegarde'
-            }), 500
+        return jsonify({
+            'success': True,
+            'data': updated_quote,
+            'message': 'Citation modifiée avec succès'
+        })
             
     except Exception as e:
         return jsonify({
@@ -1592,27 +5054,16 @@ def admin_update_quote(quote_id):
 def admin_delete_quote(quote_id):
     """Supprimer une citation"""
     try:
-        quotes = load_json_data('quotes.json')
-        
-        quote_index = next((i for i, quote in enumerate(quotes) if quote.get('id') == quote_id), None)
-        if quote_index is None:
+        if not catalog_delete('quote', quote_id):
             return jsonify({
                 'success': False,
                 'error': 'Citation non trouvée'
             }), 404
         
-        deleted_quote = quotes.pop(quote_index)
-        
-        if save_json_data('quotes.json', quotes):
-            return jsonify({
-                'success': True,
-                'message': 'Citation supprimée avec succès'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Erreur lors de la sauvegarde'
-            }), 500
+        return jsonify({
+            'success': True,
+            'message': 'Citation supprimée avec succès'
+        })
             
     except Exception as e:
         return jsonify({
@@ -1759,10 +5210,10 @@ if __name__ == '__main__':
 def admin_get_public_users_corrected():
     """Récupérer tous les utilisateurs publics pour l'administration"""
     try:
-        users = PublicUser.query.order_by(PublicUser.created_at.desc()).all()
+        users = public_users_with_counts(PublicUser.query.order_by(PublicUser.created_at.desc()))
         return jsonify({
             'success': True,
-            'data': [user.to_dict() for user in users],
+            'data': users,
             'count': len(users)
         })
     except Exception as e:
@@ -1814,6 +5265,7 @@ def admin_toggle_media_featured(media_id):
             }), 404
         
         media.is_featured = not media.is_featured
+        invalidate_response_cache('media')
         db.session.commit()
         
         status = 'ajouté aux médias en vedette' if media.is_featured else 'retiré des médias en vedette'
@@ -1850,32 +5302,18 @@ def admin_add_book_with_file():
                 'error': 'Tous les champs obligatoires doivent être remplis'
             }), 400
         
-        books = load_json_data('books.json')
-        
-        # Générer un nouvel ID
-        new_id = max([book.get('id', 0) for book in books], default=0) + 1
-        
-        # Gérer l'upload d'image
-        image_url = '/static/images/default-book.jpg'  # Image par défaut
+        # Gérer l'upload d'image : la couverture passe par /media/<id> pendant l'envoi
+        image_url = DEFAULT_BOOK_IMAGE  # Image par défaut
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename != '' and allowed_file(file.filename):
-                try:
-                    # Upload vers Cloudinary
-                    upload_result = cloudinary.uploader.upload(
-                        file,
-                        resource_type='image',
-                        folder="dek-dek/books",
-                        public_id=f"book_{new_id}_{uuid.uuid4().hex[:8]}",
-                        overwrite=True
-                    )
-                    image_url = upload_result['secure_url']
-                except Exception as e:
-                    print(f"Erreur upload Cloudinary: {e}")
-                    # Garder l'image par défaut en cas d'erreur
+                cover = spool_media_upload(file, title=title, folder='books')
+                db.session.commit()
+                if cover.status == 'pending':
+                    submit_media_upload(cover.id)
+                image_url = url_for('media_redirect', media_id=cover.id)
         
-        new_book = {
-            'id': new_id,
+        new_book = catalog_add('book', {
             'title': title,
             'description': description,
             'price': float(price),
@@ -1883,23 +5321,14 @@ def admin_add_book_with_file():
             'category': category,
             'author': author,
             'pages': int(pages) if pages else 0,
-            'format': format_type or 'PDF',
-            'created_at': datetime.utcnow().isoformat()
-        }
-        
-        books.append(new_book)
+            'format': format_type or 'PDF'
+        })
         
-        if save_json_data('books.json', books):
-            return jsonify({
-                'success': True,
-                'data': new_book,
-                'message': 'Livre ajouté avec succès'
-            }), 201
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Erreur lors de la sauvegarde'
-            }), 500
+        return jsonify({
+            'success': True,
+            'data': new_book,
+            'message': 'Livre ajouté avec succès'
+        }), 201
             
     except Exception as e:
         return jsonify({
@@ -1913,10 +5342,8 @@ def admin_add_book_with_file():
 def admin_update_book_with_file(book_id):
     """Modifier un livre avec gestion de fichier image"""
     try:
-        books = load_json_data('books.json')
-        
-        book_index = next((i for i, book in enumerate(books) if book.get('id') == book_id), None)
-        if book_index is None:
+        book = catalog_get('book', book_id)
+        if book is None:
             return jsonify({
                 'success': False,
                 'error': 'Livre non trouvé'
@@ -1933,36 +5360,27 @@ def admin_update_book_with_file(book_id):
             format_type = request.form.get('format')
             
             # Gérer l'upload d'image si présent
-            image_url = books[book_index].get('image')  # Garder l'image existante par défaut
+            image_url = book.get('image')  # Garder l'image existante par défaut
             if 'image' in request.files:
                 file = request.files['image']
                 if file and file.filename != '' and allowed_file(file.filename):
-                    try:
-                        # Upload vers Cloudinary
-                        upload_result = cloudinary.uploader.upload(
-                            file,
-                            resource_type='image',
-                            folder="dek-dek/books",
-                            public_id=f"book_{book_id}_{uuid.uuid4().hex[:8]}",
-                            overwrite=True
-                        )
-                        image_url = upload_result['secure_url']
-                    except Exception as e:
-                        print(f"Erreur upload Cloudinary: {e}")
-                        # Garder l'image existante en cas d'erreur
+                    cover = spool_media_upload(file, title=title or book.get('title'), folder='books')
+                    db.session.commit()
+                    if cover.status == 'pending':
+                        submit_media_upload(cover.id)
+                    image_url = url_for('media_redirect', media_id=cover.id)
             
             # Mettre à jour le livre
-            books[book_index].update({
-                'title': title or books[book_index].get('title'),
-                'description': description or books[book_index].get('description'),
-                'price': float(price) if price else books[book_index].get('price', 0),
+            fields = {
+                'title': title or book.get('title'),
+                'description': description or book.get('description'),
+                'price': float(price) if price else book.get('price', 0),
                 'image': image_url,
-                'category': category or books[book_index].get('category'),
-                'author': author or books[book_index].get('author'),
-                'pages': int(pages) if pages else books[book_index].get('pages', 0),
-                'format': format_type or books[book_index].get('format'),
-                'updated_at': datetime.utcnow().isoformat()
-            })
+                'category': category or book.get('category'),
+                'author': author or book.get('author'),
+                'pages': int(pages) if pages else book.get('pages', 0),
+                'format': format_type or book.get('format')
+            }
         else:
             # Requête JSON classique
             data = request.json
@@ -1972,33 +5390,27 @@ def admin_update_book_with_file(book_id):
                     'error': 'Données manquantes'
                 }), 400
             
-            books[book_index].update({
-                'title': data.get('title', books[book_index].get('title')),
-                'description': data.get('description', books[book_index].get('description')),
-                'price': float(data.get('price', books[book_index].get('price', 0))),
-                'image': data.get('image', books[book_index].get('image')),
-                'category': data.get('category', books[book_index].get('category')),
-                'author': data.get('author', books[book_index].get('author')),
-                'pages': int(data.get('pages', books[book_index].get('pages', 0))),
-                'format': data.get('format', books[book_index].get('format')),
-                'updated_at': datetime.utcnow().isoformat()
-            })
+            fields = {
+                'title': data.get('title', book.get('title')),
+                'description': data.get('description', book.get('description')),
+                'price': float(data.get('price', book.get('price', 0))),
+                'image': data.get('image', book.get('image')),
+                'category': data.get('category', book.get('category')),
+                'author': data.get('author', book.get('author')),
+                'pages': int(data.get('pages', book.get('pages', 0))),
+                'format': data.get('format', book.get('format'))
+            }
         
-        if save_json_data('books.json', books):
-            return jsonify({
-                'success': True,
-                'data': books[book_index],
-                'message': 'Livre modifié avec succès'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Erreur lors de la sauvegarde'
-            }), 500
+        updated_book = catalog_update('book', book_id, fields)
+        
+        return jsonify({
+            'success': True,
+            'data': updated_book,
+            'message': 'Livre modifié avec succès'
+        })
             
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
-
@@ -0,0 +1,447 @@
+"""Banc de charge hors ligne des API publiques et d'administration
+
+Trois étapes :
+    seed     remplit une base dédiée (SQLite ou PostgreSQL) avec un jeu de
+             données synthétique et reproductible (--scale ou tailles explicites)
+    run      rejoue un mélange de sessions réalistes avec le client de test
+             Flask (sans serveur ni réseau) et mesure p50/p95/p99, débit et
+             requêtes SQL par requête HTTP ; résultats en JSON
+    compare  compare deux fichiers de résultats (par ex. deux commits) et sort
+             en erreur si une opération régresse au-delà de --threshold %
+
+Usage :
+    python benchmarks/bench_api.py seed --scale medium
+    python benchmarks/bench_api.py run --scenario mixed --duration 30 --concurrency 4
+    python benchmarks/bench_api.py compare benchmarks/results/a1b2c3d.json benchmarks/results/e4f5a6b.json
+
+La base vient de --database, sinon de BENCH_DATABASE_URL, sinon
+benchmarks/bench.db (SQLite). Elle n'est jamais celle du site : seed la vide.
+"""
+import argparse
+import atexit
+import hashlib
+import itertools
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, 'benchmarks', 'results')
+DEFAULT_DATABASE_URL = 'sqlite:///' + os.path.join(BASE_DIR, 'benchmarks', 'bench.db')
+
+BENCH_PASSWORD = 'password123'
+ADMIN_CREDENTIALS = {'username': 'admin', 'password': 'admin123'}
+INSERT_CHUNK = 5000
+
+# Tailles des jeux de données (surchargées par --users, --books, etc.)
+SCALES = {
+    'small': {'users': 2000, 'books': 500, 'quotes': 500, 'ratings': 50000, 'comments': 20000, 'media': 6},
+    'medium': {'users': 20000, 'books': 2000, 'quotes': 3000, 'ratings': 500000, 'comments': 200000, 'media': 12},
+    'large': {'users': 50000, 'books': 5000, 'quotes': 5000, 'ratings': 3000000, 'comments': 1000000, 'media': 24},
+}
+
+# Mélanges de sessions : {type de session: poids}
+SCENARIOS = {
+    'mixed': {'homepage': 40, 'browse': 40, 'rate': 15, 'moderate': 5},
+    'public': {'homepage': 50, 'browse': 50},
+    'browse': {'browse': 100},
+    'rating-burst': {'rate': 100},
+    'moderation': {'moderate': 100},
+}
+
+CATEGORIES = ['Développement personnel', 'Motivation', 'Leadership', 'Finance', 'Productivité', 'Sagesse']
+AUTHORS = ['Expert Dek.Dek', 'Coach Dek.Dek', 'Marcus Aurèle', 'Sénèque', 'Maya Angelou', 'Lao Tseu']
+WORDS = ("succès discipline habitude objectif énergie confiance temps esprit courage patience "
+         "réussite apprentissage croissance équilibre action vision").split()
+
+def load_app(database_url):
+    """Importer l'application sur la base du banc (init_database s'exécute à l'import)
+    
+    L'état partagé du site (générations de cache, journaux de commentaires,
+    métriques, profils, spool) est redirigé vers un répertoire temporaire
+    supprimé en fin de processus : le banc ne touche jamais data/.
+    """
+    data_dir = tempfile.mkdtemp(prefix='dek-bench-')
+    atexit.register(shutil.rmtree, data_dir, ignore_errors=True)
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['DATA_DIR'] = data_dir
+    sys.path.insert(0, BASE_DIR)
+    import app as site
+    return site
+
+def database_url(args):
+    return args.database or os.environ.get('BENCH_DATABASE_URL') or DEFAULT_DATABASE_URL
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def insert_rows(site, model, rows):
+    """INSERT par lots (executemany) sans passer par l'ORM ; rows peut être un générateur"""
+    table = model.__table__
+    rows = iter(rows)
+    while True:
+        batch = list(itertools.islice(rows, INSERT_CHUNK))
+        if not batch:
+            break
+        site.db.session.execute(table.insert(), batch)
+        site.db.session.commit()
+
+def seed(args):
+    url = database_url(args)
+    if url.startswith('sqlite:///'):
+        path = url[len('sqlite:///'):]
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    site = load_app(url)
+    sizes = dict(SCALES[args.scale])
+    for key in sizes:
+        if getattr(args, key) is not None:
+            sizes[key] = getattr(args, key)
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    started = time.perf_counter()
+
+    with site.app.app_context():
+        if not url.startswith('sqlite'):
+            site.db.drop_all()
+            site.init_database()
+
+        password_hash = hashlib.sha256(BENCH_PASSWORD.encode()).hexdigest()
+        insert_rows(site, site.PublicUser, ({
+            'username': f"bench{i}",
+            'email': f"bench{i}@example.com",
+            'password_hash': password_hash,
+            'is_active': True,
+            'created_at': now - timedelta(minutes=i)
+        } for i in range(sizes['users'])))
+
+        insert_rows(site, site.Book, [{
+            'title': f"{sentence(rng, 3)[:-1]} ({i})",
+            'description': sentence(rng, 40),
+            'price': round(rng.uniform(5, 40), 2),
+            'image': '',
+            'category': rng.choice(CATEGORIES),
+            'author': rng.choice(AUTHORS),
+            'pages': rng.randint(80, 600),
+            'format': 'PDF',
+            'created_at': now - timedelta(hours=i)
+        } for i in range(sizes['books'])])
+
+        insert_rows(site, site.Quote, [{
+            'text': sentence(rng, 18),
+            'author': rng.choice(AUTHORS),
+            'category': rng.choice(CATEGORIES),
+            'created_at': now - timedelta(hours=i)
+        } for i in range(sizes['quotes'])])
+
+        insert_rows(site, site.Media, [{
+            'filename': f"bench-{i}.jpg",
+            'original_filename': f"bench-{i}.jpg",
+            'file_type': 'image',
+            'cloudinary_url': f"https://res.cloudinary.com/demo/image/upload/bench-{i}.jpg",
+            'file_size': 150000,
+            'title': sentence(rng, 3),
+            'description': sentence(rng, 12),
+            'is_featured': True,
+            'status': 'ready',
+            'uploaded_at': now - timedelta(days=i)
+        } for i in range(sizes['media'])])
+
+        user_ids = [user_id for (user_id,) in site.db.session.query(site.PublicUser.id)
+                    .filter(site.PublicUser.username.like('bench%'))]
+        contents = [('book', book_id) for (book_id,) in site.db.session.query(site.Book.id)] + \
+                   [('quote', quote_id) for (quote_id,) in site.db.session.query(site.Quote.id)]
+
+        # Une note au plus par (utilisateur, contenu) : chaque utilisateur note un échantillon distinct
+        per_user, extra = divmod(min(sizes['ratings'], len(user_ids) * len(contents)), len(user_ids))
+        insert_rows(site, site.Rating, ({
+            'rating': rng.choices([1, 2, 3, 4, 5], weights=[1, 2, 4, 6, 5])[0],
+            'content_type': content_type,
+            'content_id': content_id,
+            'user_id': user_id,
+            'created_at': now - timedelta(seconds=rng.randint(0, 90 * 86400))
+        } for position, user_id in enumerate(user_ids)
+          for content_type, content_id in rng.sample(contents, per_user + (position < extra))))
+
+        def comment_row(index):
+            content_type, content_id = rng.choice(contents)
+            return {
+                'content': sentence(rng, rng.randint(5, 40)),
+                'content_type': content_type,
+                'content_id': content_id,
+                'user_id': rng.choice(user_ids),
+                'is_approved': rng.random() < 0.9,  # Le reste alimente les sessions de modération
+                'created_at': now - timedelta(seconds=rng.randint(0, 90 * 86400))
+            }
+        insert_rows(site, site.Comment, (comment_row(index) for index in range(sizes['comments'])))
+
+        site.rebuild_content_stats()
+        site.bump_cache_generation('catalog')
+
+    print(f"Base remplie en {time.perf_counter() - started:.1f} s : "
+          + ', '.join(f"{key}={value}" for key, value in sizes.items()))
+
+class Recorder:
+    """Mesures par opération (méthode + route), partagées entre threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.operations = {}
+
+    def record(self, operation, seconds, status, queries):
+        with self.lock:
+            entry = self.operations.setdefault(operation, {'latencies': [], 'queries': 0, 'errors': 0, 'statuses': {}})
+            entry['latencies'].append(seconds)
+            entry['queries'] += queries
+            entry['statuses'][str(status)] = entry['statuses'].get(str(status), 0) + 1
+            if status >= 500:
+                entry['errors'] += 1
+
+def percentile(sorted_values, fraction):
+    """Percentile par rang le plus proche"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+def summarize(latencies, queries, requests, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': requests,
+        'throughput_rps': round(requests / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2),
+        'queries_per_request': round(queries / requests, 2)
+    }
+
+class Session:
+    """Un utilisateur simulé : client de test Flask et générateur aléatoire propres"""
+
+    def __init__(self, site, recorder, rng, dataset):
+        self.site = site
+        self.recorder = recorder
+        self.rng = rng
+        self.dataset = dataset
+        self.client = site.app.test_client()
+
+    def request(self, method, url, operation=None, **kwargs):
+        with self.site.query_budget(float('inf')) as budget:
+            start = time.perf_counter()
+            response = self.client.open(url, method=method, **kwargs)
+            response.get_data()
+            elapsed = time.perf_counter() - start
+        self.recorder.record(f"{method} {operation or url}", elapsed, response.status_code, len(budget.statements))
+        return response
+
+    def homepage(self):
+        self.request('GET', '/')
+        self.request('GET', '/api/featured-media')
+
+    def browse(self):
+        response = self.request('GET', '/api/books?limit=24', '/api/books')
+        cursor = (response.get_json(silent=True) or {}).get('next_cursor')
+        if cursor and self.rng.random() < 0.3:
+            self.request('GET', f"/api/books?limit=24&cursor={cursor}", '/api/books?cursor')
+        for _ in range(self.rng.randint(1, 4)):
+            book_id = self.rng.choice(self.dataset['books'])
+            self.request('GET', f"/api/books/{book_id}", '/api/books/<id>')
+            self.request('GET', f"/api/comments/book/{book_id}", '/api/comments/book/<id>')
+            self.request('GET', f"/api/ratings/book/{book_id}", '/api/ratings/book/<id>')
+
+    def rate(self):
+        username = f"bench{self.rng.randrange(self.dataset['users'])}"
+        self.request('POST', '/api/auth/login', json={'username': username, 'password': BENCH_PASSWORD})
+        for _ in range(self.rng.randint(3, 10)):
+            content_type = self.rng.choice(['book', 'quote'])
+            content_id = self.rng.choice(self.dataset[f"{content_type}s"])
+            self.request('POST', '/api/ratings', json={
+                'rating': self.rng.randint(1, 5),
+                'content_type': content_type,
+                'content_id': content_id
+            })
+            if self.rng.random() < 0.2:
+                self.request('POST', '/api/comments', json={
+                    'content': sentence(self.rng, 12),
+                    'content_type': content_type,
+                    'content_id': content_id
+                })
+        self.client.post('/api/auth/logout')
+
+    def moderate(self):
+        self.request('POST', '/admin/login', data=ADMIN_CREDENTIALS)
+        self.request('GET', '/api/admin/stats')
+        response = self.request('GET', '/api/admin/comments?status=pending&limit=50', '/api/admin/comments?status=pending')
+        pending = [comment['id'] for comment in (response.get_json(silent=True) or {}).get('data', [])]
+        if pending:
+            self.request('POST', f"/api/admin/comments/{pending[0]}/approve", '/api/admin/comments/<id>/approve')
+            batch = pending[1:1 + self.rng.randint(5, 20)]
+            if batch:
+                self.request('POST', '/api/admin/comments/bulk', json={
+                    'action': self.rng.choice(['approve', 'reject']),
+                    'ids': batch
+                })
+        self.request('GET', '/api/admin/public-users')
+        self.client.get('/admin/logout')
+
+def load_dataset(site):
+    with site.app.app_context():
+        dataset = {
+            'books': [book_id for (book_id,) in site.db.session.query(site.Book.id)],
+            'quotes': [quote_id for (quote_id,) in site.db.session.query(site.Quote.id)],
+            'users': site.PublicUser.query.filter(site.PublicUser.username.like('bench%')).count()
+        }
+    if not dataset['books'] or not dataset['users']:
+        sys.exit("Base vide : lancer d'abord `python benchmarks/bench_api.py seed`")
+    return dataset
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    site = load_app(database_url(args))
+    dataset = load_dataset(site)
+    mix = SCENARIOS[args.scenario]
+    recorder = Recorder()
+
+    def worker(index, deadline, recorder):
+        rng = random.Random(args.seed * 1000 + index)
+        session = Session(site, recorder, rng, dataset)
+        kinds, weights = list(mix), list(mix.values())
+        while time.perf_counter() < deadline:
+            getattr(session, rng.choices(kinds, weights)[0])()
+
+    def drive(seconds, recorder):
+        deadline = time.perf_counter() + seconds
+        threads = [threading.Thread(target=worker, args=(index, deadline, recorder))
+                   for index in range(args.concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    if args.warmup:
+        drive(args.warmup, Recorder())
+    elapsed = drive(args.duration, recorder)
+
+    operations = {}
+    all_latencies, all_queries = [], 0
+    for operation, entry in sorted(recorder.operations.items()):
+        operations[operation] = summarize(entry['latencies'], entry['queries'], len(entry['latencies']), elapsed)
+        operations[operation].update({'errors': entry['errors'], 'statuses': entry['statuses']})
+        all_latencies += entry['latencies']
+        all_queries += entry['queries']
+    if not all_latencies:
+        sys.exit("Aucune requête mesurée (durée trop courte ?)")
+
+    engine_url = site.app.config['SQLALCHEMY_DATABASE_URI']
+    results = {
+        'commit': git_commit(),
+        'date': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'database': engine_url.split(':', 1)[0],
+        'scenario': args.scenario,
+        'mix': mix,
+        'concurrency': args.concurrency,
+        'duration_s': round(elapsed, 2),
+        'seed': args.seed,
+        'dataset': {'books': len(dataset['books']), 'quotes': len(dataset['quotes']), 'users': dataset['users']},
+        'total': summarize(all_latencies, all_queries, len(all_latencies), elapsed),
+        'operations': operations
+    }
+
+    print(f"{'opération':<48} {'req':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL/req':>8} {'err':>5}")
+    for operation, stats in list(operations.items()) + [('TOTAL', dict(results['total'], errors=sum(
+            stats['errors'] for stats in operations.values())))]:
+        print(f"{operation:<48} {stats['requests']:>7} {stats['throughput_rps']:>8} {stats['p50_ms']:>8} "
+              f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['queries_per_request']:>8} {stats['errors']:>5}")
+
+    output = args.json or os.path.join(RESULTS_DIR, f"{results['commit'] or 'local'}-{args.scenario}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nRésultats : {output}")
+
+def compare(args):
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.candidate, 'r', encoding='utf-8') as f:
+        candidate = json.load(f)
+
+    print(f"{baseline.get('commit')} ({baseline['scenario']}) -> {candidate.get('commit')} ({candidate['scenario']})\n")
+    print(f"{'opération':<48} {'p50 ms':>17} {'p95 ms':>17} {'SQL/req':>13} {'req/s':>15}")
+
+    def delta(old, new):
+        return (new - old) / old * 100 if old else 0.0
+
+    regressions = []
+    rows = [(name, baseline['operations'].get(name), stats) for name, stats in candidate['operations'].items()]
+    rows.append(('TOTAL', baseline['total'], candidate['total']))
+    for name, old, new in rows:
+        if old is None:
+            print(f"{name:<48} (nouvelle opération)")
+            continue
+        p50, p95 = delta(old['p50_ms'], new['p50_ms']), delta(old['p95_ms'], new['p95_ms'])
+        flags = []
+        if p95 > args.threshold:
+            flags.append('p95')
+        if new['queries_per_request'] > old['queries_per_request'] + 0.5:
+            flags.append('SQL')
+        if flags:
+            regressions.append((name, flags))
+        print(f"{name:<48} {new['p50_ms']:>8} {p50:>+7.1f}% {new['p95_ms']:>8} {p95:>+7.1f}% "
+              f"{old['queries_per_request']:>5}->{new['queries_per_request']:<6} "
+              f"{new['throughput_rps']:>7} {delta(old['throughput_rps'], new['throughput_rps']):>+6.1f}%"
+              + ('  <- ' + ', '.join(flags) if flags else ''))
+
+    if regressions:
+        print(f"\n{len(regressions)} régression(s) au-delà de {args.threshold:g} % (p95) ou en requêtes SQL")
+        sys.exit(1)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database', help="URL SQLAlchemy de la base du banc")
+    parser.add_argument('--seed', type=int, default=42, help="graine des générateurs aléatoires")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed_parser = commands.add_parser('seed', help="remplir la base avec un jeu de données synthétique")
+    seed_parser.add_argument('--scale', choices=SCALES, default='small')
+    for key in SCALES['small']:
+        seed_parser.add_argument(f"--{key}", type=int, help=f"nombre de {key} (remplace --scale)")
+    seed_parser.set_defaults(handler=seed)
+
+    run_parser = commands.add_parser('run', help="rejouer un scénario et mesurer")
+    run_parser.add_argument('--scenario', choices=SCENARIOS, default='mixed')
+    run_parser.add_argument('--duration', type=float, default=30, help="durée mesurée en secondes")
+    run_parser.add_argument('--warmup', type=float, default=5, help="chauffe non mesurée en secondes")
+    run_parser.add_argument('--concurrency', type=int, default=4, help="sessions simultanées (threads)")
+    run_parser.add_argument('--json', help="fichier de résultats (défaut : benchmarks/results/<commit>-<scénario>.json)")
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = commands.add_parser('compare', help="comparer deux fichiers de résultats")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=10, help="régression tolérée sur p95, en %%")
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == '__main__':
+    main()
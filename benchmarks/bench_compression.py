@@ -0,0 +1,108 @@
+"""Coût CPU de la compression des réponses face aux octets économisés
+
+Mesure gzip et brotli, aux niveaux proposés par COMPRESSION_GZIP_LEVEL et
+COMPRESSION_BROTLI_QUALITY, sur des charges typiques du site : pages
+publiques (templates) et listes JSON du catalogue à plusieurs tailles.
+
+Usage :
+    python benchmarks/bench_compression.py [--repeat 50] [--json resultats.json]
+"""
+import argparse
+import gzip
+import json
+import os
+import statistics
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GZIP_LEVELS = [1, 6, 9]
+BROTLI_QUALITIES = [1, 4, 6, 11]
+
+def catalog_payload(count):
+    """Réponse /api/books de `count` livres, au format de l'API"""
+    books = [
+        {
+            'id': i,
+            'title': f"Guide du Développement Personnel, tome {i}",
+            'description': "Un livre complet pour développer votre potentiel et atteindre vos objectifs "
+                           "personnels et professionnels.",
+            'price': 19.99,
+            'image': f"/media/{i}",
+            'category': ['Développement personnel', 'Motivation', 'Leadership'][i % 3],
+            'author': ['Expert Dek.Dek', 'Coach Dek.Dek'][i % 2],
+            'pages': 150 + i,
+            'format': 'PDF',
+            'created_at': '2026-01-01T12:00:00',
+            'updated_at': None,
+            'comments_count': i % 7,
+            'ratings_count': i % 11,
+            'average_rating': round((i % 5) + 0.5, 1)
+        }
+        for i in range(1, count + 1)
+    ]
+    return json.dumps({'success': True, 'data': books, 'next_cursor': 'eyJ2IjogMX0', 'count': count}).encode('utf-8')
+
+def payloads():
+    items = [(f"json catalogue {count} livres", catalog_payload(count)) for count in (2, 10, 50, 200)]
+    templates_dir = os.path.join(BASE_DIR, 'templates', 'public')
+    for filename in sorted(os.listdir(templates_dir)):
+        with open(os.path.join(templates_dir, filename), 'rb') as f:
+            items.append((f"html {filename}", f.read()))
+    return items
+
+def codecs():
+    items = [(f"gzip-{level}", lambda data, level=level: gzip.compress(data, compresslevel=level, mtime=0))
+             for level in GZIP_LEVELS]
+    if brotli:
+        items += [(f"br-{quality}", lambda data, quality=quality: brotli.compress(data, quality=quality))
+                  for quality in BROTLI_QUALITIES]
+    return items
+
+def measure(compress, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = compress(data)
+        timings.append(time.perf_counter() - start)
+    return len(compressed), statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=50, help="répétitions par mesure (médiane)")
+    parser.add_argument('--json', help="écrire les résultats dans ce fichier")
+    args = parser.parse_args()
+    
+    if brotli is None:
+        print("brotli non installé : gzip seulement\n")
+    
+    results = []
+    print(f"{'charge':<32} {'taille':>9} {'codec':<8} {'compressé':>10} {'gain':>6} {'µs':>9} {'Mo/s':>8}")
+    for name, data in payloads():
+        for codec, compress in codecs():
+            size, seconds = measure(compress, data, args.repeat)
+            result = {
+                'payload': name,
+                'bytes': len(data),
+                'codec': codec,
+                'compressed_bytes': size,
+                'saved_ratio': round(1 - size / len(data), 4),
+                'median_us': round(seconds * 1e6, 1),
+                'throughput_mb_s': round(len(data) / seconds / 1e6, 1) if seconds else None
+            }
+            results.append(result)
+            print(f"{name:<32} {len(data):>9} {codec:<8} {size:>10} {result['saved_ratio']:>6.0%} "
+                  f"{result['median_us']:>9} {result['throughput_mb_s']:>8}")
+        print()
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+if __name__ == '__main__':
+    main()
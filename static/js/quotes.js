@@ -1,19 +1,48 @@
 // Quotes page JavaScript
+const QUOTES_PAGE_SIZE = 30;
+let nextQuotesCursor = null;
+
 document.addEventListener('DOMContentLoaded', function() {
     loadQuotes();
+    document.getElementById('load-more-quotes').addEventListener('click', function() {
+        loadQuotes(nextQuotesCursor);
+    });
 });
 
-async function loadQuotes() {
+// Données intégrées par le serveur (utilisables une seule fois)
+function takeInitialQuotes() {
+    const element = document.getElementById('initial-data');
+    if (!element) return null;
+    element.remove();
+    return JSON.parse(element.textContent);
+}
+
+// Charger une page de citations (la suivante si un curseur est fourni)
+async function loadQuotes(cursor = null) {
     const quotesGrid = document.getElementById('quotes-grid');
     const loadingIndicator = document.getElementById('loading-quotes');
+    const loadMoreButton = document.getElementById('load-more-quotes');
+    
+    loadingIndicator.style.display = 'block';
+    loadMoreButton.style.display = 'none';
     
     try {
-        const response = await fetch('/api/quotes');
-        const result = await response.json();
+        // Première page : intégrée à la page par le serveur
+        let result = cursor ? null : takeInitialQuotes();
+        if (!result) {
+            let url = `/api/quotes?limit=${QUOTES_PAGE_SIZE}&fields=text,author,category`;
+            if (cursor) {
+                url += `&cursor=${encodeURIComponent(cursor)}`;
+            }
+            const response = await fetch(url);
+            result = await response.json();
+        }
         
         if (result.success && result.data.length > 0) {
-            displayQuotes(result.data);
-        } else {
+            displayQuotes(result.data, Boolean(cursor));
+            nextQuotesCursor = result.next_cursor;
+            loadMoreButton.style.display = nextQuotesCursor ? 'block' : 'none';
+        } else if (!cursor) {
             quotesGrid.innerHTML = `
                 <div style="text-align: center; padding: 40px; color: #666; grid-column: 1 / -1;">
                     <h3>Aucune citation disponible pour le moment</h3>
@@ -34,15 +63,20 @@ async function loadQuotes() {
     }
 }
 
-function displayQuotes(quotes) {
+function displayQuotes(quotes, append = false) {
     const quotesGrid = document.getElementById('quotes-grid');
-    
-    quotesGrid.innerHTML = quotes.map(quote => `
+    const html = quotes.map(quote => `
         <div class="quote-card">
             <div class="quote-text">"${quote.text}"</div>
             <div class="quote-author">— ${quote.author}</div>
             <div class="quote-category">${quote.category}</div>
         </div>
     `).join('');
+    
+    if (append) {
+        quotesGrid.insertAdjacentHTML('beforeend', html);
+    } else {
+        quotesGrid.innerHTML = html;
+    }
 }
 
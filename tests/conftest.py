@@ -0,0 +1,56 @@
+"""Fixtures communes des tests
+
+L'application est importée une seule fois, sur une base SQLite et un
+répertoire de données temporaires (init_database s'exécute à l'import et
+crée l'admin et les utilisateurs de test).
+"""
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TMP_DIR = tempfile.mkdtemp(prefix='dek-tests-')
+DATA_DIR = os.path.join(TMP_DIR, 'data')
+
+os.makedirs(DATA_DIR)
+for filename in ('books.json', 'quotes.json'):
+    shutil.copy(os.path.join(BASE_DIR, 'data', filename), DATA_DIR)
+
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(TMP_DIR, 'test.db')
+os.environ['DATA_DIR'] = DATA_DIR
+os.environ['COMMENT_WRITE_BEHIND'] = '0'
+os.environ['METRICS_TOKEN'] = 'test-token'
+
+sys.path.insert(0, BASE_DIR)
+import app as site  # noqa: E402
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+
+@pytest.fixture
+def app_module():
+    return site
+
+@pytest.fixture
+def app_context():
+    with site.app.app_context():
+        yield
+
+@pytest.fixture
+def client():
+    return site.app.test_client()
+
+@pytest.fixture
+def admin_client():
+    client = site.app.test_client()
+    client.post('/admin/login', data={'username': 'admin', 'password': 'admin123'})
+    return client
+
+@pytest.fixture
+def user_client():
+    client = site.app.test_client()
+    client.post('/api/auth/login', json={'username': 'testuser1', 'password': 'password123'})
+    return client
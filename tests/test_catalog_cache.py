@@ -0,0 +1,42 @@
+import pytest
+
+@pytest.fixture
+def data_dir(app_module, tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'DATA_DIR', str(tmp_path))
+    app_module.write_json_snapshot('books.json', [{'id': 1, 'title': 'Un'}, {'id': 2, 'title': 'Deux'}])
+    return tmp_path
+
+def put(item):
+    return lambda entry: ([{'op': 'put', 'item': item}], None)
+
+def delete(item_id):
+    return lambda entry: ([{'op': 'delete', 'id': item_id}], None)
+
+def test_journal_is_replayed_on_the_snapshot(app_module, data_dir):
+    writer = app_module.CatalogCache(0, 1000)
+    writer.apply('books.json', put({'id': 3, 'title': 'Trois'}))
+    writer.apply('books.json', delete(1))
+    
+    index = app_module.CatalogCache(0, 1000).get('books.json')['index']
+    assert sorted(index) == [2, 3]
+
+def test_compaction_during_a_load_does_not_replay_old_records(app_module, data_dir, monkeypatch):
+    writer = app_module.CatalogCache(0, 1000)
+    writer.apply('books.json', put({'id': 2, 'title': 'Deux (modifié)'}))
+    
+    # Le lecteur a lu le journal ; un autre worker supprime l'élément et compacte
+    # avant que l'instantané ne soit lu
+    read_json_file = app_module.read_json_file
+    compactions = []
+    def read_after_compaction(filename):
+        if not compactions:
+            compactions.append(filename)
+            writer.apply(filename, delete(2))
+            writer.compact(filename)
+        return read_json_file(filename)
+    monkeypatch.setattr(app_module, 'read_json_file', read_after_compaction)
+    
+    entry = app_module.CatalogCache(0, 1000).get('books.json')
+    assert compactions == ['books.json']
+    assert sorted(entry['index']) == [1]
+    assert entry['journal_offset'] == 0
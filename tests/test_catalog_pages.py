@@ -0,0 +1,56 @@
+import pytest
+
+SORTS = {
+    'books': ['id', 'date', 'rating', 'comments', 'price'],
+    'quotes': ['id', 'date', 'rating', 'comments']
+}
+CASES = [(kind, f'{direction}{sort}') for kind, sorts in SORTS.items() for sort in sorts for direction in ('', '-')]
+
+def walk(client, kind, sort, limit):
+    """IDs de toutes les pages obtenues en suivant next_cursor"""
+    ids, cursor = [], None
+    while True:
+        url = f'/api/{kind}?sort={sort}&limit={limit}&fields=id' + (f'&cursor={cursor}' if cursor else '')
+        response = client.get(url)
+        assert response.status_code == 200
+        body = response.get_json()
+        assert len(body['data']) <= limit
+        ids += [item['id'] for item in body['data']]
+        cursor = body['next_cursor']
+        if cursor is None:
+            return ids
+
+@pytest.fixture(autouse=True)
+def tied_values(app_module):
+    """Des notes identiques sur plusieurs contenus : les tris par note ont des ex æquo à départager"""
+    client = app_module.app.test_client()
+    client.post('/api/auth/login', json={'username': 'testuser2', 'password': 'password123'})
+    for content_type, content_ids in (('book', (1, 2)), ('quote', (2, 3))):
+        for content_id in content_ids:
+            response = client.post('/api/ratings', json={'rating': 3, 'content_type': content_type, 'content_id': content_id})
+            assert response.status_code in (200, 201)
+
+@pytest.mark.parametrize('backend', ['database', 'json'])
+@pytest.mark.parametrize('kind, sort', CASES)
+def test_cursor_pages_cover_the_catalog_once(app_module, client, monkeypatch, backend, kind, sort):
+    monkeypatch.setattr(app_module, 'CATALOG_BACKEND', backend)
+    everything = walk(client, kind, sort, limit=1000)
+    assert sorted(everything) == sorted(set(everything))
+    
+    for limit in (1, 2, 3):
+        assert walk(client, kind, sort, limit) == everything
+
+def test_fields_projects_the_requested_columns(client):
+    body = client.get('/api/books?limit=2&fields=title,average_rating').get_json()
+    assert [set(item) for item in body['data']] == [{'id', 'title', 'average_rating'}] * 2
+
+@pytest.mark.parametrize('url', [
+    '/api/books?fields=nope',
+    '/api/books?fields=title,text',
+    '/api/quotes?fields=price',
+    '/api/books?sort=nope',
+])
+def test_unknown_sort_or_fields_are_rejected(client, url):
+    response = client.get(url)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,105 @@
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+
+def queued_comment(user_id, content):
+    return {
+        'submission_id': uuid.uuid4().hex,
+        'content': content,
+        'content_type': 'book',
+        'content_id': 1,
+        'user_id': user_id,
+        'created_at': datetime.utcnow().isoformat()
+    }
+
+def write_journal(path, lines, tail=b''):
+    with open(path, 'wb') as f:
+        f.write(b''.join(line + b'\n' for line in lines) + tail)
+
+def test_corrupt_journal_does_not_block_the_queue(app_module, app_context, tmp_path):
+    user_id = app_module.PublicUser.query.filter_by(username='testuser1').first().id
+    queue = app_module.CommentQueue(str(tmp_path))
+    
+    good_in_corrupt = queued_comment(user_id, 'valide dans un journal abîmé')
+    missing_field = queued_comment(user_id, 'sans content_type')
+    del missing_field['content_type']
+    write_journal(tmp_path / '1.journal', [
+        b'{"submission_id": "tronque',
+        json.dumps(good_in_corrupt).encode(),
+        json.dumps(missing_field).encode(),
+    ], tail=b'{"submission_id": "interrompu"')
+    valid = [queued_comment(user_id, f'journal sain {i}') for i in range(3)]
+    write_journal(tmp_path / '2.journal', [json.dumps(record).encode() for record in valid])
+    
+    assert queue.flush() == 4
+    
+    submission_ids = [record['submission_id'] for record in valid + [good_in_corrupt]]
+    Comment = app_module.Comment
+    assert Comment.query.filter(Comment.submission_id.in_(submission_ids)).count() == 4
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['1.journal.failed']
+    failed = (tmp_path / '1.journal.failed').read_bytes().splitlines()
+    assert len(failed) == 2
+    assert failed[0] == b'{"submission_id": "tronque'
+    assert json.loads(failed[1])['submission_id'] == missing_field['submission_id']
+    
+    # Le fichier mis de côté n'est pas relu aux passages suivants
+    assert queue.flush() == 0
+
+def test_transient_failure_keeps_journal_and_continues(app_module, app_context, tmp_path, monkeypatch):
+    user_id = app_module.PublicUser.query.filter_by(username='testuser1').first().id
+    queue = app_module.CommentQueue(str(tmp_path))
+    first = queued_comment(user_id, 'premier')
+    second = queued_comment(user_id, 'second')
+    write_journal(tmp_path / '1.journal', [json.dumps(first).encode()])
+    write_journal(tmp_path / '2.journal', [json.dumps(second).encode()])
+    
+    insert = app_module.insert_queued_comments
+    def flaky_insert(records):
+        if records[0]['submission_id'] == first['submission_id']:
+            raise RuntimeError('base indisponible')
+        return insert(records)
+    monkeypatch.setattr(app_module, 'insert_queued_comments', flaky_insert)
+    
+    assert queue.flush() == 1
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['1.journal']
+    
+    monkeypatch.setattr(app_module, 'insert_queued_comments', insert)
+    assert queue.flush() == 1
+    assert list(tmp_path.iterdir()) == []
+
+def test_write_behind_comment_reaches_the_database_once(app_module, app_context, user_client, tmp_path, monkeypatch):
+    queue = app_module.CommentQueue(str(tmp_path))
+    monkeypatch.setattr(app_module, 'comment_queue', queue)
+    monkeypatch.setattr(app_module, 'COMMENT_WRITE_BEHIND', True)
+    monkeypatch.setattr(app_module, 'COMMENT_FLUSH_INTERVAL', 3600)  # Le thread ne repasse pas pendant le test
+    
+    response = user_client.post('/api/comments', json={
+        'content': '  Écrit en différé  ',
+        'content_type': 'book',
+        'content_id': 1
+    })
+    assert response.status_code == 202
+    data = response.get_json()['data']
+    assert data['id'] is None
+    assert data['username'] == 'testuser1'
+    assert data['content'] == 'Écrit en différé'
+    assert data['is_approved'] is False
+    assert queue.pid == os.getpid()  # Journal ouvert par le hook before_request du worker
+    
+    Comment = app_module.Comment
+    query = Comment.query.filter_by(submission_id=data['submission_id'])
+    for _ in range(50):
+        queue.flush()  # Le premier passage du thread peut tenir le journal un instant
+        if query.count():
+            break
+        time.sleep(0.05)
+    comment = query.one()
+    assert comment.content == 'Écrit en différé'
+    assert comment.user_id == data['user_id']
+    assert comment.is_approved is False
+    
+    assert queue.flush() == 0
+    assert query.count() == 1
+    assert list(tmp_path.glob('*.failed')) == []
@@ -0,0 +1,59 @@
+import pytest
+
+STAT_COLUMNS = ('ratings_count', 'ratings_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+                'comments_count')
+
+@pytest.fixture
+def second_user_client(app_module):
+    client = app_module.app.test_client()
+    client.post('/api/auth/login', json={'username': 'testuser2', 'password': 'password123'})
+    return client
+
+def stats_rows(app_module):
+    """Compteurs non nuls de ContentStats (la reconstruction n'écrit pas les lignes vides)"""
+    with app_module.app.app_context():
+        rows = {}
+        for row in app_module.ContentStats.query:
+            values = tuple(getattr(row, column) for column in STAT_COLUMNS)
+            if any(values):
+                rows[(row.content_type, row.content_id)] = values
+        return rows
+
+def assert_matches_rebuild(app_module):
+    incremental = stats_rows(app_module)
+    with app_module.app.app_context():
+        app_module.rebuild_content_stats()
+    assert incremental == stats_rows(app_module)
+
+def comment(user_client, content_id):
+    response = user_client.post('/api/comments', json={
+        'content': 'Compteur', 'content_type': 'book', 'content_id': content_id
+    })
+    assert response.status_code == 201
+    return response.get_json()['data']['id']
+
+def test_counters_match_rebuild(app_module, user_client, second_user_client, admin_client):
+    assert_matches_rebuild(app_module)  # Point de départ cohérent quels que soient les tests précédents
+    
+    for client, rating in [(user_client, 4), (second_user_client, 2), (user_client, 1), (user_client, 5)]:
+        response = client.post('/api/ratings', json={'rating': rating, 'content_type': 'book', 'content_id': 2})
+        assert response.status_code in (200, 201)
+        assert_matches_rebuild(app_module)
+    
+    first = comment(user_client, 2)
+    second = comment(second_user_client, 2)
+    assert_matches_rebuild(app_module)  # Les commentaires en attente ne comptent pas
+    
+    for method, url in [
+        ('post', f'/api/admin/comments/{first}/approve'),
+        ('post', f'/api/admin/comments/{second}/approve'),
+        ('post', f'/api/admin/comments/{first}/approve'),  # Déjà approuvé : pas de double comptage
+        ('post', f'/api/admin/comments/{second}/reject'),
+        ('delete', f'/api/admin/comments/{first}'),
+        ('delete', f'/api/admin/comments/{second}'),
+    ]:
+        assert getattr(admin_client, method)(url).status_code == 200
+        assert_matches_rebuild(app_module)
+    
+    stats = user_client.get('/api/ratings/book/2').get_json()['data']
+    assert stats['ratings_count'] == stats_rows(app_module)[('book', 2)][0]
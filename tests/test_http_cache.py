@@ -0,0 +1,80 @@
+import pytest
+
+@pytest.fixture
+def asset_url(app_module):
+    return app_module.asset_manifest.url('css/quotes.css')
+
+def revalidate(client, url, encoding):
+    first = client.get(url, headers={'Accept-Encoding': encoding})
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    second = client.get(url, headers={'Accept-Encoding': encoding, 'If-None-Match': etag})
+    return first, second
+
+@pytest.mark.parametrize('encoding', ['gzip', 'br', 'identity'])
+@pytest.mark.parametrize('url', ['asset', '/css/quotes.css', '/api/books?limit=20'])
+def test_revalidation_returns_304_for_every_encoding(client, asset_url, url, encoding):
+    url = asset_url if url == 'asset' else url
+    first, second = revalidate(client, url, encoding)
+    if encoding != 'identity':
+        assert first.headers['Content-Encoding'] == encoding
+        assert first.headers['ETag'].endswith(f'-{encoding}"')
+    assert second.status_code == 304
+    assert second.headers['ETag'] == first.headers['ETag']
+
+def test_etag_of_another_encoding_does_not_match(client, asset_url):
+    gzipped = client.get(asset_url, headers={'Accept-Encoding': 'gzip'})
+    response = client.get(asset_url, headers={'Accept-Encoding': 'br', 'If-None-Match': gzipped.headers['ETag']})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'br'
+
+def test_repeat_request_is_revalidated(client):
+    first = client.get('/api/books?limit=5')
+    assert first.status_code == 200
+    assert first.headers['ETag']
+    assert first.last_modified is not None
+    assert 'public' in first.headers['Cache-Control']
+    
+    again = client.get('/api/books?limit=5')
+    assert again.headers['ETag'] == first.headers['ETag']
+    assert again.get_data() == first.get_data()
+    assert client.get('/api/books?limit=5', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    assert client.get('/api/books?limit=5', headers={'If-Modified-Since': first.headers['Last-Modified']}).status_code == 304
+
+@pytest.mark.parametrize('backend', ['database', 'json'])
+def test_admin_write_invalidates_cached_responses(app_module, client, admin_client, monkeypatch, backend):
+    monkeypatch.setattr(app_module, 'CATALOG_BACKEND', backend)
+    book = client.get('/api/books?limit=1').get_json()['data'][0]
+    first = client.get(f"/api/books/{book['id']}")
+    
+    response = admin_client.put(f"/api/admin/books/{book['id']}", json={'title': f"{book['title']} ({backend})"})
+    assert response.status_code == 200
+    try:
+        second = client.get(f"/api/books/{book['id']}", headers={'If-None-Match': first.headers['ETag']})
+        assert second.status_code == 200
+        assert second.headers['ETag'] != first.headers['ETag']
+        assert second.last_modified >= first.last_modified
+        assert second.get_json()['data']['title'] == f"{book['title']} ({backend})"
+    finally:
+        admin_client.put(f"/api/admin/books/{book['id']}", json={'title': book['title']})
+
+def test_json_catalog_written_by_another_worker_is_not_cached_stale(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, 'CATALOG_BACKEND', 'json')
+    monkeypatch.setattr(app_module.catalog_cache, 'check_interval', 3600)
+    url = '/api/books?limit=1&fields=id,title'
+    book = client.get(url).get_json()['data'][0]
+    
+    # Écriture par un autre worker : son propre cache, puis la nouvelle génération
+    other_worker = app_module.CatalogCache(3600, 200)
+    def rename(title):
+        other_worker.apply('books.json', lambda entry: (
+            [{'op': 'put', 'item': dict(entry['index'][book['id']], title=title)}], None
+        ))
+        app_module.bump_cache_generation('catalog')
+    
+    rename('Titre écrit ailleurs')
+    try:
+        assert client.get(url).get_json()['data'][0]['title'] == 'Titre écrit ailleurs'
+    finally:
+        rename(book['title'])
+    assert client.get(url).get_json()['data'][0]['title'] == book['title']
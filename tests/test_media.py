@@ -0,0 +1,20 @@
+def test_default_book_image_is_served(app_module, client):
+    response = client.get(app_module.DEFAULT_BOOK_IMAGE)
+    assert response.status_code == 200
+    assert response.mimetype == 'image/jpeg'
+
+def test_pending_media_redirects_to_default_image(app_module, app_context, client):
+    media = app_module.Media(
+        filename='attente.jpg',
+        original_filename='attente.jpg',
+        file_type='image',
+        cloudinary_url='',
+        status='pending'
+    )
+    app_module.db.session.add(media)
+    app_module.db.session.commit()
+    
+    response = client.get(f'/media/{media.id}')
+    assert response.status_code == 302
+    assert response.headers['Location'] == app_module.DEFAULT_BOOK_IMAGE
+    assert client.get(response.headers['Location']).status_code == 200
@@ -0,0 +1,83 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+AUTH = {'Authorization': 'Bearer test-token'}
+
+def metric_value(text, series):
+    match = re.search(rf'^{re.escape(series)} (\S+)$', text, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+def test_metrics_requires_admin_or_token(client, admin_client):
+    response = client.get('/metrics')
+    assert response.status_code == 401
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers=AUTH).status_code == 200
+    assert admin_client.get('/metrics').status_code == 200
+
+def test_metrics_count_requests_latency_and_sql(client):
+    requests_series = 'dek_http_requests_total{endpoint="get_books",method="GET",status="200"}'
+    before = client.get('/metrics', headers=AUTH).get_data(as_text=True)
+    
+    for _ in range(3):
+        assert client.get('/api/books').status_code == 200
+    assert client.get('/api/books/999999').status_code == 404
+    
+    response = client.get('/metrics', headers=AUTH)
+    assert response.headers['Content-Type'] == 'text/plain; version=0.0.4; charset=utf-8'
+    text = response.get_data(as_text=True)
+    assert metric_value(text, requests_series) - metric_value(before, requests_series) == 3
+    assert metric_value(text, 'dek_http_requests_total{endpoint="get_book",method="GET",status="404"}') >= 1
+    assert '# TYPE dek_http_request_duration_seconds histogram' in text
+    count = metric_value(text, 'dek_http_request_duration_seconds_count{endpoint="get_books"}')
+    assert metric_value(text, 'dek_http_request_duration_seconds_bucket{endpoint="get_books",le="+Inf"}') == count
+    assert 'dek_http_request_db_queries_bucket{endpoint="get_books",le="0.0"}' in text
+    assert metric_value(text, 'dek_cache_requests_total{cache="response",result="hit"}') >= 1
+    assert metric_value(text, 'dek_db_pool_checkouts_total') >= 1
+
+def test_dead_worker_files_are_folded_into_archive(app_module, client, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, 'METRICS_DIR', str(tmp_path))
+    series = [['endpoint', 'worker_mort'], ['method', 'GET'], ['status', '200']]
+    histogram = [1, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0.004]
+    
+    def snapshot(requests):
+        return {
+            'counters': [['dek_http_requests_total', series, requests]],
+            'histograms': [['dek_http_request_duration_seconds', [['endpoint', 'worker_mort']], histogram]]
+        }
+    
+    (tmp_path / 'archive.json').write_text(json.dumps(snapshot(5)))
+    pid = dead_pid()
+    (tmp_path / f'{pid}.json').write_text(json.dumps(snapshot(7)))
+    
+    app_module.fold_stale_metrics_files()
+    
+    assert not (tmp_path / f'{pid}.json').exists()
+    archive = json.loads((tmp_path / 'archive.json').read_text())
+    assert archive['counters'] == [['dek_http_requests_total', series, 12]]
+    assert archive['histograms'][0][2] == [2, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0.008]
+    
+    text = client.get('/metrics', headers=AUTH).get_data(as_text=True)
+    assert metric_value(text, 'dek_http_requests_total{endpoint="worker_mort",method="GET",status="200"}') == 12
+    assert metric_value(text, 'dek_http_request_duration_seconds_bucket{endpoint="worker_mort",le="0.005"}') == 2
+    assert f'{os.getpid()}.json' in os.listdir(tmp_path)
+
+def test_live_worker_files_are_not_folded(app_module, monkeypatch, tmp_path):
+    monkeypatch.setattr(app_module, 'METRICS_DIR', str(tmp_path))
+    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])
+    try:
+        (tmp_path / f'{child.pid}.json').write_text(json.dumps({'counters': [], 'histograms': []}))
+        app_module.fold_stale_metrics_files()
+        assert (tmp_path / f'{child.pid}.json').exists()
+        assert not (tmp_path / 'archive.json').exists()
+    finally:
+        child.kill()
+        child.wait()
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+PROFILER_URLS = [
+    ('get', '/api/admin/profiler'),
+    ('post', '/api/admin/profiler/start'),
+    ('post', '/api/admin/profiler/stop'),
+    ('get', '/api/admin/profiler/collapsed'),
+    ('get', '/api/admin/profiler/top'),
+]
+
+@pytest.fixture
+def profiler(app_module, admin_client):
+    """Relire la configuration à chaque requête et arrêter la session en fin de test"""
+    app_module.profiler_state['checked_at'] = 0.0
+    yield
+    admin_client.post('/api/admin/profiler/stop')
+
+@pytest.mark.parametrize('method,url', PROFILER_URLS)
+def test_profiler_requires_admin(app_module, client, user_client, method, url):
+    for anonymous in (client, user_client):
+        response = getattr(anonymous, method)(url, json={'requests': 1})
+        assert response.status_code == 302
+        assert response.headers['Location'] == '/admin'
+    assert not app_module.profiler_session_active(app_module.read_profiler_config())
+
+def test_profile_next_requests(app_module, client, admin_client, profiler, monkeypatch):
+    catalog_page = app_module.catalog_page
+    def slow_catalog_page(*args, **kwargs):
+        time.sleep(0.05)
+        return catalog_page(*args, **kwargs)
+    monkeypatch.setattr(app_module, 'catalog_page', slow_catalog_page)
+    
+    response = admin_client.post('/api/admin/profiler/start', json={'endpoint': 'get_books', 'requests': 2})
+    assert response.status_code == 200
+    assert response.get_json()['data']['remaining'] == 2
+    
+    # Une seule session à la fois
+    response = admin_client.post('/api/admin/profiler/start', json={'sample_percent': 50})
+    assert response.status_code == 409
+    assert response.get_json()['success'] is False
+    
+    for page in range(3):
+        app_module.profiler_state['checked_at'] = 0.0
+        assert client.get(f'/api/books?limit=5&profil={page}').status_code == 200
+    
+    status = admin_client.get('/api/admin/profiler').get_json()['data']
+    assert status['active'] is False
+    assert status['config']['remaining'] == 0
+    assert status['requests'] == 2
+    assert status['samples'] > 0
+    assert status['workers'] == [app_module.os.getpid()]
+    assert 'get_books' in status['endpoints']
+    
+    top = admin_client.get('/api/admin/profiler/top?limit=10').get_json()
+    assert top['samples'] == status['samples']
+    assert set(top['data'][0]) == {'function', 'self_samples', 'self_percent', 'total_samples', 'total_percent'}
+    assert any(row['function'].startswith('slow_catalog_page (') for row in top['data'])
+    
+    collapsed = admin_client.get('/api/admin/profiler/collapsed')
+    assert collapsed.headers['Content-Disposition'] == 'attachment; filename="profile.collapsed.txt"'
+    lines = collapsed.get_data(as_text=True).splitlines()
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == status['samples']
+    # Les échantillons pris dans les hooks before/after_request n'ont pas la vue dans leur pile
+    assert any('get_books (' in line and 'slow_catalog_page (' in line for line in lines)
+    
+    csv = admin_client.get('/api/admin/profiler/top?format=csv')
+    assert csv.mimetype == 'text/csv'
+    assert csv.get_data(as_text=True).splitlines()[0] == \
+        'function,self_samples,self_percent,total_samples,total_percent'
+
+def test_stop_allows_a_new_session(admin_client, profiler):
+    assert admin_client.post('/api/admin/profiler/start', json={'sample_percent': 10}).status_code == 200
+    assert admin_client.post('/api/admin/profiler/start', json={'sample_percent': 10}).status_code == 409
+    
+    response = admin_client.post('/api/admin/profiler/stop')
+    assert response.get_json()['data']['active'] is False
+    assert admin_client.get('/api/admin/profiler').get_json()['data']['active'] is False
+    assert admin_client.post('/api/admin/profiler/start', json={'sample_percent': 10}).status_code == 200
+
+def test_invalid_sessions_are_rejected(admin_client, profiler):
+    assert admin_client.post('/api/admin/profiler/start', json={'endpoint': 'inconnu', 'requests': 1}).status_code == 400
+    assert admin_client.post('/api/admin/profiler/start', json={'sample_percent': 150}).status_code == 400
+    assert admin_client.post('/api/admin/profiler/start', json={'requests': -1}).status_code == 400
@@ -0,0 +1,47 @@
+import itertools
+
+import pytest
+
+user_numbers = itertools.count()
+
+def seed_users_with_comments(app_module, count):
+    """count utilisateurs publics, chacun avec un commentaire approuvé et une note sur le livre 1"""
+    db = app_module.db
+    for _ in range(count):
+        number = next(user_numbers)
+        user = app_module.PublicUser(username=f'compte{number}', email=f'compte{number}@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(app_module.Comment(
+            content=f'Commentaire {number}',
+            content_type='book',
+            content_id=1,
+            user_id=user.id,
+            is_approved=True
+        ))
+        db.session.add(app_module.Rating(rating=4, content_type='book', content_id=1, user_id=user.id))
+    db.session.commit()
+    app_module.rebuild_content_stats()
+    app_module.bump_cache_generation('comments')
+
+def count_queries(app_module, client, url):
+    with app_module.query_budget(float('inf')) as budget:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(budget.statements)
+
+@pytest.mark.parametrize('url', [
+    '/api/admin/public-users',
+    '/api/admin/comments?limit=100',
+    '/api/comments/book/1?limit=100',
+])
+def test_query_count_does_not_grow_with_rows(app_module, app_context, admin_client, url):
+    seed_users_with_comments(app_module, 3)
+    few = count_queries(app_module, admin_client, url)
+    
+    seed_users_with_comments(app_module, 20)
+    many = count_queries(app_module, admin_client, url)
+    
+    assert many == few
+    assert many <= 2
@@ -0,0 +1,23 @@
+import pytest
+
+@pytest.mark.parametrize('rating', [True, False, '4', 4.0, None])
+def test_rating_must_be_an_integer(user_client, rating):
+    response = user_client.post('/api/ratings', json={'rating': rating, 'content_type': 'book', 'content_id': 1})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'La note doit être entre 1 et 5'
+
+def test_boolean_content_id_is_not_a_catalog_id(user_client):
+    response = user_client.post('/api/ratings', json={'rating': 3, 'content_type': 'book', 'content_id': True})
+    assert response.status_code == 404
+
+def test_rating_upsert_returns_previous_value(app_module, app_context, user_client):
+    first = user_client.post('/api/ratings', json={'rating': 2, 'content_type': 'quote', 'content_id': 1}).get_json()
+    second = user_client.post('/api/ratings', json={'rating': 5, 'content_type': 'quote', 'content_id': 1}).get_json()
+    
+    assert second['data']['id'] == first['data']['id']
+    assert second['data']['previous_rating'] == 2
+    assert second['message'] == 'Note mise à jour'
+    
+    stats = user_client.get('/api/ratings/quote/1').get_json()['data']
+    assert stats['distribution']['2'] == 0
+    assert stats['distribution']['5'] == stats['ratings_count']
@@ -0,0 +1,42 @@
+import pytest
+
+def n_plus_one(app_module):
+    """Une requête pour les utilisateurs, puis deux par utilisateur (compteurs non fournis)"""
+    return [user.to_dict() for user in app_module.PublicUser.query.all()]
+
+def test_query_budget_fails_on_n_plus_one(app_module, app_context):
+    users = app_module.PublicUser.query.count()
+    assert users >= 2
+    
+    with pytest.raises(AssertionError) as excinfo:
+        with app_module.query_budget(2):
+            n_plus_one(app_module)
+    
+    message = str(excinfo.value)
+    assert f'{1 + 2 * users} requêtes SQL exécutées pour un budget de 2' in message
+    assert f'{users} × SELECT count(*)' in message
+
+def test_query_budget_passes_within_budget(app_module, app_context):
+    with app_module.query_budget(1) as budget:
+        app_module.public_users_with_counts(app_module.PublicUser.query)
+    assert len(budget.statements) == 1
+
+def test_debug_mode_flags_repeated_statements(app_module, monkeypatch, capsys):
+    monkeypatch.setattr(app_module, 'SQL_DEBUG', True)
+    monkeypatch.setattr(app_module, 'SQL_REPEAT_THRESHOLD', 1)
+    
+    with app_module.app.test_request_context('/api/admin/public-users'):
+        app_module.start_sql_debug()
+        users = len(n_plus_one(app_module))
+        response = app_module.report_sql_debug(app_module.app.response_class('ok'))
+    
+    assert response.headers['X-SQL-Summary'].startswith(f'queries={1 + 2 * users};')
+    assert 'repeated=2' in response.headers['X-SQL-Summary']
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+    output = capsys.readouterr().out
+    assert output.count('[SQL] N+1 probable sur GET /api/admin/public-users') == 2
+    assert f'{users} × SELECT count(*)' in output
+
+def test_statement_shape_folds_literals_and_in_lists(app_module):
+    shape = app_module.statement_shape("SELECT a FROM t WHERE id IN (?, ?, ?) AND x = 'o''k' AND rating_1 > 3")
+    assert shape == 'SELECT a FROM t WHERE id IN (?) AND x = ? AND rating_1 > ?'